@@ -1,16 +1,45 @@
+import asyncio, io, os, tempfile, zipfile
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from fastapi import FastAPI, UploadFile, File, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np, cv2, uvicorn
 from pyngrok import ngrok
 
-from utils.face_utils import predict_student
-from utils.data_manager import update_attendance_record, load_students
+from utils.face_utils import predict_student, predict_candidates, detect_faces, recognize_faces, STILL_DETECTION
+from utils.recognizer import engine
+from utils.face_cache import recognition_cache
+from utils.data_manager import update_attendance_record, record_attendance_batch
+from utils.storage import storage
+from utils.config import get_setting
+from utils.metrics import StageTimer
+from utils.workers import BoundedExecutor, QueueFull
+from utils.shards import SESSION_DEFAULTS
+from utils.export import export_attendance, stream_csv, FORMATS
+from utils.analytics import analytics
+
+# batch_max_bytes: decompressed size of all images in one /predict/batch
+API_DEFAULTS = {"workers": os.cpu_count() or 2, "max_queue": 32, "batch_max_images": 100,
+                "batch_max_bytes": 200 * 1024 * 1024}
+API_SETTINGS = get_setting("api", API_DEFAULTS)
+pool = BoundedExecutor(API_SETTINGS["workers"], API_SETTINGS["max_queue"], name="recognition")
+SESSION = get_setting("session", SESSION_DEFAULTS)
+
+@asynccontextmanager
+async def lifespan(app):
+    storage.recover()
+    yield
+    pool.shutdown()
+    storage.close()
+
 
 app = FastAPI(
     title="Face Recognition & Attendance API",
     description="API to predict students and update attendance",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -21,27 +50,133 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-async def decode_uploaded_image(image: UploadFile):
-    contents = await image.read()
+def decode_image(contents: bytes):
     np_img = np.frombuffer(contents, np.uint8)
     return cv2.imdecode(np_img, cv2.IMREAD_GRAYSCALE)
 
 
+class UploadTooLarge(Exception):
+    pass
+
+
 def error_response(message: str, status: int = 500):
     return JSONResponse({"success": False, "error": message}, status_code=status)
 
 
+def busy_response(e: QueueFull):
+    return JSONResponse({"success": False, "error": f"Server busy: {e}"}, status_code=429, headers={"Retry-After": "1"})
+
+
+def timed_response(content: dict, timer: StageTimer, status: int = 200):
+    return JSONResponse(content, status_code=status, headers={"Server-Timing": timer.header()})
+
+
+def session_for(kelas: Optional[str], fallback: Optional[bool]):
+    """Request overrides on top of the configured session."""
+    return {
+        "kelas": SESSION["kelas"] if kelas is None else kelas,
+        "fallback": SESSION["fallback"] if fallback is None else fallback,
+    }
+
+
+# The functions below run on the worker pool, never on the event loop
+
+def recognize_upload(contents: bytes, timer: StageTimer, top_k: int = 0, session: Optional[dict] = None):
+    """(student, confidence, candidates); candidates only when top_k > 0."""
+    with timer.stage("decode"):
+        img = decode_image(contents)
+    if img is None:
+        raise ValueError("Uploaded file is not a valid image")
+    with timer.stage("recognize"):
+        if top_k > 0:
+            return predict_candidates(img, storage, top_k, session=session)
+        return (*predict_student(img, storage, session=session), [])
+
+
+def update_attendance(student: dict, start_time: str, end_time: str, timer: StageTimer):
+    with timer.stage("attendance"):
+        return update_attendance_record(student, start_time, end_time)
+
+
+def recognize_all_faces(contents: bytes, timer: StageTimer, session: Optional[dict] = None):
+    with timer.stage("decode"):
+        img = decode_image(contents)
+    if img is None:
+        raise ValueError("not a valid image")
+    with timer.stage("detect"):
+        boxes = detect_faces(img, STILL_DETECTION)
+    with timer.stage("recognize"):
+        return recognize_faces(img, boxes, storage, session=session)
+
+
+def expand_uploads(files, max_images: int, max_bytes: int):
+    """(filename, bytes) pairs, with any .zip upload replaced by its images.
+
+    Image count and total (uncompressed) size are checked from the zip
+    directories before any member is decompressed, so an oversized archive
+    is rejected without being expanded into memory.
+    """
+    plan, count, size = [], 0, 0
+    for filename, contents in files:
+        if zipfile.is_zipfile(io.BytesIO(contents)):
+            archive = zipfile.ZipFile(io.BytesIO(contents))
+            members = [info for info in archive.infolist()
+                       if not info.is_dir() and info.filename.lower().endswith((".jpg", ".jpeg", ".png"))]
+            plan.append((archive, members))
+            count += len(members)
+            size += sum(info.file_size for info in members)
+        else:
+            plan.append((filename, contents))
+            count += 1
+            size += len(contents)
+        if count > max_images:
+            raise UploadTooLarge(f"Too many images (more than {max_images})")
+        if size > max_bytes:
+            raise UploadTooLarge(f"Images too large ({size} > {max_bytes} bytes)")
+
+    images = []
+    for source, item in plan:
+        if isinstance(source, zipfile.ZipFile):
+            with source:
+                # Reads stop at each member's declared file_size
+                images.extend((info.filename, source.read(info)) for info in item)
+        else:
+            images.append((source, item))
+    return images
+
+
+def commit_batch_attendance(students, start_time: str, end_time: str, timer: StageTimer):
+    with timer.stage("attendance"):
+        updated, skipped, _ = record_attendance_batch(students, start_time, end_time)
+        return updated, skipped
+
+
+def find_student(student_id: str, timer: StageTimer):
+    with timer.stage("lookup"):
+        return storage.get(student_id)
+
+
 @app.post("/predict")
-async def predict(image: UploadFile = File(...)):
+async def predict(
+    image: UploadFile = File(...),
+    top_k: int = Query(0, ge=0, le=50, description="Also return the k closest students"),
+    kelas: Optional[str] = Query(None, description="Match only this class roster (\"\" = everyone)"),
+    fallback: Optional[bool] = Query(None, description="Retry unmatched faces against all students")
+):
+    timer = StageTimer()
     try:
-        img = await decode_uploaded_image(image)
-        students = load_students()
-        student, confidence = predict_student(img, students)
+        contents = await image.read()
+        student, confidence, candidates = await pool.run(
+            recognize_upload, contents, timer, top_k, session_for(kelas, fallback)
+        )
 
+        extra = {"candidates": candidates} if top_k else {}
         if student:
-            return {"success": True, "student": student, "confidence": confidence}
-        return JSONResponse({"success": False, "message": "No match found"}, status_code=404)
+            return timed_response({"success": True, "student": student, "confidence": confidence, **extra}, timer)
+        return timed_response({"success": False, "message": "No match found", **extra}, timer, status=404)
 
+    except QueueFull as e:
+        return busy_response(e)
     except Exception as e:
         return error_response(str(e))
 
@@ -52,23 +187,25 @@ async def attendance_update(
     start_time: str = Query(..., description="Allowed start time (HH:MM)"),
     end_time: str = Query(..., description="Allowed end time (HH:MM)")
 ):
+    timer = StageTimer()
     try:
-        students = load_students()
-        student = students.get(student_id)
+        student = await pool.run(find_student, student_id, timer)
 
         if not student:
-            return JSONResponse({"success": False, "message": "Student not found"}, status_code=404)
+            return timed_response({"success": False, "message": "Student not found"}, timer, status=404)
 
-        updated, now = update_attendance_record(student, start_time, end_time)
+        updated, now = await pool.run(update_attendance, student, start_time, end_time, timer)
 
         if updated:
-            return {
+            return timed_response({
                 "success": True,
                 "student": student,
                 "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
-            }
-        return {"success": False, "message": "Attendance not updated (outside time window or duplicate)"}
+            }, timer)
+        return timed_response({"success": False, "message": "Attendance not updated (outside time window or duplicate)"}, timer)
 
+    except QueueFull as e:
+        return busy_response(e)
     except Exception as e:
         return error_response(str(e))
 
@@ -77,26 +214,114 @@ async def attendance_update(
 async def recognize_and_update(
     image: UploadFile = File(...),
     start_time: str = Query(..., description="Allowed start time (HH:MM)"),
-    end_time: str = Query(..., description="Allowed end time (HH:MM)")
+    end_time: str = Query(..., description="Allowed end time (HH:MM)"),
+    kelas: Optional[str] = Query(None, description="Match only this class roster (\"\" = everyone)"),
+    fallback: Optional[bool] = Query(None, description="Retry unmatched faces against all students")
 ):
+    timer = StageTimer()
     try:
-        img = await decode_uploaded_image(image)
-        students = load_students()
-        student, confidence = predict_student(img, students)
+        contents = await image.read()
+        student, confidence, _ = await pool.run(recognize_upload, contents, timer, 0, session_for(kelas, fallback))
 
         if not student:
-            return JSONResponse({"success": False, "message": "No match found"}, status_code=404)
+            return timed_response({"success": False, "message": "No match found"}, timer, status=404)
 
-        updated, now = update_attendance_record(student, start_time, end_time)
+        updated, now = await pool.run(update_attendance, student, start_time, end_time, timer)
 
-        return {
+        return timed_response({
             "success": True,
             "student": student,
             "confidence": confidence,
             "attendance_updated": updated,
             "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
+        }, timer)
+
+    except QueueFull as e:
+        return busy_response(e)
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.post("/predict/batch")
+async def predict_batch(
+    images: List[UploadFile] = File(..., description="Images and/or .zip archives of images"),
+    start_time: Optional[str] = Query(None, description="Update attendance if set (HH:MM)"),
+    end_time: Optional[str] = Query(None, description="Update attendance if set (HH:MM)"),
+    kelas: Optional[str] = Query(None, description="Match only this class roster (\"\" = everyone)"),
+    fallback: Optional[bool] = Query(None, description="Retry unmatched faces against all students")
+):
+    timer = StageTimer()
+    session = session_for(kelas, fallback)
+    try:
+        uploads = [(image.filename, await image.read()) for image in images]
+        files = await pool.run(
+            expand_uploads, uploads, API_SETTINGS["batch_max_images"], API_SETTINGS["batch_max_bytes"]
+        )
+
+        # Keep every worker busy with a different image so decode and
+        # recognition of one image overlap with the others
+        window = asyncio.Semaphore(pool.workers)
+
+        async def process(contents):
+            image_timer = StageTimer()
+            async with window:
+                try:
+                    return await pool.run(recognize_all_faces, contents, image_timer, session), None
+                except QueueFull:
+                    raise
+                except Exception as e:
+                    return [], str(e)
+                finally:
+                    timer.merge(image_timer)
+
+        tasks = [asyncio.ensure_future(process(contents)) for _, contents in files]
+        try:
+            outcomes = await asyncio.gather(*tasks)
+        except QueueFull:
+            # Don't leave the other images queued on the pool behind a 429
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        results, recognized = [], {}
+        for (filename, _), (faces, error) in zip(files, outcomes):
+            entry = {"filename": filename, "faces": []}
+            if error:
+                entry["error"] = error
+            for (x, y, w, h), student, confidence in faces:
+                entry["faces"].append({
+                    "box": [int(x), int(y), int(w), int(h)],
+                    "student": student,
+                    "confidence": confidence
+                })
+                if student:
+                    recognized.setdefault(str(student["id"]), student)
+            results.append(entry)
+
+        content = {
+            "success": True,
+            "image_count": len(files),
+            "face_count": sum(len(entry["faces"]) for entry in results),
+            "images": results
         }
 
+        if start_time and end_time:
+            updated, skipped = await pool.run(
+                commit_batch_attendance, list(recognized.values()), start_time, end_time, timer
+            )
+            content["attendance"] = {
+                "updated": [s["id"] for s in updated],
+                "skipped": [s["id"] for s in skipped],
+                "timestamp": updated[0]["waktu_kehadiran"] if updated else None
+            }
+
+        return timed_response(content, timer)
+
+    except UploadTooLarge as e:
+        return error_response(str(e), 413)
+    except QueueFull as e:
+        return busy_response(e)
     except Exception as e:
         return error_response(str(e))
 
@@ -104,12 +329,84 @@ async def recognize_and_update(
 @app.get("/students")
 async def get_students():
     try:
-        students = load_students()
+        students = await pool.run(storage.list_students)
         return {"success": True, "count": len(students), "students": students}
+    except QueueFull as e:
+        return busy_response(e)
     except Exception as e:
         return error_response(str(e))
 
 
+@app.get("/attendance/export")
+async def export_history(
+    format: str = Query("csv", description="csv, parquet or xlsx"),
+    report: str = Query("rows", description="rows or summary (per-student totals)"),
+    start: Optional[str] = Query(None, description="YYYY-MM-DD[ HH:MM:SS]"),
+    end: Optional[str] = Query(None, description="YYYY-MM-DD[ HH:MM:SS], a date covers the whole day"),
+    kelas: Optional[str] = None,
+    student_id: Optional[List[str]] = Query(None),
+):
+    if report not in ("rows", "summary"):
+        return error_response(f"Unknown report: {report}", 400)
+    ext = next((e for e, f in FORMATS.items() if f == format), None)
+    if ext is None:
+        return error_response(f"Unsupported format: {format}", 400)
+    filename = f"attendance_{report}{ext}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    if format == "csv":
+        # Rows are produced chunk by chunk while the response is sent
+        chunks = stream_csv(report, start, end, kelas, student_id)
+        return StreamingResponse(chunks, media_type="text/csv", headers=headers)
+
+    # Parquet/xlsx need the finished file (footer/zip), so spool to disk
+    fd, path = tempfile.mkstemp(suffix=ext)
+    os.close(fd)
+    try:
+        await pool.run(export_attendance, path, format, report, start, end, kelas, student_id)
+    except QueueFull as e:
+        os.remove(path)
+        return busy_response(e)
+    except Exception as e:
+        os.remove(path)
+        return error_response(str(e))
+    return FileResponse(path, filename=filename, background=BackgroundTask(os.remove, path))
+
+
+@app.get("/analytics/class")
+async def class_analytics(
+    kelas: Optional[str] = Query(None, description="Class, or all classes if omitted"),
+    month: Optional[str] = Query(None, description="YYYY-MM, or all time if omitted"),
+    daily: bool = Query(False, description="Also return per-day rows (needs month)"),
+):
+    try:
+        summary = await pool.run(analytics.class_summary, kelas, month)
+        if daily and month:
+            summary["days"] = await pool.run(analytics.daily, kelas, month)
+        return {"success": True, "analytics": summary}
+    except QueueFull as e:
+        return busy_response(e)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.get("/analytics/student/{student_id}")
+async def student_analytics(student_id: str, month: Optional[str] = Query(None, description="YYYY-MM")):
+    try:
+        return {"success": True, "analytics": await pool.run(analytics.student_summary, student_id, month)}
+    except QueueFull as e:
+        return busy_response(e)
+    except Exception as e:
+        return error_response(str(e))
+
+
+@app.get("/engine/stats")
+async def engine_stats():
+    return {"success": True, "engine": engine.stats(), "cache": recognition_cache.stats(), "pool": pool.stats()}
+
+
 if __name__ == "__main__":
     # public_url = ngrok.connect(8000).public_url
     # print("Public API:", public_url)
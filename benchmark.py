@@ -0,0 +1,299 @@
+import argparse, os, shutil, tempfile, time, uuid
+import urllib.error, urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+from utils.config import IMAGES_DIR, MODEL_PATH, BINARY_MODEL_PATH
+from utils.face_utils import detect_faces, normalize_face, DETECTION
+from utils.tracker import iou
+from utils.model_store import load_binary_model, yaml_to_binary, save_binary_model, binary_to_yaml
+from utils.recognizer import OpenCVModel, HistogramModel, LBPH_PARAMS
+from utils.lbp_matcher import LBPMatcher, lbp_histograms
+from utils.ann_index import IVFIndex
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def load_gray_frames(source, limit):
+    """Gray frames from a video file, a folder of images or a single image."""
+    frames = []
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTS):
+                    img = cv2.imread(os.path.join(root, name), cv2.IMREAD_GRAYSCALE)
+                    if img is not None:
+                        frames.append(img)
+                if len(frames) >= limit:
+                    return frames
+        return frames
+
+    if source.lower().endswith(IMAGE_EXTS):
+        img = cv2.imread(source, cv2.IMREAD_GRAYSCALE)
+        return [img] if img is not None else []
+
+    cap = cv2.VideoCapture(source)
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    cap.release()
+    return frames
+
+
+def match_count(reference, boxes, threshold=0.5):
+    return sum(1 for ref in reference if any(iou(ref, box) >= threshold for box in boxes))
+
+
+def bench_detection(args):
+    frames = load_gray_frames(args.source, args.limit)
+    if not frames:
+        print(f"No frames found in {args.source}")
+        return
+
+    if args.resize:
+        frames = [cv2.resize(f, (args.resize, int(f.shape[0] * args.resize / f.shape[1]))) for f in frames]
+
+    # Full-resolution detections are the reference for recall
+    full = dict(DETECTION, width=0)
+    reference = [detect_faces(f, full) for f in frames]
+    total_ref = sum(len(r) for r in reference)
+
+    print(f"{len(frames)} frames, {total_ref} reference faces, frame size {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'width':>8} {'avg ms':>9} {'faces':>7} {'recall':>8}")
+    for width in args.widths:
+        settings = dict(DETECTION, width=width)
+        found, hits = 0, 0
+        start = time.perf_counter()
+        results = [detect_faces(f, settings) for f in frames]
+        elapsed = time.perf_counter() - start
+        for ref, boxes in zip(reference, results):
+            found += len(boxes)
+            hits += match_count(ref, boxes)
+        recall = hits / total_ref if total_ref else float("nan")
+        label = "full" if width == 0 else str(width)
+        print(f"{label:>8} {elapsed / len(frames) * 1000:>9.2f} {found:>7} {recall:>8.2%}")
+
+
+def encode_multipart(field, filename, payload):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def bench_api(args):
+    with open(args.image, "rb") as f:
+        body, content_type = encode_multipart("image", os.path.basename(args.image), f.read())
+    url = args.url.rstrip("/") + args.endpoint
+
+    def one(_):
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        return status, time.perf_counter() - start
+
+    print(f"{args.requests} requests per level against {url}")
+    print(f"{'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}  statuses")
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as ex:
+            results = list(ex.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(t for _, t in results)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+        statuses = dict(Counter(status for status, _ in results))
+        print(f"{concurrency:>8} {len(results) / elapsed:>9.1f} {p50:>9.1f} {p95:>9.1f}  {statuses}")
+
+
+def bench_model_load(args):
+    if not os.path.exists(args.binary):
+        print(f"Converting {args.yaml} -> {args.binary}")
+        yaml_to_binary(args.yaml, args.binary)
+
+    print(f"{'file':>8} {'size MB':>9} {'load ms':>9}")
+    for label, path, load in (
+        ("yaml", args.yaml, OpenCVModel),
+        ("binary", args.binary, HistogramModel),
+    ):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            load(path)
+            times.append(time.perf_counter() - start)
+        print(f"{label:>8} {os.path.getsize(path) / 1e6:>9.2f} {min(times) * 1000:>9.2f}")
+
+    # Touching every page shows the cost that mmap defers to first use
+    start = time.perf_counter()
+    load_binary_model(args.binary).histograms.sum()
+    print(f"binary mmap + full scan: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    face = np.random.default_rng(0).integers(0, 256, (200, 200), dtype=np.uint8)
+    for label, model in (("yaml", OpenCVModel(args.yaml)), ("binary", HistogramModel(args.binary))):
+        start = time.perf_counter()
+        for _ in range(args.predicts):
+            result = model.predict(face)
+        elapsed = (time.perf_counter() - start) / args.predicts
+        print(f"{label:>8} predict {elapsed * 1000:.2f} ms -> {result}")
+
+
+def bench_matcher(args):
+    """Synthetic galleries: OpenCV's one-by-one predict vs the batched matcher."""
+    rng = np.random.default_rng(0)
+    frames = load_gray_frames(args.source, 50) if os.path.exists(args.source) else []
+    if not frames:
+        print(f"No images in {args.source}, using noise (denser histograms than real faces)")
+        frames = [rng.integers(0, 256, (400, 400), dtype=np.uint8)]
+
+    def random_faces(count):
+        faces = []
+        for _ in range(count):
+            frame = frames[rng.integers(len(frames))]
+            side = int(rng.integers(min(frame.shape) // 3, min(frame.shape) + 1))
+            y = int(rng.integers(frame.shape[0] - side + 1))
+            x = int(rng.integers(frame.shape[1] - side + 1))
+            faces.append(normalize_face(frame[y:y + side, x:x + side]))
+        return np.stack(faces)
+
+    queries = random_faces(args.batch)
+    seeds = lbp_histograms(random_faces(64), **LBPH_PARAMS)
+    workdir = tempfile.mkdtemp()
+
+    print(f"{'students':>9} {'rows':>7} {'opencv ms/face':>15} {'numpy ms/face':>14} {'proto ms/face':>14}")
+    for students in args.students:
+        labels = np.repeat(np.arange(students, dtype=np.int32), args.per_student)
+        gallery = seeds[rng.integers(0, len(seeds), len(labels))]
+
+        # OpenCV can only load a gallery from a model file, so round-trip one
+        binary_path, yaml_path = os.path.join(workdir, "m.lbph"), os.path.join(workdir, "m.yml")
+        save_binary_model(binary_path, gallery, labels, LBPH_PARAMS)
+        binary_to_yaml(binary_path, yaml_path)
+        recognizer = OpenCVModel(yaml_path)
+        start = time.perf_counter()
+        for face in queries:
+            recognizer.predict(face)
+        opencv_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+        timings = []
+        for prototypes in ("none", "mean"):
+            matcher = LBPMatcher(gallery, labels, LBPH_PARAMS, prototypes)
+            start = time.perf_counter()
+            matcher.search(queries, k=args.k)
+            timings.append((time.perf_counter() - start) / len(queries) * 1000)
+        print(f"{students:>9} {len(labels):>7} {opencv_ms:>15.2f} {timings[0]:>14.2f} {timings[1]:>14.2f}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_ann(args):
+    """Exact vs IVF search on a synthetic gallery of augmented face crops."""
+    rng = np.random.default_rng(0)
+    frames = load_gray_frames(args.source, 50) if os.path.exists(args.source) else []
+    if not frames:
+        print(f"No images in {args.source}")
+        return
+
+    def crop(frame, side, y, x):
+        return normalize_face(frame[y:y + side, x:x + side])
+
+    # One random crop per synthetic student; samples are jittered copies
+    bases = []
+    for _ in range(args.students):
+        frame = frames[rng.integers(len(frames))]
+        side = int(rng.integers(min(frame.shape) // 4, min(frame.shape) // 2))
+        bases.append((frame, side, int(rng.integers(frame.shape[0] - side - 8)), int(rng.integers(frame.shape[1] - side - 8))))
+
+    def sample(student):
+        frame, side, y, x = bases[student]
+        dy, dx = rng.integers(0, 8, 2)
+        return crop(frame, side, y + dy, x + dx)
+
+    labels = np.repeat(np.arange(args.students, dtype=np.int32), args.per_student)
+    start = time.perf_counter()
+    gallery = np.vstack([lbp_histograms(sample(label), **LBPH_PARAMS) for label in labels])
+    truth = rng.integers(0, args.students, args.queries)
+    queries = np.stack([sample(label) for label in truth])
+    print(f"{len(labels)} gallery rows, {args.queries} queries (built in {time.perf_counter() - start:.1f}s)")
+
+    exact = LBPMatcher(gallery, labels, LBPH_PARAMS)
+    start = time.perf_counter()
+    reference = [matches[0][0] for matches in exact.search(queries, k=1)]
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+
+    start = time.perf_counter()
+    index = IVFIndex.build(gallery, labels, args.lists)
+    print(f"IVF index: {index.n_lists} lists, built in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'n_probe':>8} {'ms/query':>9} {'recall@1':>9} {'= exact':>8}")
+    accuracy = np.mean(np.array(reference) == truth)
+    print(f"{'exact':>8} {exact_ms:>9.2f} {accuracy:>9.2%} {1:>8.2%}")
+    for n_probe in args.probes:
+        matcher = LBPMatcher(gallery, labels, LBPH_PARAMS, index=index, n_probe=n_probe)
+        start = time.perf_counter()
+        found = [matches[0][0] for matches in matcher.search(queries, k=1)]
+        elapsed = (time.perf_counter() - start) / args.queries * 1000
+        found = np.array(found)
+        print(f"{n_probe:>8} {elapsed:>9.2f} {np.mean(found == truth):>9.2%} {np.mean(found == reference):>8.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("detection", help="Detection time and recall per detection width")
+    p.add_argument("source", nargs="?", default=IMAGES_DIR, help="Video file, image or image folder")
+    p.add_argument("--widths", type=int, nargs="+", default=[0, 1280, 960, 640, 480, 320])
+    p.add_argument("--limit", type=int, default=200)
+    p.add_argument("--resize", type=int, default=0, help="Upscale/downscale inputs to this width first")
+    p.set_defaults(func=bench_detection)
+
+    p = sub.add_parser("api", help="Load test a running API (python api.py)")
+    p.add_argument("image", help="Image file to upload")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--endpoint", default="/predict")
+    p.add_argument("--requests", type=int, default=100)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    p.set_defaults(func=bench_api)
+
+    p = sub.add_parser("model-load", help="YAML vs binary model load time, size and predict latency")
+    p.add_argument("--yaml", default=MODEL_PATH)
+    p.add_argument("--binary", default=BINARY_MODEL_PATH)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--predicts", type=int, default=50)
+    p.set_defaults(func=bench_model_load)
+
+    p = sub.add_parser("matcher", help="Batched NumPy matcher latency vs gallery size")
+    p.add_argument("source", nargs="?", default=IMAGES_DIR, help="Image or folder to crop synthetic faces from")
+    p.add_argument("--students", type=int, nargs="+", default=[10, 100, 1000])
+    p.add_argument("--per-student", type=int, default=5)
+    p.add_argument("--batch", type=int, default=8)
+    p.add_argument("-k", type=int, default=5)
+    p.set_defaults(func=bench_matcher)
+
+    p = sub.add_parser("ann", help="Exact vs approximate (IVF) gallery search")
+    p.add_argument("source", nargs="?", default=IMAGES_DIR, help="Image or folder to crop synthetic faces from")
+    p.add_argument("--students", type=int, default=500)
+    p.add_argument("--per-student", type=int, default=4)
+    p.add_argument("--queries", type=int, default=100)
+    p.add_argument("--lists", type=int, default=0, help="IVF lists (0 = sqrt of gallery rows)")
+    p.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    p.set_defaults(func=bench_ann)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
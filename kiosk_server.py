@@ -0,0 +1,457 @@
+import argparse, json, os, signal, threading, time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import cv2
+
+from utils.data_manager import update_attendance_record, in_time_window
+from utils.storage import storage
+from utils.face_utils import detect_faces, get_face_cascade, recognize_faces, save_face_snapshot
+from utils.recognizer import engine
+from utils.metrics import LatencyStats
+from utils.video import FrameQueue, CameraGrabber
+from utils.tracker import FaceTracker
+from utils.config import get_setting
+from utils.shards import SESSION_DEFAULTS
+from utils.snapshots import snapshots
+from utils.face_cache import recognition_cache
+from utils.logger import log_message
+
+# streams: [{"name", "source", "kelas", "fallback"}]; a source is a device
+# index, an RTSP/HTTP URL or a video file (played in real time, looped).
+# workers: recognition threads shared by all streams.
+# preview: none | mjpeg (http://host:mjpeg_port/) | tk
+KIOSK_DEFAULTS = {
+    "streams": [{"name": "entrance", "source": 0}],
+    "workers": 2,
+    "detect_every": 3,
+    "start_time": "09:00",
+    "end_time": "23:59",
+    "preview": "none",
+    "mjpeg_port": 8090,
+    "preview_width": 640,
+    "stats_interval": 30,
+    "reconnect_after": 5,
+}
+
+
+def parse_source(source):
+    """Device indexes arrive as strings from the CLI and JSON."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class Stream:
+    """One video source with its own tracker and counters. Only one worker
+    processes a stream at a time (the scheduler sees to it), so its
+    tracker and buffers need no lock."""
+
+    def __init__(self, name, source, session, on_frame):
+        self.name = name
+        self.source = parse_source(source)
+        self.session = session
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.frames = FrameQueue(maxsize=1, on_put=on_frame)
+        self.grabber = None
+        self.tracker = FaceTracker()
+        self.frame_index = 0
+        self._ticks = deque(maxlen=256)
+        self.latency = LatencyStats()
+        self.processed = 0
+        self.checkins = 0
+        self.last_seen = None
+        self.busy = False
+        self.failed_at = None
+        self._gray = None
+        self._latest = None
+        self._latest_lock = threading.Lock()
+
+    def open(self):
+        self.grabber = CameraGrabber(self.source, self.frames, realtime=self.is_file, loop=self.is_file)
+        self.grabber.start()
+        self.failed_at = None
+
+    def close(self):
+        if self.grabber:
+            self.grabber.stop()
+            self.grabber.join(timeout=1)
+
+    def tick(self):
+        self.processed += 1
+        self._ticks.append(time.monotonic())
+
+    @property
+    def fps(self):
+        """Frames processed per second over the last few seconds."""
+        now = time.monotonic()
+        recent = [t for t in self._ticks if now - t <= 5.0]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(now - recent[0], 1e-6)
+
+    @property
+    def latest(self):
+        with self._latest_lock:
+            return self._latest
+
+    @latest.setter
+    def latest(self, frame):
+        with self._latest_lock:
+            self._latest = frame
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "source": str(self.source),
+            "kelas": self.session["kelas"],
+            "fps": round(self.fps, 2),
+            "processed": self.processed,
+            "checkins": self.checkins,
+            "last_seen": self.last_seen,
+            "latency": self.latency.snapshot(),
+            "frames": self.frames.stats(),
+            "error": self.grabber.error if self.grabber else None,
+        }
+
+
+class StreamScheduler:
+    """Hands streams with a pending frame to workers in round-robin order.
+
+    A fast camera can't starve a slow one: after a stream is served the
+    next search starts at the stream after it. A stream is never given to
+    two workers at once, and only its newest frame is processed.
+    """
+
+    def __init__(self, streams):
+        self.streams = streams
+        self._cond = threading.Condition()
+        self._next = 0
+        self._stopped = False
+
+    def notify(self):
+        with self._cond:
+            self._cond.notify()
+
+    def acquire(self, timeout=0.5):
+        """(stream, frame) to process, or None on timeout/stop."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._stopped:
+                n = len(self.streams)
+                for i in range(n):
+                    stream = self.streams[(self._next + i) % n]
+                    if stream.busy:
+                        continue
+                    frame = stream.frames.get(timeout=0)
+                    if frame is None:
+                        continue
+                    stream.busy = True
+                    self._next = (self._next + i + 1) % n
+                    return stream, frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return None
+
+    def release(self, stream):
+        with self._cond:
+            stream.busy = False
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+class KioskServer:
+    """Runs every stream against one recognizer, one student registry and
+    one cooldown index, so a student seen at two entrances is counted once."""
+
+    def __init__(self, settings=None, annotate=False):
+        self.settings = settings or get_setting("kiosk", KIOSK_DEFAULTS)
+        self.annotate = annotate
+        default_session = get_setting("session", SESSION_DEFAULTS)
+
+        self.streams = []
+        self.scheduler = StreamScheduler(self.streams)
+        for i, cfg in enumerate(self.settings["streams"]):
+            session = {
+                "kelas": cfg.get("kelas", default_session["kelas"]),
+                "fallback": cfg.get("fallback", default_session["fallback"]),
+            }
+            name = cfg.get("name") or f"stream{i + 1}"
+            self.streams.append(Stream(name, cfg["source"], session, self.scheduler.notify))
+
+        self.workers = []
+        self.running = False
+
+    def start(self):
+        storage.recover()
+        engine.current()
+        log_message(f"🧠 Model v{engine.version} ready, starting {len(self.streams)} stream(s)")
+        self.running = True
+        for stream in self.streams:
+            stream.open()
+        for i in range(max(1, self.settings["workers"])):
+            worker = threading.Thread(target=self._work, name=f"kiosk-worker-{i + 1}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _work(self):
+        # Each worker detects with its own cascade (not thread-safe); load it up front
+        get_face_cascade()
+        while self.running:
+            item = self.scheduler.acquire()
+            if item is None:
+                continue
+            stream, frame = item
+            try:
+                with stream.latency.time():
+                    self.process(stream, frame)
+                stream.tick()
+            except Exception as e:
+                log_message(f"❌ [{stream.name}] Frame processing failed: {e}")
+            finally:
+                self.scheduler.release(stream)
+
+    def process(self, stream, frame):
+        """Detection, recognition and attendance for one frame of one stream."""
+        stream._gray = gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=stream._gray)
+
+        if stream.frame_index % self.settings["detect_every"] == 0:
+            tracks = stream.tracker.update(detect_faces(gray))
+        else:
+            tracks = stream.tracker.advance()
+        stream.frame_index += 1
+
+        pending = [track for track in tracks if stream.tracker.needs_recognition(track)]
+        recognized = recognize_faces(gray, [t.box for t in pending], storage, session=stream.session)
+        for track, (_, student, conf) in zip(pending, recognized):
+            track.add_vote(student, conf)
+
+        for track in tracks:
+            student, conf, _ = track.identity()
+            if student:
+                stream.last_seen = student["nama"]
+                if not track.checked_in and stream.tracker.is_stable(track):
+                    start, end = self.settings["start_time"], self.settings["end_time"]
+                    updated, now = update_attendance_record(student, start, end)
+                    # Retry outside the window; a cooldown refusal is final
+                    track.checked_in = updated or in_time_window(start, end, now)
+                    if updated:
+                        stream.checkins += 1
+                        save_face_snapshot(student, frame, track.box, now)
+                        log_message(f"✅ [{stream.name}] {student['nama']} checked in")
+
+            if self.annotate:
+                x, y, w, h = track.box
+                color = (0, 255, 0) if student else (0, 0, 255)
+                label = f"{student['nama']} ({conf:.0f})" if student else "Unknown"
+                cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+
+        if self.annotate:
+            text = f"{stream.name} | {stream.fps:.1f} FPS | {stream.latency.last_ms:.0f} ms"
+            cv2.putText(frame, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+            stream.latest = frame
+
+    def check_streams(self):
+        """Reopen sources whose grabber stopped (e.g. an RTSP camera dropped)."""
+        now = time.monotonic()
+        for stream in self.streams:
+            if stream.grabber is None or stream.grabber.is_alive():
+                continue
+            if stream.failed_at is None:
+                stream.failed_at = now
+                log_message(f"⚠️ [{stream.name}] {stream.grabber.error or 'Stream stopped'}, reconnecting...")
+            elif now - stream.failed_at >= self.settings["reconnect_after"]:
+                stream.open()
+
+    def stats(self):
+        return {
+            "streams": [stream.stats() for stream in self.streams],
+            "engine": engine.stats(),
+            "cache": recognition_cache.stats(),
+            "snapshots": snapshots.stats(),
+        }
+
+    def log_stats(self):
+        for stream in self.streams:
+            frames = stream.frames.stats()
+            log_message(
+                f"📈 [{stream.name}] {stream.fps:.1f} FPS | {stream.latency.avg_ms:.1f} ms avg | "
+                f"dropped {frames['dropped']}/{frames['received']} | check-ins {stream.checkins}"
+            )
+
+    def stop(self):
+        self.running = False
+        self.scheduler.stop()
+        for stream in self.streams:
+            stream.close()
+        for worker in self.workers:
+            worker.join(timeout=2)
+        snapshots.close()
+        storage.close()
+        log_message("🛑 Kiosk server stopped")
+
+
+def preview_frame(frame, width):
+    if frame.shape[1] > width:
+        frame = cv2.resize(frame, None, fx=width / frame.shape[1], fy=width / frame.shape[1],
+                           interpolation=cv2.INTER_AREA)
+    return frame
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    """/ lists the streams, /stream/<n> is an MJPEG feed, /stats is JSON."""
+
+    kiosk = None
+    fps = 10
+
+    def do_GET(self):
+        if self.path == "/":
+            images = "".join(
+                f'<figure><img src="/stream/{i}"><figcaption>{s.name}</figcaption></figure>'
+                for i, s in enumerate(self.kiosk.streams)
+            )
+            self._send(200, "text/html", f"<html><body>{images}</body></html>".encode())
+        elif self.path == "/stats":
+            self._send(200, "application/json", json.dumps(self.kiosk.stats(), default=str).encode())
+        elif self.path.startswith("/stream/") and self.path[8:].isdigit() and int(self.path[8:]) < len(self.kiosk.streams):
+            self._mjpeg(self.kiosk.streams[int(self.path[8:])])
+        else:
+            self._send(404, "text/plain", b"Not found")
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _mjpeg(self, stream):
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.end_headers()
+        width = self.kiosk.settings["preview_width"]
+        last = None
+        try:
+            while self.kiosk.running:
+                frame = stream.latest
+                if frame is not None and frame is not last:
+                    last = frame
+                    ok, jpeg = cv2.imencode(".jpg", preview_frame(frame, width), [cv2.IMWRITE_JPEG_QUALITY, 75])
+                    if ok:
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg.tobytes() + b"\r\n")
+                time.sleep(1.0 / self.fps)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        # Keep per-request access lines out of the system log
+        pass
+
+
+def serve_mjpeg(kiosk, port):
+    PreviewHandler.kiosk = kiosk
+    server = ThreadingHTTPServer(("0.0.0.0", port), PreviewHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mjpeg", daemon=True).start()
+    log_message(f"📺 MJPEG preview on http://0.0.0.0:{port}/")
+    return server
+
+
+def run_tk_preview(kiosk, stop_event):
+    """Grid of live streams in one window (replaces main.py's single view)."""
+    import tkinter as tk
+    from PIL import Image, ImageTk
+
+    root = tk.Tk()
+    root.title("Attendance Kiosk")
+    columns = 2 if len(kiosk.streams) > 1 else 1
+    width = kiosk.settings["preview_width"] // columns
+    labels = []
+    for i, stream in enumerate(kiosk.streams):
+        label = tk.Label(root, text=stream.name, bg="#EDEDED")
+        label.grid(row=i // columns, column=i % columns, padx=5, pady=5)
+        labels.append(label)
+    shown = [None] * len(kiosk.streams)
+
+    def refresh():
+        if stop_event.is_set():
+            root.destroy()
+            return
+        for i, (stream, label) in enumerate(zip(kiosk.streams, labels)):
+            frame = stream.latest
+            if frame is not None and frame is not shown[i]:
+                shown[i] = frame
+                rgb = cv2.cvtColor(preview_frame(frame, width), cv2.COLOR_BGR2RGB)
+                label.imgtk = ImageTk.PhotoImage(image=Image.fromarray(rgb))
+                label.configure(image=label.imgtk)
+        root.after(50, refresh)
+
+    root.protocol("WM_DELETE_WINDOW", stop_event.set)
+    refresh()
+    root.mainloop()
+
+
+def main():
+    defaults = get_setting("kiosk", KIOSK_DEFAULTS)
+    parser = argparse.ArgumentParser(description="Headless multi-camera attendance service")
+    parser.add_argument("--source", action="append", metavar="[NAME=]SOURCE",
+                        help="Device index, RTSP URL or video file; repeat for more streams (default: config)")
+    parser.add_argument("--kelas", default=None, help="Class session for streams given with --source")
+    parser.add_argument("--workers", type=int, default=defaults["workers"])
+    parser.add_argument("--preview", choices=["none", "mjpeg", "tk"], default=defaults["preview"])
+    parser.add_argument("--port", type=int, default=defaults["mjpeg_port"])
+    parser.add_argument("--start-time", default=defaults["start_time"])
+    parser.add_argument("--end-time", default=defaults["end_time"])
+    parser.add_argument("--stats-interval", type=float, default=defaults["stats_interval"])
+    args = parser.parse_args()
+
+    settings = dict(defaults, workers=args.workers, start_time=args.start_time, end_time=args.end_time)
+    if args.source:
+        streams = []
+        for i, spec in enumerate(args.source):
+            name, sep, source = spec.partition("=")
+            if not sep or "/" in name or "\\" in name:
+                # No NAME= prefix ("=" inside a URL or path)
+                name, source = "", spec
+            stream = {"name": name or f"stream{i + 1}", "source": source}
+            if args.kelas is not None:
+                stream["kelas"] = args.kelas
+            streams.append(stream)
+        settings["streams"] = streams
+
+    kiosk = KioskServer(settings, annotate=args.preview != "none")
+    kiosk.start()
+    if args.preview == "mjpeg":
+        serve_mjpeg(kiosk, args.port)
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    def supervise():
+        last_stats = time.monotonic()
+        while not stop_event.wait(1.0):
+            kiosk.check_streams()
+            if args.stats_interval and time.monotonic() - last_stats >= args.stats_interval:
+                last_stats = time.monotonic()
+                kiosk.log_stats()
+
+    try:
+        if args.preview == "tk":
+            threading.Thread(target=supervise, name="supervisor", daemon=True).start()
+            run_tk_preview(kiosk, stop_event)
+        else:
+            supervise()
+    finally:
+        stop_event.set()
+        kiosk.stop()
+
+
+if __name__ == "__main__":
+    main()
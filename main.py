@@ -4,8 +4,17 @@ from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 import cv2
 
-from utils.data_manager import load_students, save_students, update_attendance_record
-from utils.face_utils import predict_student, save_face_snapshot
+from utils.data_manager import update_attendance_record, in_time_window
+from utils.storage import storage
+from utils.face_utils import detect_faces, recognize_faces, save_face_snapshot
+from utils.recognizer import engine
+from utils.metrics import FpsMeter
+from utils.video import FrameQueue, CameraGrabber, FrameWorker
+from utils.tracker import FaceTracker
+from utils.config import get_setting
+from utils.shards import SESSION_DEFAULTS
+from utils.snapshots import snapshots
+from utils.face_cache import recognition_cache
 
 class AttendanceApp:
     def __init__(self, root):
@@ -16,17 +25,23 @@ class AttendanceApp:
 
         self.start_time = "09:00"
         self.end_time = "23:59"
+        # Replaced as a whole when changed, so the worker thread never sees a half-updated session
+        self.session = get_setting("session", SESSION_DEFAULTS)
 
         self.menubar = tk.Menu(root, bg="#FFFFFF", bd=0)
         root.config(menu=self.menubar)
 
         self.settings_menu = tk.Menu(self.menubar, tearoff=0, bg="#FFFFFF")
         self.settings_menu.add_command(label="Set Time Range", command=self.set_time_range)
+        self.settings_menu.add_command(label="Set Class Session", command=self.set_session)
         self.menubar.add_cascade(label="Settings", menu=self.settings_menu)
 
         self.time_index = self.menubar.index("end") + 1
         self.menubar.add_cascade(label=f"Time Window: {self.start_time} → {self.end_time}")
 
+        self.session_index = self.menubar.index("end") + 1
+        self.menubar.add_cascade(label=self.session_label())
+
         self.frame_main = tk.Frame(root, bg="#F7F7F7")
         self.frame_main.pack(fill="both", expand=True, padx=20, pady=20)
 
@@ -56,9 +71,24 @@ class AttendanceApp:
         self.start_btn = ttk.Button(root, text="Start", style="TButton", command=self.start_system)
         self.start_btn.pack(pady=10)
 
-        self.cap = None
         self.students = None
         self.running = False
+        self.frames = None
+        self.grabber = None
+        self.worker = None
+
+        # Buffers reused across frames to avoid per-tick allocations
+        self._gray = None
+        self._rgba = None
+        self._pil_frame = None
+        self._photo = None
+
+        self.fps = FpsMeter()
+
+        # Run the cascade every few frames and follow faces with the tracker in between
+        self.detect_every = 3
+        self.frame_index = 0
+        self.tracker = FaceTracker()
 
     def set_time_range(self):
         """Dialog for selecting start & end time"""
@@ -95,40 +125,95 @@ class AttendanceApp:
 
         ttk.Button(dialog, text="Save", command=save_time).grid(row=2, column=0, columnspan=4, pady=10)
 
+    def session_label(self):
+        kelas = self.session["kelas"]
+        if not kelas:
+            return "Class: All"
+        return f"Class: {kelas}" + (" (+ fallback)" if self.session["fallback"] else "")
+
+    def set_session(self):
+        """Dialog for restricting recognition to one class roster"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Set Class Session")
+        dialog.geometry("300x150")
+        dialog.resizable(False, False)
+
+        all_classes = "All classes"
+        ttk.Label(dialog, text="Class").grid(row=0, column=0, padx=5, pady=5)
+        combo = ttk.Combobox(dialog, values=[all_classes] + storage.classes(), state="readonly", width=20)
+        combo.set(self.session["kelas"] or all_classes)
+        combo.grid(row=0, column=1, padx=5, pady=5)
+
+        fallback = tk.BooleanVar(value=self.session["fallback"])
+        ttk.Checkbutton(dialog, text="Fall back to all students", variable=fallback).grid(
+            row=1, column=0, columnspan=2, padx=5, pady=5
+        )
+
+        def save_session():
+            kelas = combo.get()
+            self.session = {"kelas": "" if kelas == all_classes else kelas, "fallback": fallback.get()}
+            self.menubar.entryconfig(self.session_index, label=self.session_label())
+            dialog.destroy()
+
+        ttk.Button(dialog, text="Save", command=save_session).grid(row=2, column=0, columnspan=2, pady=10)
+
     def start_system(self):
         self.start_btn.config(state="disabled")
         self.lbl_status.config(text="Loading model and students data...")
-        threading.Thread(target=self.load_and_run, daemon=True).start()
+        self._loader = threading.Thread(target=self.load_resources, daemon=True)
+        self._loader.start()
+        self.root.after(50, self.wait_for_resources)
 
-    def load_and_run(self):
+    def load_resources(self):
+        # Runs off the Tk thread; widgets are only touched from wait_for_resources
         try:
-            self.students = load_students()
-            self.lbl_status.config(text="Model loaded. Starting camera...")
-
-            self.cap = cv2.VideoCapture(0)
-            self.running = True
-            self.update_frame()
+            storage.recover()
+            self.students = storage
+            engine.current()
+            self._load_error = None
         except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.start_btn.config(state="normal")
+            self._load_error = e
 
-    def update_frame(self):
-        if not self.running:
+    def wait_for_resources(self):
+        if self._loader.is_alive():
+            self.root.after(50, self.wait_for_resources)
             return
 
-        ret, frame = self.cap.read()
-        if not ret:
-            self.lbl_status.config(text="Failed to access camera")
+        if self._load_error:
+            messagebox.showerror("Error", str(self._load_error))
+            self.start_btn.config(state="normal")
             return
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
+        self.lbl_status.config(text=f"Model loaded in {engine.load_ms:.0f} ms. Starting camera...")
+        self.frames = FrameQueue(maxsize=2)
+        self.grabber = CameraGrabber(0, self.frames)
+        self.worker = FrameWorker(self.frames, self.process_frame)
+        self.grabber.start()
+        self.worker.start()
+        self.running = True
+        self.update_frame()
+
+    def process_frame(self, frame):
+        """Detection, recognition and attendance for one frame (worker thread)."""
+        self._gray = gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        if self.frame_index % self.detect_every == 0:
+            tracks = self.tracker.update(detect_faces(gray))
+        else:
+            tracks = self.tracker.advance()
+        self.frame_index += 1
 
         detected_name, detected_conf = None, None
 
-        for (x, y, w, h) in faces:
-            student, conf = predict_student(gray[y:y+h, x:x+w], self.students)
+        # All faces due for recognition go through one batched search
+        pending = [track for track in tracks if self.tracker.needs_recognition(track)]
+        recognized = recognize_faces(gray, [t.box for t in pending], self.students, session=self.session)
+        for track, (_, student, conf) in zip(pending, recognized):
+            track.add_vote(student, conf)
+
+        for track in tracks:
+            student, conf, _ = track.identity()
+            x, y, w, h = track.box
 
             if student:
                 detected_name = student['nama']
@@ -138,10 +223,16 @@ class AttendanceApp:
                             cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
                 cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
 
-                updated, now = update_attendance_record(student, self.start_time, self.end_time)
-                if updated:
-                    save_face_snapshot(student, frame, (x, y, w, h), now)
-                    save_students(self.students)
+                # Only count attendance once the vote has settled on this student
+                if not track.checked_in and self.tracker.is_stable(track):
+                    updated, now = update_attendance_record(student, self.start_time, self.end_time)
+                    if updated:
+                        track.checked_in = True
+                        save_face_snapshot(student, frame, track.box, now)
+                    elif in_time_window(self.start_time, self.end_time, now):
+                        # Refused by the cooldown: don't retry this track.
+                        # Outside the window it is retried once the window opens.
+                        track.checked_in = True
             else:
                 detected_name = "Unknown"
                 detected_conf = conf
@@ -150,28 +241,77 @@ class AttendanceApp:
                             cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
                 cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
 
-        if detected_name:
-            self.lbl_name.config(text=f"Name: {detected_name}")
-            self.lbl_conf.config(text=f"Confidence: {detected_conf:.0f}" if detected_conf else "")
-            self.lbl_status.config(text="Detected")
-        else:
-            self.lbl_name.config(text="")
-            self.lbl_conf.config(text="")
-            self.lbl_status.config(text="No face detected")
+        return frame, detected_name, detected_conf
 
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(frame_rgb)
-        imgtk = ImageTk.PhotoImage(image=img)
-        self.lbl_video.imgtk = imgtk
-        self.lbl_video.configure(image=imgtk)
+    def update_frame(self):
+        """Tk-side consumer: paints the newest annotated frame, if any."""
+        if not self.running:
+            return
+
+        if self.grabber.error:
+            self.lbl_status.config(text=self.grabber.error)
+            return
+
+        result = self.worker.take_latest()
+        if result:
+            frame, detected_name, detected_conf = result
+
+            if detected_name:
+                self.lbl_name.config(text=f"Name: {detected_name}")
+                self.lbl_conf.config(text=f"Confidence: {detected_conf:.0f}" if detected_conf else "")
+                self.lbl_status.config(text="Detected")
+            else:
+                self.lbl_name.config(text="")
+                self.lbl_conf.config(text="")
+                self.lbl_status.config(text="No face detected")
+
+            self.draw_fps_overlay(frame)
+            self.render(frame)
 
         self.root.after(10, self.update_frame)
 
+    def pipeline_stats(self):
+        stats = self.frames.stats()
+        stats["processed"] = self.worker.processed
+        stats["worker"] = self.worker.latency.snapshot()
+        stats["snapshots"] = snapshots.stats()
+        stats["cache"] = recognition_cache.stats()
+        return stats
+
+    def draw_fps_overlay(self, frame):
+        fps = self.fps.tick()
+        stats = self.pipeline_stats()
+        lines = [
+            f"{fps:.1f} FPS | {stats['worker']['last_ms']:.1f} ms",
+            f"queue {stats['depth']} | dropped {stats['dropped']}",
+            f"snapshots {stats['snapshots']['depth']} queued | {stats['snapshots']['write']['last_ms']:.0f} ms",
+            f"cache hit rate {stats['cache']['hit_rate']:.0%} ({stats['cache']['hits']} hits)",
+        ]
+        for i, text in enumerate(lines):
+            cv2.putText(frame, text, (10, 25 + 22 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+
+    def render(self, frame):
+        self._rgba = cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+        h, w = self._rgba.shape[:2]
+
+        if self._photo is None or (self._photo.width(), self._photo.height()) != (w, h):
+            # RGBA frombuffer shares memory with self._rgba, so later frames
+            # only need a cvtColor into the same array and a paste().
+            self._pil_frame = Image.frombuffer("RGBA", (w, h), self._rgba, "raw", "RGBA", 0, 1)
+            self._photo = ImageTk.PhotoImage(image=self._pil_frame)
+            self.lbl_video.imgtk = self._photo
+            self.lbl_video.configure(image=self._photo)
+        else:
+            self._photo.paste(self._pil_frame)
+
     def on_close(self):
         self.running = False
-        if self.cap:
-            self.cap.release()
-        save_students(self.students) if self.students else None
+        if self.grabber:
+            self.grabber.stop()
+            self.worker.stop()
+            self.grabber.join(timeout=1)
+        snapshots.close()
+        storage.close()
         self.root.destroy()
 
 
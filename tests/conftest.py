@@ -0,0 +1,5 @@
+import os, sys
+
+# Modules import each other both as `utils.x` and plain `x`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+
+from utils.analytics import AttendanceCube, ANALYTICS_DEFAULTS
+from utils.registry import STUDENT_COLUMNS
+from utils.storage import SqliteStorage
+
+
+def _students(*rows):
+    return pd.DataFrame([dict(zip(STUDENT_COLUMNS, row)) for row in rows], columns=STUDENT_COLUMNS)
+
+
+@pytest.fixture
+def store(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "attendance.db"))
+    storage.save_students_df(_students(
+        (100000, "Ani", "IPA", 0, "", "", ""),
+        (100001, "Budi", "IPA", 0, "", "", ""),
+    ))
+    yield storage
+    storage.close()
+
+
+def _checkin(storage, student_id, timestamp):
+    student = storage.get(student_id)
+    student["waktu_kehadiran"] = timestamp
+    return storage.record_checkins([student])
+
+
+def test_notify_folds_in_new_rows(store, monkeypatch):
+    cube = AttendanceCube(source=store, settings=ANALYTICS_DEFAULTS)
+    cube.rebuild()
+    # Our own rows are applied without reading the history back
+    monkeypatch.setattr(store, "attendance_page", lambda *a: pytest.fail("history re-read"))
+    recorded = _checkin(store, 100000, "2025-09-01 09:05:00")
+    cube.notify(recorded)
+    recorded = _checkin(store, 100001, "2025-09-01 09:30:00")
+    cube.notify(recorded)
+
+    assert cube.covered == store.attendance_count() == 2
+    summary = cube.class_summary("IPA", "2025-09")
+    assert (summary["present"], summary["late"], summary["sessions"]) == (2, 1, 1)
+    assert summary["rate"] == 1.0
+
+
+def test_notify_falls_back_to_sync_when_out_of_step(store):
+    cube = AttendanceCube(source=store, settings=ANALYTICS_DEFAULTS)
+    cube.rebuild()
+    _checkin(store, 100001, "2025-09-01 09:00:00")  # e.g. another process
+    cube.notify(_checkin(store, 100000, "2025-09-01 09:01:00"))
+    assert cube.class_summary("IPA", "2025-09")["present"] == 2
+
+
+def test_new_students_count_towards_rates(store):
+    cube = AttendanceCube(source=store, settings=ANALYTICS_DEFAULTS)
+    cube.rebuild()
+    cube.notify(_checkin(store, 100000, "2025-09-01 09:00:00"))
+    assert cube.class_summary("IPA")["rate"] == 0.5
+
+    store.save_students_df(_students(
+        (100000, "Ani", "IPA", 1, "", "", "2025-09-01 09:00:00"),
+        (100001, "Budi", "IPA", 0, "", "", ""),
+        (100002, "Cici", "IPA", 0, "", "", ""),
+        (100003, "Dodi", "IPA", 0, "", "", ""),
+    ))
+    cube.reload_students()
+    summary = cube.class_summary("IPA")
+    assert summary["students"] == 4
+    assert summary["rate"] == 0.25
+
+
+def test_attendance_count_tracks_appends_and_rewrites(store):
+    for minute in range(3):
+        _checkin(store, 100000, f"2025-09-01 09:0{minute}:00")
+    assert store.attendance_count() == 3
+    _checkin(store, 100001, "2025-09-01 10:00:00")
+    assert store.attendance_count() == 4
+
+    conn = store._connect()
+    conn.execute("DELETE FROM attendance")
+    conn.execute("INSERT INTO attendance (student_id, name, timestamp) VALUES (100000, 'Ani', '2025-09-02 09:00:00')")
+    assert store.attendance_count() == 1
+
+
+def test_unknown_ids_reload_students_at_most_once_per_sync(store, monkeypatch):
+    # Check-ins of students deleted since, e.g. a graduated class
+    conn = store._connect()
+    conn.executemany(
+        "INSERT INTO attendance (student_id, name, timestamp) VALUES (?, 'gone', '2025-09-01 09:00:00')",
+        [(200000 + i,) for i in range(20)],
+    )
+    loads = []
+    list_students = store.list_students
+    monkeypatch.setattr(store, "list_students", lambda: loads.append(1) or list_students())
+
+    cube = AttendanceCube(source=store, settings=ANALYTICS_DEFAULTS)
+    cube.rebuild()
+    assert len(loads) == 1
+    assert len(cube.unknown) == 20
+    assert cube.class_sizes["*"] == 2
+
+    conn.execute("INSERT INTO attendance (student_id, name, timestamp) VALUES (200020, 'gone', '2025-09-02 09:00:00')")
+    cube.sync()
+    assert len(loads) == 2
+    cube.notify(_checkin(store, 100000, "2025-09-02 09:00:00"))
+    assert len(loads) == 2
@@ -0,0 +1,99 @@
+import asyncio, io, zipfile
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from utils.workers import BoundedExecutor, QueueFull
+
+
+def _png(seed, size=(240, 320)):
+    gray = np.random.default_rng(seed).integers(0, 255, size, dtype=np.uint8)
+    return cv2.imencode(".png", gray)[1].tobytes()
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pool = BoundedExecutor(4, 256, name="test-recognition")
+    monkeypatch.setattr(api, "pool", pool)
+    monkeypatch.setitem(api.API_SETTINGS, "batch_max_images", 100)
+    yield TestClient(api.app)
+    pool.shutdown()
+
+
+def test_predict_batch_concurrent_images(client):
+    files = [("images", (f"{i}.png", _png(i), "image/png")) for i in range(24)]
+    for _ in range(3):
+        response = client.post("/predict/batch", files=files)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["image_count"] == 24
+        assert [entry.get("error") for entry in body["images"]] == [None] * 24
+
+
+def test_predict_batch_rejects_too_many_zip_members(client, monkeypatch):
+    monkeypatch.setitem(api.API_SETTINGS, "batch_max_images", 2)
+    archive = _zip([(f"{i}.png", _png(i)) for i in range(3)])
+    response = client.post("/predict/batch", files=[("images", ("faces.zip", archive, "application/zip"))])
+    assert response.status_code == 413
+
+
+def test_predict_batch_rejects_oversized_zip_before_reading(client, monkeypatch):
+    monkeypatch.setitem(api.API_SETTINGS, "batch_max_bytes", 1024 * 1024)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("zip member decompressed")
+
+    monkeypatch.setattr(zipfile.ZipFile, "read", fail)
+    bomb = _zip([("bomb.png", bytes(50 * 1024 * 1024))])
+    response = client.post("/predict/batch", files=[("images", ("bomb.zip", bomb, "application/zip"))])
+    assert response.status_code == 413
+    assert "too large" in response.json()["error"]
+
+
+class FillingPool:
+    """Accepts the zip expansion and one image, then reports a full queue."""
+
+    workers = 4
+
+    def __init__(self):
+        self.images = 0
+        self.active = 0
+
+    async def run(self, fn, *args):
+        if fn is not api.recognize_all_faces:
+            return fn(*args)
+        self.images += 1
+        if self.images == 2:
+            raise QueueFull("full")
+        self.active += 1
+        try:
+            await asyncio.sleep(0.5)
+            return []
+        finally:
+            self.active -= 1
+
+
+def test_predict_batch_queue_full_cancels_siblings(monkeypatch):
+    pool = FillingPool()
+    monkeypatch.setattr(api, "pool", pool)
+    # Images still on the pool when the 429 is built
+    active = []
+    busy_response = api.busy_response
+    monkeypatch.setattr(api, "busy_response", lambda e: active.append(pool.active) or busy_response(e))
+
+    files = [("images", (f"{i}.png", _png(i), "image/png")) for i in range(8)]
+    response = TestClient(api.app).post("/predict/batch", files=files)
+    assert response.status_code == 429
+    assert active == [0]
+    assert pool.images < 8
@@ -0,0 +1,73 @@
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from utils.cooldown import CooldownIndex
+from utils.registry import STUDENT_COLUMNS
+from utils.storage import SqliteStorage, TIME_FORMAT
+
+
+def test_concurrent_claims_count_once():
+    index = CooldownIndex()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def claim():
+        barrier.wait()
+        results.append(index.claim(100000, 1_000_000, 600))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(r is not None for r in results) == 1
+
+
+def test_claim_respects_window_and_stored_checkin():
+    index = CooldownIndex()
+    stored = datetime(2025, 9, 1, 9, 0, 0)
+    now = int(stored.timestamp())
+    assert index.claim(100000, now + 60, 600, stored.strftime(TIME_FORMAT)) is None
+    assert index.claim(100000, now + 600, 600, stored.strftime(TIME_FORMAT)) == now
+
+
+def test_release_undoes_claim():
+    index = CooldownIndex()
+    previous = index.claim(100000, 1_000_000, 600)
+    index.release(100000, previous)
+    assert index.claim(100000, 1_000_010, 600) is not None
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "attendance.db")
+    storage = SqliteStorage(path)
+    storage.save_students_df(pd.DataFrame(
+        [dict(zip(STUDENT_COLUMNS, (100000, "Ani", "IPA", 0, "", "", "")))], columns=STUDENT_COLUMNS
+    ))
+    storage.close()
+    return path
+
+
+def test_sqlite_cooldown_across_writers(db):
+    # Two storages on one database stand in for the kiosk and API processes
+    kiosk, api = SqliteStorage(db), SqliteStorage(db)
+    try:
+        now = datetime(2025, 9, 1, 9, 0, 0)
+        first = {**kiosk.get(100000), "waktu_kehadiran": now.strftime(TIME_FORMAT)}
+        second = {**api.get(100000), "waktu_kehadiran": (now + timedelta(seconds=30)).strftime(TIME_FORMAT)}
+        assert kiosk.record_checkins([first], cooldown=600) == [first]
+        assert api.record_checkins([second], cooldown=600) == []
+        # The refused student is synced to the stored row
+        assert second["waktu_kehadiran"] == now.strftime(TIME_FORMAT)
+
+        later = {**api.get(100000), "waktu_kehadiran": (now + timedelta(minutes=10)).strftime(TIME_FORMAT)}
+        assert api.record_checkins([later], cooldown=600) == [later]
+        assert kiosk.get(100000)["total_kehadiran"] == 2
+        assert kiosk.attendance_count() == 2
+    finally:
+        kiosk.close()
+        api.close()
@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import utils.face_utils as face_utils
+from utils.face_utils import detect_faces, get_face_cascade, STILL_DETECTION
+
+
+def _frames():
+    rng = np.random.default_rng(0)
+    sizes = [(240, 320), (300, 400), (360, 480), (200, 260)]
+    return [rng.integers(0, 255, size, dtype=np.uint8) for size in sizes * 6]
+
+
+def test_detect_faces_is_thread_safe():
+    # A shared CascadeClassifier fails here with cv2.error (-215) in getScaleData
+    frames = _frames() * 3
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda gray: detect_faces(gray, STILL_DETECTION), frames))
+    assert len(results) == len(frames)
+
+
+def test_cascade_is_per_thread():
+    cascades = []
+    thread = threading.Thread(target=lambda: cascades.append(get_face_cascade()))
+    thread.start()
+    thread.join()
+    assert get_face_cascade() is get_face_cascade()
+    assert cascades[0] is not get_face_cascade()
+
+
+def test_stills_are_detected_at_full_resolution(monkeypatch):
+    shapes = []
+
+    class Recorder:
+        def detectMultiScale(self, image, **kwargs):
+            shapes.append(image.shape)
+            return ()
+
+    monkeypatch.setattr(face_utils, "get_face_cascade", Recorder)
+    detect_faces(np.zeros((3000, 4000), dtype=np.uint8), STILL_DETECTION)
+    detect_faces(np.zeros((480, 1280), dtype=np.uint8), {**STILL_DETECTION, "width": 640})
+    assert shapes == [(3000, 4000), (240, 640)]
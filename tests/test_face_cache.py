@@ -0,0 +1,75 @@
+import numpy as np
+
+from utils.face_cache import RecognitionCache, CACHE_DEFAULTS
+
+
+class FakeEngine:
+    def __init__(self):
+        self.version = 1
+        self.shard_loads = 0
+
+    def generation(self, kelas=None):
+        return self.version, self.shard_loads
+
+
+def _face(seed):
+    return np.random.default_rng(seed).integers(0, 255, (200, 200), dtype=np.uint8)
+
+
+def _cache(**overrides):
+    model = FakeEngine()
+    return RecognitionCache({**CACHE_DEFAULTS, **overrides}, model=model), model
+
+
+def test_hit_after_store():
+    cache, _ = _cache()
+    faces = np.stack([_face(1)])
+    keys, results, generation = cache.lookup(faces, (1,))
+    assert results == [None]
+    cache.store((1,), keys[0], [(100000, 12.0)], generation)
+    _, results, _ = cache.lookup(faces, (1,))
+    assert results == [[(100000, 12.0)]]
+    assert cache.stats()["hits"] == 1
+
+
+def test_model_swap_invalidates():
+    cache, model = _cache()
+    faces = np.stack([_face(1)])
+    keys, _, generation = cache.lookup(faces, (1,))
+    cache.store((1,), keys[0], [(100000, 12.0)], generation)
+
+    model.version += 1
+    assert cache.lookup(faces, (1,))[1] == [None]
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_shard_reload_invalidates():
+    cache, model = _cache()
+    faces = np.stack([_face(1)])
+    keys, _, generation = cache.lookup(faces, (1, "IPA", True, 60), "IPA")
+    cache.store((1, "IPA", True, 60), keys[0], [(100000, 12.0)], generation)
+
+    model.shard_loads += 1
+    assert cache.lookup(faces, (1, "IPA", True, 60), "IPA")[1] == [None]
+
+
+def test_store_from_replaced_model_is_dropped():
+    cache, model = _cache()
+    faces = np.stack([_face(1)])
+    keys, _, generation = cache.lookup(faces, (1,))
+    # Another thread sees the new model before this search finishes
+    model.version += 1
+    cache.lookup(np.stack([_face(2)]), (1,))
+    cache.store((1,), keys[0], [(100000, 12.0)], generation)
+
+    assert cache.lookup(faces, (1,))[1] == [None]
+    assert cache.stats()["stale"] == 1
+
+
+def test_exact_match_only_by_default():
+    cache, _ = _cache()
+    faces = np.stack([_face(1)])
+    keys, _, generation = cache.lookup(faces, (1,))
+    neighbour = keys[0] ^ 1  # one bit away
+    cache.store((1,), neighbour, [(100001, 10.0)], generation)
+    assert cache.lookup(faces, (1,))[1] == [None]
@@ -0,0 +1,86 @@
+import pytest
+
+from utils.journal import AttendanceJournal
+from utils.registry import StudentRegistry, STUDENT_COLUMNS
+
+STUDENTS = ",".join(STUDENT_COLUMNS) + "\n100000,Ani,IPA,3,,,\n100001,Budi,IPS,0,,,\n"
+
+
+@pytest.fixture
+def paths(tmp_path):
+    students = tmp_path / "students.csv"
+    students.write_text(STUDENTS, encoding="utf-8")
+    return str(students), str(tmp_path / "history.csv"), str(tmp_path / "checkpoint.json")
+
+
+def _open(paths):
+    students, history, checkpoint = paths
+    registry = StudentRegistry(students, check_interval=0)
+    registry.refresh(force=True)
+    journal = AttendanceJournal(history, registry, checkpoint, checkpoint_every=10**6, checkpoint_interval=10**6)
+    return registry, journal
+
+
+def _checkin(registry, journal, student_id, timestamp):
+    student = registry.get(student_id)
+    student["total_kehadiran"] = student["total_kehadiran"] + 1
+    student["waktu_kehadiran"] = timestamp
+    journal.record(student)
+
+
+def _crash(journal):
+    # Stop without the final checkpoint close() would write
+    journal._stop.set()
+    journal._wake.set()
+    journal._thread.join(timeout=2)
+    journal._file.close()
+    journal._file = None
+
+
+def test_recover_replays_checkins_after_last_checkpoint(paths):
+    registry, journal = _open(paths)
+    _checkin(registry, journal, 100000, "2025-09-01 09:00:00")
+    journal.checkpoint()
+    _checkin(registry, journal, 100000, "2025-09-02 09:00:00")
+    _checkin(registry, journal, 100001, "2025-09-02 09:05:00")
+    _crash(journal)
+
+    registry, journal = _open(paths)
+    assert registry.get(100000)["total_kehadiran"] == 4  # checkpoint only
+    assert journal.recover() == 2
+    assert registry.get(100000)["total_kehadiran"] == 5
+    assert registry.get(100001)["waktu_kehadiran"] == "2025-09-02 09:05:00"
+
+    # The replay was checkpointed, so a second recovery has nothing to do
+    registry, journal = _open(paths)
+    assert journal.recover() == 0
+    assert registry.get(100000)["total_kehadiran"] == 5
+
+
+def test_recover_skips_torn_line(paths):
+    registry, journal = _open(paths)
+    _checkin(registry, journal, 100000, "2025-09-01 09:00:00")
+    journal.checkpoint()
+    _crash(journal)
+    with open(paths[1], "a", encoding="utf-8") as f:
+        f.write("100001,Budi,2025-09")  # crashed mid-write
+
+    registry, journal = _open(paths)
+    assert journal.recover() == 0
+    _checkin(registry, journal, 100001, "2025-09-03 09:00:00")
+    journal.close()
+    with open(paths[1], encoding="utf-8") as f:
+        assert f.read().splitlines()[-1] == "100001,Budi,2025-09-03 09:00:00,Present"
+
+
+def test_recover_ignores_students_csv_edited_elsewhere(paths):
+    registry, journal = _open(paths)
+    journal.checkpoint()
+    _checkin(registry, journal, 100000, "2025-09-01 09:00:00")
+    _crash(journal)
+    with open(paths[0], "a", encoding="utf-8") as f:
+        f.write("100002,Cici,IPA,0,,,\n")
+
+    registry, journal = _open(paths)
+    assert journal.recover() == 0
+    assert registry.get(100000)["total_kehadiran"] == 3
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from kiosk_server import KioskServer, KIOSK_DEFAULTS
+
+
+def _server(streams=4):
+    settings = {**KIOSK_DEFAULTS, "detect_every": 1,
+                "streams": [{"name": f"cam{i}", "source": f"rtsp://cam{i}/"} for i in range(streams)]}
+    return KioskServer(settings)
+
+
+def _frames(seed, count=6):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 255, (240, 320, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def test_streams_process_concurrently():
+    server = _server()
+
+    def run(stream):
+        for frame in _frames(len(stream.name)):
+            server.process(stream, frame)
+        return stream.frame_index
+
+    with ThreadPoolExecutor(len(server.streams)) as pool:
+        assert list(pool.map(run, server.streams)) == [6] * len(server.streams)
+
+
+def test_scheduler_round_robin():
+    server = _server(streams=3)
+    for stream in server.streams:
+        stream.frames.put(_frames(0, 1)[0])
+
+    served = []
+    for _ in range(3):
+        stream, _ = server.scheduler.acquire(timeout=0)
+        served.append(stream.name)
+        # Busy streams are skipped until released
+        assert stream.busy
+    assert served == ["cam0", "cam1", "cam2"]
+    assert server.scheduler.acquire(timeout=0) is None
@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils.lbp_matcher import LBPMatcher, lbp_histograms
+from utils.recognizer import OpenCVModel, create_lbph, LBPH_PARAMS
+
+
+def _faces(rng, base, count):
+    noise = rng.normal(0, 12, (count, *base.shape))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    bases = [cv2.GaussianBlur(rng.integers(0, 255, (200, 200)).astype(np.float64), (0, 0), 3) for _ in range(8)]
+    faces, labels = [], []
+    for label, base in enumerate(bases):
+        faces.extend(_faces(rng, base, 3))
+        labels += [100000 + label] * 3
+    recognizer = create_lbph()
+    recognizer.train(faces, np.array(labels, dtype=np.int32))
+    path = str(tmp_path_factory.mktemp("model") / "face_model.yml")
+    recognizer.write(path)
+    queries = np.stack([_faces(rng, base, 1)[0] for base in bases] + [rng.integers(0, 255, (200, 200), dtype=np.uint8)])
+    return recognizer, path, queries
+
+
+def test_histograms_match_opencv(trained):
+    recognizer, _, _ = trained
+    rng = np.random.default_rng(1)
+    face = rng.integers(0, 255, (200, 200), dtype=np.uint8)
+    probe = create_lbph()
+    probe.train([face], np.array([1], dtype=np.int32))
+    ours = lbp_histograms(face[None], **LBPH_PARAMS)[0]
+    np.testing.assert_allclose(ours, probe.getHistograms()[0].ravel(), atol=1e-6)
+
+
+def test_matcher_agrees_with_opencv_predict(trained):
+    recognizer, _, queries = trained
+    matcher = LBPMatcher.from_recognizer(recognizer)
+    for face, matches in zip(queries, matcher.search(queries, k=1)):
+        label, distance = recognizer.predict(face)
+        assert matches[0][0] == label
+        assert matches[0][1] == pytest.approx(distance, rel=1e-4)
+
+
+def test_top_k_starts_with_the_best_match(trained):
+    recognizer, _, queries = trained
+    matcher = LBPMatcher.from_recognizer(recognizer)
+    for top1, top3 in zip(matcher.search(queries, k=1), matcher.search(queries, k=3)):
+        assert len(top3) == 3
+        assert top3[0] == top1[0]
+        assert len({label for label, _ in top3}) == 3
+
+
+def test_opencv_model_keeps_predict_for_single_best_match(trained):
+    recognizer, path, queries = trained
+    model = OpenCVModel(path)
+    results = model.search(queries, 1)
+    assert model._matcher is None  # the NumPy matcher was not needed
+    assert [r[0][0] for r in results] == [recognizer.predict(face)[0] for face in queries]
+    assert len(model.search(queries, 3)[0]) == 3
@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+import utils.logger as logger
+from utils.logger import LogWriter, LOGGING_DEFAULTS, normalize_level
+
+
+@pytest.mark.parametrize("level, expected", [
+    ("warn", "WARNING"), ("WARNING", "WARNING"), ("critical", "ERROR"), ("debug", "DEBUG"), ("verbose", "INFO"),
+])
+def test_normalize_level(level, expected):
+    assert normalize_level(level) == expected
+
+
+def test_unknown_levels_do_not_raise(tmp_path, monkeypatch):
+    writer = LogWriter(str(tmp_path / "system.txt"), str(tmp_path / "system.jsonl"),
+                       {**LOGGING_DEFAULTS, "level": "warn"})
+    monkeypatch.setattr(logger, "writer", writer)
+
+    logger.log_message("kept", level="WARN")
+    logger.log_message("dropped", level="verbose")
+    logger.log_message("❌ inferred")
+    writer.flush()
+
+    with open(tmp_path / "system.jsonl", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [(e["msg"], e["level"]) for e in entries] == [("kept", "WARNING"), ("❌ inferred", "ERROR")]
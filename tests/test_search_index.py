@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from utils.search_index import SearchIndex, STUDENT_FIELDS, HISTORY_FIELDS
+
+STUDENTS = pd.DataFrame({
+    "id": [100000, 100001, 100002, 100003],
+    "nama": ["Ani", "Budi", "Cici", "Dodi"],
+    "kelas": ["IPA", "IPS", "IPA", "TI"],
+    "total_kehadiran": [2, 5, 10, 0],
+    "email": ["", "budi@example.com", "", ""],
+    "nomor_telepon": ["", "", "", ""],
+    "waktu_kehadiran": ["2025-09-01 09:00:00", "2025-09-15 09:10:00", "2025-10-01 08:55:00", ""],
+})
+
+
+def ids(df):
+    return df["id"].tolist()
+
+
+@pytest.fixture
+def index():
+    return SearchIndex(STUDENTS, STUDENT_FIELDS)
+
+
+def test_numeric_comparisons(index):
+    assert ids(index.search("total>=5")) == [100001, 100002]
+    assert ids(index.search("total>5")) == [100002]
+    assert ids(index.search("total<5")) == [100000, 100003]
+    assert ids(index.search("total<=2")) == [100000, 100003]
+
+
+def test_numeric_ranges_and_exact(index):
+    assert ids(index.search("total:3..10")) == [100001, 100002]
+    assert ids(index.search("total:..2")) == [100000, 100003]
+    assert ids(index.search("total:10")) == [100002]
+    assert ids(index.search("id:100001..100002")) == [100001, 100002]
+
+
+def test_numeric_strings_compare_as_numbers():
+    history = pd.DataFrame({
+        "id": ["9", "10", "100"], "name": ["a", "b", "c"],
+        "timestamp": ["2025-09-01 09:00:00"] * 3, "status": ["Present"] * 3,
+    })
+    assert SearchIndex(history, HISTORY_FIELDS).search("id>=10")["id"].tolist() == ["10", "100"]
+
+
+def test_text_and_date_terms(index):
+    assert ids(index.search("id:1000*")) == [100000, 100001, 100002, 100003]
+    assert ids(index.search("kelas:ipa date:2025-09")) == [100000]
+    assert ids(index.search("date:2025-09..2025-10")) == [100000, 100001, 100002]
+    assert ids(index.search("budi")) == [100001]
+
+
+def test_numeric_field_rejects_text_bound(index):
+    with pytest.raises(ValueError):
+        index.search("total>=many")
@@ -0,0 +1,120 @@
+import pytest
+
+from utils.journal import AttendanceJournal
+from utils.registry import StudentRegistry, STUDENT_COLUMNS
+from utils.storage import CsvStorage, SqliteStorage, migrate_csv_to_sqlite
+
+STUDENTS = ",".join(STUDENT_COLUMNS) + (
+    "\n100000,Ani,IPA,2,ani@example.com,0812,2025-09-02 09:00:00"
+    "\n100001,Budi,IPS,0,,,\n"
+)
+HISTORY = (
+    "id,name,timestamp,status\n"
+    "100000,Ani,2025-09-01 09:00:00,Present\n"
+    "100000,Ani,2025-09-02 09:00:00,Present\n"
+)
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    students, history = tmp_path / "students.csv", tmp_path / "history.csv"
+    students.write_text(STUDENTS, encoding="utf-8")
+    history.write_text(HISTORY, encoding="utf-8")
+    return str(students), str(history)
+
+
+def _csv_storage(students, history, tmp_path):
+    registry = StudentRegistry(students, check_interval=0)
+    return CsvStorage(registry, AttendanceJournal(history, registry, str(tmp_path / "checkpoint.json")))
+
+
+def test_migrate_matches_csv_backend(csv_files, tmp_path):
+    db = str(tmp_path / "attendance.db")
+    assert migrate_csv_to_sqlite(db, *csv_files) == (2, 2)
+
+    source = _csv_storage(*csv_files, tmp_path)
+    target = SqliteStorage(db)
+    try:
+        # Empty CSV cells are stored as NULL
+        migrated = {sid: {k: "" if v is None else v for k, v in s.items()} for sid, s in target.list_students().items()}
+        assert migrated == source.list_students()
+        assert target.attendance_df().astype(str).values.tolist() == source.attendance_df().astype(str).values.tolist()
+        assert target.classes() == source.classes() == ["IPA", "IPS"]
+    finally:
+        target.close()
+
+
+def test_migrate_refuses_to_overwrite(csv_files, tmp_path):
+    db = str(tmp_path / "attendance.db")
+    migrate_csv_to_sqlite(db, *csv_files)
+    with pytest.raises(RuntimeError):
+        migrate_csv_to_sqlite(db, *csv_files)
+    assert migrate_csv_to_sqlite(db, *csv_files, force=True) == (2, 2)
+
+    target = SqliteStorage(db)
+    try:
+        assert len(target.attendance_df()) == 2
+    finally:
+        target.close()
+
+
+@pytest.fixture
+def db(csv_files, tmp_path):
+    path = str(tmp_path / "attendance.db")
+    migrate_csv_to_sqlite(path, *csv_files)
+    return path
+
+
+def test_manager_save_keeps_concurrent_checkins(db):
+    manager, kiosk = SqliteStorage(db), SqliteStorage(db)
+    try:
+        df = manager.students_df()
+
+        student = kiosk.get(100001)
+        student["waktu_kehadiran"] = "2025-09-03 09:00:00"
+        kiosk.record_checkins([student])
+
+        df.loc[df["id"] == 100000, "email"] = "ani@school.example"
+        assert manager.save_students_df(df) == []
+
+        budi = manager.get(100001)
+        assert (budi["total_kehadiran"], budi["waktu_kehadiran"]) == (1, "2025-09-03 09:00:00")
+        assert manager.get(100000)["email"] == "ani@school.example"
+    finally:
+        manager.close()
+        kiosk.close()
+
+
+def test_manager_save_skips_rows_edited_elsewhere(db):
+    manager, other = SqliteStorage(db), SqliteStorage(db)
+    try:
+        df = manager.students_df()
+        other_df = other.students_df()
+        other_df.loc[other_df["id"] == 100000, "kelas"] = "IPS"
+        other_df.loc[len(other_df)] = [100002, "Cici", "IPA", 0, None, None, None]
+        other.save_students_df(other_df)
+
+        df.loc[df["id"] == 100000, "kelas"] = "Bahasa"
+        df.loc[df["id"] == 100001, "nama"] = "Budi S."
+        assert manager.save_students_df(df) == [100000]
+
+        assert manager.get(100000)["kelas"] == "IPS"
+        assert manager.get(100001)["nama"] == "Budi S."
+        # Added by the other client after the manager loaded: kept
+        assert manager.get(100002)["nama"] == "Cici"
+    finally:
+        manager.close()
+        other.close()
+
+
+def test_manager_save_deletes_removed_students(db):
+    manager = SqliteStorage(db)
+    try:
+        df = manager.students_df()
+        assert manager.save_students_df(df[df["id"] != 100001]) == []
+        assert manager.get(100001) is None
+        assert manager.attendance_count() == 2
+        assert [tuple(map(str, row)) for row in manager.attendance_page(0, 10)][0] == (
+            "100000", "Ani", "2025-09-01 09:00:00", "Present")
+    finally:
+        manager.close()
@@ -0,0 +1,246 @@
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+try:
+    from config import get_setting
+    from logger import log_message
+    from storage import storage
+    from journal import HISTORY_COLUMNS
+except ImportError:
+    from utils.config import get_setting
+    from utils.logger import log_message
+    from utils.storage import storage
+    from utils.journal import HISTORY_COLUMNS
+
+# A student-day counts as late when its first check-in is after
+# start_time + late_after_minutes
+ANALYTICS_DEFAULTS = {"start_time": "09:00", "late_after_minutes": 15, "page_rows": 50000}
+ALL = "*"  # period key covering all time; also the class key for everyone
+FIELDS = ("present", "late", "checkins", "sessions")
+
+
+def _rollup():
+    return dict.fromkeys(FIELDS, 0)
+
+
+class AttendanceCube:
+    """Attendance rollups kept in step with the history.
+
+    The history is read once, then only rows appended since the last sync.
+    Per student-day it keeps the number of check-ins and the first one;
+    from those it maintains totals per (student, month), (class, month)
+    and (class, day), plus all-time and all-class buckets, so a query like
+    "attendance rate of IPA in 2025-09" is a couple of dict lookups.
+
+    present  = student-days with a check-in
+    late     = student-days whose first check-in was late
+    sessions = days the class had any check-in (rate denominator)
+    """
+
+    def __init__(self, source=storage, settings=None):
+        self.source = source
+        self.settings = settings or get_setting("analytics", ANALYTICS_DEFAULTS)
+        start = datetime.strptime(self.settings["start_time"], "%H:%M")
+        self.late_after = (start + timedelta(minutes=self.settings["late_after_minutes"])).strftime("%H:%M:%S")
+        self._lock = threading.RLock()
+        self.ready = False
+        self._reset()
+
+    def _reset(self):
+        self.covered = 0
+        self.classes = {}
+        self.unknown = set()  # ids in the history but not among the students
+        self._may_reload = True
+        self.class_sizes = Counter()
+        self.student_days = {}
+        self.students = {}
+        self.class_periods = {}
+        self.class_days = {}
+
+    def _load_classes(self):
+        self.classes = {str(sid): s.get("kelas") or "" for sid, s in self.source.list_students().items()}
+        self.class_sizes = Counter(self.classes.values())
+        self.class_sizes[ALL] = len(self.classes)
+        self.unknown.clear()
+
+    def reload_students(self):
+        """Pick up added, removed or re-classed students (rate denominators)."""
+        with self._lock:
+            if self.ready:
+                self._load_classes()
+
+    def _class_of(self, student_id):
+        kelas = self.classes.get(student_id)
+        if kelas is not None:
+            return kelas
+        if student_id in self.unknown:
+            return ""
+        # A student added since the last load: re-read the students, but
+        # at most once per sync (deleted students stay in the history)
+        if self._may_reload:
+            self._may_reload = False
+            self._load_classes()
+            kelas = self.classes.get(student_id)
+            if kelas is not None:
+                return kelas
+        self.unknown.add(student_id)
+        return ""
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+            self._load_classes()
+            self._may_reload = False
+            self.ready = True
+            try:
+                added = self._sync()
+            except Exception:
+                self.ready = False
+                raise
+        log_message(f"📊 Analytics built from {added} attendance rows")
+        return added
+
+    def sync(self):
+        """Fold in history rows appended since the last sync; returns how many."""
+        with self._lock:
+            if not self.ready:
+                return self.rebuild()
+            self._may_reload = True
+            return self._sync()
+
+    def _sync(self):
+        with self._lock:
+            total = self.source.attendance_count()
+            if total < self.covered:
+                # History was rewritten: start over
+                return self.rebuild()
+            added = 0
+            while self.covered < total:
+                rows = self.source.attendance_page(self.covered, min(self.settings["page_rows"], total - self.covered))
+                if not rows:
+                    break
+                self._apply(pd.DataFrame(rows, columns=HISTORY_COLUMNS).astype(str))
+                self.covered += len(rows)
+                added += len(rows)
+            return added
+
+    def notify(self, students=(), status="Present"):
+        """Called after check-ins are saved. When the history grew by exactly
+        these rows since the last sync, they are folded in directly instead
+        of being read back; otherwise (another writer got in between) this
+        falls back to sync()."""
+        if not self.ready:
+            return
+        with self._lock:
+            if not students or self.source.attendance_count() != self.covered + len(students):
+                self.sync()
+                return
+            rows = [(str(s["id"]), s["nama"], s["waktu_kehadiran"], status) for s in students]
+            self._may_reload = True
+            self._apply(pd.DataFrame(rows, columns=HISTORY_COLUMNS).astype(str))
+            self.covered += len(rows)
+
+    def _apply(self, chunk):
+        # Group by student-day with numpy: pandas' groupby min on strings
+        # falls back to a Python loop
+        ids = chunk["id"].to_numpy(dtype=str)
+        days = chunk["timestamp"].str[:10].to_numpy(dtype=str)
+        times = chunk["timestamp"].str[11:19].to_numpy(dtype=str)
+        codes, _ = pd.factorize(chunk["id"] + "|" + chunk["timestamp"].str[:10])
+        counts = np.bincount(codes)
+        order = np.argsort(times, kind="stable")
+        _, firsts = np.unique(codes[order], return_index=True)
+        firsts = order[firsts]  # earliest row of each student-day, by code
+        for student_id, day, first, count in zip(ids[firsts].tolist(), days[firsts].tolist(),
+                                                 times[firsts].tolist(), counts.tolist()):
+            self._add(student_id, day, count, first)
+
+    def _add(self, student_id, day, count, first):
+        entry = self.student_days.get((student_id, day))
+        if entry is None:
+            self.student_days[(student_id, day)] = [count, first]
+            present, late = 1, int(first > self.late_after)
+        else:
+            was_late = entry[1] > self.late_after
+            entry[0] += count
+            entry[1] = min(entry[1], first)
+            present, late = 0, int(entry[1] > self.late_after) - int(was_late)
+
+        kelas = self._class_of(student_id)
+        for period in (day[:7], ALL):
+            totals = self.students.setdefault((student_id, period), _rollup())
+            totals["present"] += present
+            totals["late"] += late
+            totals["checkins"] += count
+
+        for scope in {kelas, ALL}:
+            daily = self.class_days.setdefault((scope, day), _rollup())
+            new_session = daily["present"] == 0
+            daily["present"] += present
+            daily["late"] += late
+            daily["checkins"] += count
+            daily["sessions"] = 1
+            for period in (day[:7], ALL):
+                totals = self.class_periods.setdefault((scope, period), _rollup())
+                totals["present"] += present
+                totals["late"] += late
+                totals["checkins"] += count
+                totals["sessions"] += int(new_session)
+
+    def _rate(self, present, size, sessions):
+        return round(present / (size * sessions), 4) if size and sessions else 0.0
+
+    def class_summary(self, kelas=None, month=None):
+        """Totals and attendance rate for a class (None = all) in a month
+        ("YYYY-MM", None = all time)."""
+        with self._lock:
+            self.sync()
+            scope, period = kelas or ALL, month or ALL
+            totals = dict(self.class_periods.get((scope, period), _rollup()))
+            size = self.class_sizes.get(scope, 0)
+        totals.update(kelas=kelas, month=month, students=size,
+                      rate=self._rate(totals["present"], size, totals["sessions"]))
+        return totals
+
+    def student_summary(self, student_id, month=None):
+        """A student's present/late days and their rate against the days
+        their class met."""
+        student_id = str(student_id)
+        with self._lock:
+            self.sync()
+            period = month or ALL
+            totals = dict(self.students.get((student_id, period), _rollup()))
+            kelas = self.classes.get(student_id, "")
+            sessions = self.class_periods.get((kelas, period), _rollup())["sessions"]
+        totals.update(id=student_id, kelas=kelas, month=month, sessions=sessions,
+                      rate=self._rate(totals["present"], 1, sessions))
+        return totals
+
+    def daily(self, kelas=None, month=None):
+        """Per-day rows (day, present, late, checkins, rate) for a month."""
+        month = month or datetime.now().strftime("%Y-%m")
+        first = datetime.strptime(month, "%Y-%m")
+        with self._lock:
+            self.sync()
+            scope = kelas or ALL
+            size = self.class_sizes.get(scope, 0)
+            rows = []
+            day = first
+            while day.month == first.month:
+                totals = self.class_days.get((scope, day.strftime("%Y-%m-%d")))
+                if totals:
+                    rows.append({"day": day.strftime("%Y-%m-%d"), "present": totals["present"],
+                                 "late": totals["late"], "checkins": totals["checkins"],
+                                 "rate": self._rate(totals["present"], size, 1)})
+                day += timedelta(days=1)
+        return rows
+
+    def stats(self):
+        with self._lock:
+            return {"ready": self.ready, "rows": self.covered, "student_days": len(self.student_days)}
+
+
+analytics = AttendanceCube()
@@ -0,0 +1,128 @@
+import hashlib, os
+import numpy as np
+
+try:
+    from config import ANN_INDEX_PATH, get_setting
+except ImportError:
+    from utils.config import ANN_INDEX_PATH, get_setting
+
+# n_lists: 0 = about sqrt(gallery rows). n_probe: lists scanned per query,
+# higher is slower but closer to the exact result. Galleries smaller than
+# min_rows are always searched exactly.
+ANN_DEFAULTS = {"enabled": False, "n_lists": 0, "n_probe": 8, "min_rows": 2000, "iterations": 10}
+
+
+def _features(histograms):
+    # sqrt(h) turns chi-square-like similarity into Euclidean (Hellinger)
+    # distance, which k-means and a dot product can handle.
+    return np.sqrt(np.asarray(histograms, dtype=np.float32))
+
+
+def labels_digest(labels):
+    return hashlib.sha1(np.ascontiguousarray(labels, dtype=np.int32).tobytes()).hexdigest()
+
+
+def kmeans(features, k, iterations=10, seed=0, sample=None):
+    """Plain Lloyd's k-means. Returns (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    train = features
+    if sample and len(features) > sample:
+        train = features[rng.choice(len(features), sample, replace=False)]
+    centroids = train[rng.choice(len(train), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = assign_lists(train, centroids)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        order = np.argsort(assign, kind="stable")
+        starts = np.r_[0, np.cumsum(counts)[:-1]][filled]
+        sums = np.add.reduceat(train[order], starts, axis=0, dtype=np.float64)
+        centroids[filled] = (sums / counts[filled, None]).astype(np.float32)
+        # Re-seed empty lists from random points rather than losing them
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = train[rng.choice(len(train), len(empty), replace=False)]
+    return centroids
+
+
+def assign_lists(features, centroids, step=4096):
+    """Nearest centroid per row, by Euclidean distance."""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assign = np.empty(len(features), dtype=np.int64)
+    for start in range(0, len(features), step):
+        scores = np.asarray(features[start:start + step], dtype=np.float32) @ centroids.T - half_norms
+        assign[start:start + step] = scores.argmax(axis=1)
+    return assign
+
+
+class IVFIndex:
+    """Inverted-file index: gallery rows partitioned by k-means, so a query
+    only scans the rows in its `n_probe` nearest partitions."""
+
+    def __init__(self, centroids, order, offsets, digest):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.digest = digest
+        self._half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, histograms, labels, n_lists=0, iterations=10, seed=0):
+        rows = len(histograms)
+        n_lists = min(rows, n_lists or max(1, int(np.sqrt(rows))))
+        features = _features(histograms)
+        centroids = kmeans(features, n_lists, iterations, seed, sample=256 * n_lists)
+        assign = assign_lists(features, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.r_[0, np.cumsum(np.bincount(assign, minlength=n_lists))].astype(np.int64)
+        return cls(centroids, order, offsets, labels_digest(labels))
+
+    def candidates(self, histogram, n_probe):
+        """Gallery row indices in the n_probe partitions closest to a query."""
+        scores = _features(histogram) @ self.centroids.T - self._half_norms
+        n_probe = min(n_probe, self.n_lists)
+        lists = np.argpartition(-scores, n_probe - 1)[:n_probe] if n_probe < self.n_lists else np.arange(self.n_lists)
+        rows = np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+        # Sorted rows read the memmapped gallery front to back
+        rows.sort()
+        return rows
+
+    def matches(self, labels):
+        return self.digest == labels_digest(labels)
+
+    def save(self, path=ANN_INDEX_PATH):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, order=self.order, offsets=self.offsets, digest=np.array(self.digest))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=ANN_INDEX_PATH):
+        with np.load(path) as data:
+            return cls(data["centroids"], data["order"], data["offsets"], str(data["digest"]))
+
+
+def build_index(histograms, labels, settings=None, path=ANN_INDEX_PATH):
+    """Build and save an index when enabled and the gallery is large enough.
+    Returns the index, or None (any stale index file is removed)."""
+    settings = settings or get_setting("ann", ANN_DEFAULTS)
+    if not settings["enabled"] or len(histograms) < settings["min_rows"]:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    histograms = np.vstack([np.reshape(h, (1, -1)) for h in histograms])
+    index = IVFIndex.build(histograms, labels, settings["n_lists"], settings["iterations"])
+    index.save(path)
+    return index
+
+
+def load_index(labels, settings=None, path=ANN_INDEX_PATH):
+    """The saved index if enabled and built for exactly these labels, else None."""
+    settings = settings or get_setting("ann", ANN_DEFAULTS)
+    if not settings["enabled"] or len(labels) < settings["min_rows"] or not os.path.exists(path):
+        return None
+    index = IVFIndex.load(path)
+    return index if index.matches(labels) else None
@@ -1,4 +1,4 @@
-import os
+import os, json
 
 DATA_DIR = "Data"
 CACHE_DIR = os.path.join(DATA_DIR, ".cache")
@@ -7,9 +7,24 @@ IMAGES_DIR = os.path.join(DATA_DIR, "Images")
 
 CSV_PATH = os.path.join(DATA_DIR, "students.csv")
 MODEL_PATH = os.path.join(DATA_DIR, "face_model.yml")
+BINARY_MODEL_PATH = os.path.join(DATA_DIR, "face_model.lbph")
+ANN_INDEX_PATH = os.path.join(DATA_DIR, "face_model.ivf.npz")
+SHARDS_DIR = os.path.join(DATA_DIR, "shards")
 ATTENDANCE_PATH = os.path.join(DATA_DIR, "attendance_history.csv")
 LOG_PATH = os.path.join(CACHE_DIR, "system.txt")
 CONFIG_PATH = os.path.join(DATA_DIR, "config.json")
 
 for d in [IMAGES_DIR, DATA_DIR, LOGS_DIR, CACHE_DIR]:
-    os.makedirs(d, exist_ok=True)
\ No newline at end of file
+    os.makedirs(d, exist_ok=True)
+
+def load_config():
+    try:
+        with open(CONFIG_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def get_setting(section, defaults):
+    values = dict(defaults)
+    values.update(load_config().get(section, {}))
+    return values
\ No newline at end of file
@@ -0,0 +1,63 @@
+import threading
+from datetime import datetime
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _epoch(text):
+    try:
+        return int(datetime.strptime(text, TIME_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+class CooldownIndex:
+    """Last check-in per student as an epoch int, shared by every thread
+    of the process (kiosk worker, API pool).
+
+    claim() checks the cooldown and records the new check-in under one
+    lock, so two callers can never both count the same student inside the
+    window. waktu_kehadiran strings are parsed only when a student is
+    first seen or the stored value changed underneath (e.g. written by
+    another process), not on every check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}  # id -> epoch of the last counted check-in
+        self._seen = {}  # id -> last waktu_kehadiran string folded in
+
+    def _fold(self, student_id, stored):
+        # Caller holds the lock
+        if stored and self._seen.get(student_id) != stored:
+            self._seen[student_id] = stored
+            self._last[student_id] = max(self._last.get(student_id, 0), _epoch(stored))
+        return self._last.get(student_id, 0)
+
+    def claim(self, student_id, now, cooldown, stored=None):
+        """Record a check-in at epoch `now` unless the student's last one is
+        less than `cooldown` seconds old. Returns the previous epoch (for
+        release()) or None if the check-in is refused."""
+        student_id = str(student_id)
+        with self._lock:
+            last = self._fold(student_id, stored)
+            if last and now - last < cooldown:
+                return None
+            self._last[student_id] = now
+            return last
+
+    def release(self, student_id, previous):
+        """Undo a claim whose check-in could not be saved."""
+        with self._lock:
+            self._last[str(student_id)] = previous
+
+    def last(self, student_id):
+        with self._lock:
+            return self._last.get(str(student_id), 0)
+
+    def stats(self):
+        with self._lock:
+            return {"students": len(self._last)}
+
+
+cooldowns = CooldownIndex()
@@ -1,12 +1,17 @@
-import pandas as pd, os
-from datetime import datetime, timedelta
+import pandas as pd
+from datetime import datetime
+from functools import lru_cache
 
 try:
-    from config import CSV_PATH, ATTENDANCE_PATH
     from logger import log_message
+    from storage import storage
+    from analytics import analytics
+    from cooldown import cooldowns
 except ImportError:
-    from utils.config import CSV_PATH, ATTENDANCE_PATH
     from utils.logger import log_message
+    from utils.storage import storage
+    from utils.analytics import analytics
+    from utils.cooldown import cooldowns
 
 
 def get_next_id(df):
@@ -17,81 +22,119 @@ def get_next_id(df):
 
 
 def update_attendance_record(student: dict, start_time_str: str, end_time_str: str, minutes=10):
-    # Parse jam mulai & jam selesai
-    START_TIME = datetime.strptime(start_time_str, "%H:%M").time()
-    END_TIME = datetime.strptime(end_time_str, "%H:%M").time()
-
-    # Ambil waktu absensi terakhir
-    last_time_str = student.get('waktu_kehadiran', None)
-    last_time = None
-    if last_time_str:
-        try:
-            last_time = datetime.strptime(last_time_str, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            # Tangani format yang tidak cocok
-            last_time = None
+    updated, skipped, now = record_attendance_batch([student], start_time_str, end_time_str, minutes)
+    return bool(updated), now
+
+def record_attendance_batch(students, start_time_str: str, end_time_str: str, minutes=10):
+    """Count and save check-ins for several students at once.
+
+    Returns (updated, skipped, now). Students inside the cooldown, or
+    already counted by another writer meanwhile, end up in skipped.
+    """
+    claims, skipped, now = [], [], datetime.now()
+    for student in students:
+        previous, now = _claim_attendance(student, start_time_str, end_time_str, minutes)
+        if previous is None:
+            skipped.append(student)
+        else:
+            claims.append((student, previous))
+    if not claims:
+        return [], skipped, now
 
+    try:
+        updated = save_attendance_batch([student for student, _ in claims], cooldown=minutes * 60)
+    except Exception:
+        for student, previous in claims:
+            cooldowns.release(student["id"], previous)
+        raise
+    saved = {id(student) for student in updated}
+    skipped.extend(student for student, _ in claims if id(student) not in saved)
+    return updated, skipped, now
+
+def apply_attendance(student: dict, start_time_str: str, end_time_str: str, minutes=10):
+    """Check the time window and cooldown and update the student's totals
+    in place, without persisting anything."""
+    previous, now = _claim_attendance(student, start_time_str, end_time_str, minutes)
+    return previous is not None, now
+
+@lru_cache(maxsize=32)
+def _time_window(start_time_str: str, end_time_str: str):
+    # Parse jam mulai & jam selesai (sekali per pasangan)
+    return datetime.strptime(start_time_str, "%H:%M").time(), datetime.strptime(end_time_str, "%H:%M").time()
+
+def in_time_window(start_time_str: str, end_time_str: str, now=None):
+    """Whether `now` (default: the current time) is inside the check-in window."""
+    START_TIME, END_TIME = _time_window(start_time_str, end_time_str)
+    return START_TIME <= (now or datetime.now()).time() <= END_TIME
+
+def _claim_attendance(student: dict, start_time_str: str, end_time_str: str, minutes=10):
+    """(previous check-in epoch or None if refused, now). A successful claim
+    updates the shared cooldown index and the student's totals in place."""
     now = datetime.now()
 
     # Cek apakah jam saat ini berada dalam rentang
-    if not (START_TIME <= now.time() <= END_TIME):
-        return False, now
+    if not in_time_window(start_time_str, end_time_str, now):
+        return None, now
 
-    # Cegah spam absensi dalam jangka pendek
-    if last_time and (now - last_time) < timedelta(minutes=minutes):
-        return False, now
+    # Cegah spam absensi dalam jangka pendek (atomic, shared by all threads)
+    previous = cooldowns.claim(student["id"], int(now.timestamp()), minutes * 60, student.get("waktu_kehadiran"))
+    if previous is None:
+        return None, now
 
     # Update total
     total = student.get('total_kehadiran', 0)
     try:
         total = int(total)
-    except ValueError:
+    except (TypeError, ValueError):
         total = 0
 
     student['total_kehadiran'] = str(total + 1)
     student['waktu_kehadiran'] = now.strftime("%Y-%m-%d %H:%M:%S")
 
-    # Simpan ke database
-    save_attendance(student)
-
-    return True, now
+    return previous, now
 
 def load_data():
-    if os.path.exists(CSV_PATH):
-        df = pd.read_csv(CSV_PATH)
-    else:
-        df = pd.DataFrame(columns=["id","name","kelas", "total_kehadiran", "email", "nomor_telepon","waktu_kehadiran"])
-    return df
+    return storage.students_df()
 
 def load_attendance():
-    if os.path.exists(ATTENDANCE_PATH):
-        return pd.read_csv(ATTENDANCE_PATH)
-    return pd.DataFrame(columns=["id","name","date","status"])
+    return storage.attendance_df()
+
+def count_attendance():
+    return storage.attendance_count()
+
+def load_attendance_page(offset, limit):
+    return storage.attendance_page(offset, limit)
 
 def save_data(df):
-    df.to_csv(CSV_PATH, index=False)
+    storage.save_students_df(df)
+    analytics.reload_students()
     log_message("✅ Data saved")
 
 def load_students():
-    df = pd.read_csv(CSV_PATH, encoding='utf-8')
-    return {str(row['id']): row.to_dict() for _, row in df.iterrows()}
+    return storage.list_students()
 
-def save_attendance(student):
-    new_row = pd.DataFrame([{
-        "id": student['id'],
-        "name": student['nama'],
-        "timestamp": student['waktu_kehadiran'],
-        "status": "Present"
-    }])
+def load_class_map():
+    """{student id: kelas}, used to build per-class model shards."""
+    return {sid: s.get("kelas") or "" for sid, s in storage.list_students().items()}
 
-    new_row.to_csv(ATTENDANCE_PATH, mode='a', index=False, header=False)
-    log_message(f"✅ Attendance saved for {student['nama']}")
+def save_attendance(student, cooldown=0):
+    return bool(save_attendance_batch([student], cooldown))
 
-def save_students(students):
+def save_attendance_batch(students, cooldown=0):
+    """Persist check-ins and return the students actually recorded; with a
+    cooldown (seconds) the storage drops any counted by another writer
+    within that window."""
     if not students:
-        return
-    df = pd.DataFrame(students.values())
-    df.to_csv(CSV_PATH, index=False, encoding='utf-8')
+        return []
+    recorded = storage.record_checkins(students, cooldown=cooldown)
+    saved = {id(student) for student in recorded}
+    for student in students:
+        if id(student) not in saved:
+            log_message(f"⚠️ {student['nama']} was already checked in by another client")
+    if recorded:
+        analytics.notify(recorded)
+        log_message(f"✅ Attendance saved for {', '.join(s['nama'] for s in recorded)}")
+    return recorded
 
 def add_student_row(df, entries):
     student_id = get_next_id(df)
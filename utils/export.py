@@ -0,0 +1,186 @@
+import csv, io, os
+from pathlib import Path
+
+try:
+    from config import get_setting
+    from logger import log_message
+    from storage import storage
+except ImportError:
+    from utils.config import get_setting
+    from utils.logger import log_message
+    from utils.storage import storage
+
+# chunk_rows bounds memory: history is never loaded whole, one chunk of
+# rows at a time is filtered and written. dir: default for the manager.
+EXPORT_DEFAULTS = {"chunk_rows": 50000, "dir": str(Path.home() / "Downloads")}
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".xlsx": "xlsx"}
+ROW_COLUMNS = ["id", "name", "kelas", "timestamp", "status"]
+SUMMARY_COLUMNS = ["id", "name", "kelas", "total", "first_seen", "last_seen", "statuses"]
+EXCEL_MAX_ROWS = 1048575  # plus the header row
+
+
+def format_for(path, fmt=None):
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Unsupported export format for {path}: use one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def _bounds(start, end):
+    # A date-only end bound covers that whole day
+    if end and len(end) == 10:
+        end += " 23:59:59"
+    return start or None, end or None
+
+
+def attendance_rows(start=None, end=None, kelas=None, student_ids=None, chunk_rows=None):
+    """Filtered history as DataFrame chunks with a kelas column added."""
+    chunk_rows = chunk_rows or get_setting("export", EXPORT_DEFAULTS)["chunk_rows"]
+    classes = {sid: s.get("kelas") or "" for sid, s in storage.list_students().items()}
+    if kelas:
+        in_class = {sid for sid, k in classes.items() if k == kelas}
+        student_ids = in_class if student_ids is None else in_class & {str(i) for i in student_ids}
+
+    start, end = _bounds(start, end)
+    for chunk in storage.attendance_chunks(start, end, student_ids, chunk_rows):
+        if len(chunk):
+            chunk = chunk.assign(kelas=chunk["id"].map(classes).fillna(""))
+            yield chunk[ROW_COLUMNS]
+
+
+class StudentSummary:
+    """Per-student totals accumulated chunk by chunk; holds one entry per
+    student, not per row."""
+
+    def __init__(self):
+        self.students = {}
+
+    def add(self, chunk):
+        grouped = chunk.groupby(["id", "status"], sort=False)["timestamp"].agg(["count", "min", "max"])
+        names = chunk.drop_duplicates("id").set_index("id")
+        for (student_id, status), count, first, last in grouped.itertuples(name=None):
+            entry = self.students.get(student_id)
+            if entry is None:
+                entry = self.students[student_id] = {
+                    "id": student_id, "name": names.at[student_id, "name"], "kelas": names.at[student_id, "kelas"],
+                    "total": 0, "first_seen": first, "last_seen": last, "statuses": {},
+                }
+            entry["total"] += int(count)
+            entry["first_seen"] = min(entry["first_seen"], first)
+            entry["last_seen"] = max(entry["last_seen"], last)
+            entry["statuses"][status] = entry["statuses"].get(status, 0) + int(count)
+
+    def rows(self):
+        for entry in sorted(self.students.values(), key=lambda e: e["id"]):
+            statuses = "; ".join(f"{k}={v}" for k, v in sorted(entry["statuses"].items()))
+            yield [entry[col] for col in SUMMARY_COLUMNS[:-1]] + [statuses]
+
+
+def _report_chunks(chunks, report):
+    """Row chunks as lists of rows, or the summary as one final chunk."""
+    if report == "rows":
+        for chunk in chunks:
+            yield chunk.values.tolist()
+    elif report == "summary":
+        summary = StudentSummary()
+        for chunk in chunks:
+            summary.add(chunk)
+        yield list(summary.rows())
+    else:
+        raise ValueError(f"Unknown report: {report} (use rows or summary)")
+
+
+def _columns(report):
+    return ROW_COLUMNS if report == "rows" else SUMMARY_COLUMNS
+
+
+def _write_csv(path, columns, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            yield len(rows)
+
+
+def _write_parquet(path, columns, chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([(col, pa.int64() if col == "total" else pa.string()) for col in columns])
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            if rows:
+                data = {col: [row[i] for row in rows] for i, col in enumerate(columns)}
+                writer.write_table(pa.table(data, schema=schema))
+            yield len(rows)
+
+
+def _write_xlsx(path, columns, chunks):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("Excel export needs openpyxl (pip install openpyxl)")
+
+    # write_only streams rows to disk instead of keeping every cell
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("attendance")
+    sheet.append(columns)
+    written = 0
+    for rows in chunks:
+        if written + len(rows) > EXCEL_MAX_ROWS:
+            raise ValueError(f"Too many rows for one Excel sheet ({EXCEL_MAX_ROWS}); narrow the filters or use CSV/Parquet")
+        for row in rows:
+            sheet.append(row)
+        written += len(rows)
+        yield len(rows)
+    workbook.save(path)
+
+
+WRITERS = {"csv": _write_csv, "parquet": _write_parquet, "xlsx": _write_xlsx}
+
+
+def export_attendance(path, fmt=None, report="rows", start=None, end=None, kelas=None,
+                      student_ids=None, progress=None):
+    """Write filtered attendance (report="rows") or per-student totals
+    (report="summary") to path as CSV, Parquet or Excel. Returns the number
+    of rows written; progress(rows_so_far) is called after every chunk."""
+    fmt = format_for(path, fmt)
+    chunks = _report_chunks(attendance_rows(start, end, kelas, student_ids), report)
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    total = 0
+    try:
+        for count in WRITERS[fmt](tmp_path, _columns(report), chunks):
+            total += count
+            if progress:
+                progress(total)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    noun = "student summary row(s)" if report == "summary" else "attendance row(s)"
+    log_message(f"📤 Exported {total} {noun} to {path}")
+    return total
+
+
+def stream_csv(report="rows", start=None, end=None, kelas=None, student_ids=None):
+    """CSV text for a streaming HTTP response, one encoded chunk at a time."""
+    chunks = _report_chunks(attendance_rows(start, end, kelas, student_ids), report)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_columns(report))
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,136 @@
+import threading, time
+from collections import OrderedDict
+import cv2, numpy as np
+
+try:
+    from config import get_setting
+    from recognizer import engine
+except ImportError:
+    from utils.config import get_setting
+    from utils.recognizer import engine
+
+# hash: dhash | ahash (64-bit). max_distance: Hamming bits within which a
+# cached face counts as the same crop. 0 = identical hashes only: a 9x8
+# hash of a low-texture face can land within a few bits of someone else's,
+# and a near match hands out that person's identity, so raise it only
+# after checking on your own camera crops. ttl bounds how long any entry
+# is served.
+CACHE_DEFAULTS = {"enabled": True, "size": 512, "ttl": 2.0, "hash": "dhash", "max_distance": 0}
+
+
+def dhash(face):
+    small = cv2.resize(face, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), "big")
+
+
+def ahash(face):
+    small = cv2.resize(face, (8, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small > small.mean()).tobytes(), "big")
+
+
+HASHES = {"dhash": dhash, "ahash": ahash}
+
+
+class RecognitionCache:
+    """Bounded LRU of search results keyed by a perceptual hash of the
+    normalized face (plus the search context: k, class, threshold).
+
+    Entries expire after `ttl` seconds and the whole cache is dropped when
+    the engine loads a new model or class shard, so a retrain never serves
+    stale labels. Results are stored with the generation seen at lookup;
+    one that finishes after a model swap is discarded.
+    """
+
+    def __init__(self, settings=None, model=engine):
+        self.settings = settings or get_setting("recognition_cache", CACHE_DEFAULTS)
+        self.model = model
+        self.hash = HASHES[self.settings["hash"]]
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (context, hash) -> (expires, matches)
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidations = 0
+        self.stale = 0
+
+    @property
+    def enabled(self):
+        return bool(self.settings["enabled"]) and self.settings["size"] > 0
+
+    def _check_generation(self, generation):
+        # Caller holds the lock
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def _find(self, context, key, now):
+        entry = self._entries.get((context, key))
+        if entry is None and self.settings["max_distance"]:
+            limit = self.settings["max_distance"]
+            for (ctx, h), candidate in reversed(self._entries.items()):
+                if ctx == context and (h ^ key).bit_count() <= limit:
+                    key, entry = h, candidate
+                    break
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self._entries[(context, key)]
+            self.expired += 1
+            return None
+        self._entries.move_to_end((context, key))
+        return entry[1]
+
+    def lookup(self, faces, context, kelas=None):
+        """(hashes, cached results or None per face, generation); pass the
+        generation back to store()."""
+        keys = [self.hash(face) for face in faces]
+        # May reload model files; done before taking the lock
+        generation = self.model.generation(kelas)
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(generation)
+            results = [self._find(context, key, now) for key in keys]
+            hits = sum(r is not None for r in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return keys, results, generation
+
+    def store(self, context, key, matches, generation):
+        expires = time.monotonic() + self.settings["ttl"]
+        with self._lock:
+            if generation != self._generation:
+                # Searched against a model that has since been replaced
+                self.stale += 1
+                return
+            self._entries[(context, key)] = (expires, matches)
+            self._entries.move_to_end((context, key))
+            while len(self._entries) > self.settings["size"]:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "invalidations": self.invalidations,
+                "stale": self.stale,
+                "generation": list(self._generation) if self._generation else None,
+            }
+
+
+recognition_cache = RecognitionCache()
@@ -0,0 +1,48 @@
+import hashlib, os
+import numpy as np
+
+try:
+    from config import CACHE_DIR
+except ImportError:
+    from utils.config import CACHE_DIR
+
+FACES_CACHE_DIR = os.path.join(CACHE_DIR, "faces")
+
+
+class FaceStore:
+    """Preprocessed 200x200 faces cached as .npy files keyed by the SHA-1
+    of the source image, so unchanged photos are never re-detected.
+    Images without a detectable face get an empty .none marker."""
+
+    def __init__(self, root=FACES_CACHE_DIR):
+        self.root = root
+
+    @staticmethod
+    def key_for(path, salt=""):
+        h = hashlib.sha1(salt.encode("utf-8"))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key[:2], key + ext)
+
+    def has(self, key):
+        return os.path.exists(self._path(key, ".npy")) or os.path.exists(self._path(key, ".none"))
+
+    def load(self, key):
+        """The cached face, or None (no face found or not cached yet)."""
+        try:
+            return np.load(self._path(key, ".npy"))
+        except FileNotFoundError:
+            return None
+
+    def save(self, key, face):
+        path = self._path(key, ".npy" if face is not None else ".none")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            if face is not None:
+                np.save(f, face)
+        os.replace(tmp_path, path)
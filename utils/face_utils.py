@@ -1,81 +1,328 @@
-import cv2, os, numpy as np
+import cv2, json, os, time, numpy as np
+import multiprocessing, threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 try:
-    from config import MODEL_PATH, IMAGES_DIR, LOGS_DIR
+    from config import MODEL_PATH, BINARY_MODEL_PATH, IMAGES_DIR, CACHE_DIR, get_setting
     from logger import log_message
+    from recognizer import engine, create_lbph, LBPH_PARAMS, MODEL_DEFAULTS
+    from model_store import save_recognizer_binary
+    from ann_index import ANN_DEFAULTS, build_index
+    from shards import build_shards
+    from face_store import FaceStore
+    from snapshots import snapshots
+    from face_cache import recognition_cache
 except ImportError:
-    from utils.config import MODEL_PATH, IMAGES_DIR, LOGS_DIR
+    from utils.config import MODEL_PATH, BINARY_MODEL_PATH, IMAGES_DIR, CACHE_DIR, get_setting
     from utils.logger import log_message
+    from utils.recognizer import engine, create_lbph, LBPH_PARAMS, MODEL_DEFAULTS
+    from utils.model_store import save_recognizer_binary
+    from utils.ann_index import ANN_DEFAULTS, build_index
+    from utils.shards import build_shards
+    from utils.face_store import FaceStore
+    from utils.snapshots import snapshots
+    from utils.face_cache import recognition_cache
 
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-recognizer = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=8, grid_x=8, grid_y=8)
+TRAIN_MANIFEST_PATH = os.path.join(CACHE_DIR, "train_manifest.json")
+TRAINING_DEFAULTS = {"workers": 0, "parallel_min_images": 8}
+
+CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+# CascadeClassifier.detectMultiScale is not thread-safe, so every thread
+# (API pool workers, kiosk workers) loads its own classifier once
+_local = threading.local()
+
+def get_face_cascade():
+    cascade = getattr(_local, "cascade", None)
+    if cascade is None:
+        cascade = _local.cascade = cv2.CascadeClassifier(CASCADE_PATH)
+    return cascade
+
+# width: kiosk detection resolution (0 = full frame); face sizes are in
+# full-resolution pixels. still_width: the same for uploaded photos, full
+# resolution by default, since a group photo downscaled to 640 px shrinks
+# small faces below the cascade's 24 px window
+DETECTION_DEFAULTS = {"width": 640, "still_width": 0, "scale_factor": 1.2, "min_neighbors": 5,
+                      "min_face_size": 80, "max_face_size": 0}
+DETECTION = get_setting("detection", DETECTION_DEFAULTS)
+# Uploaded photos have no fixed camera distance, so drop the size bounds for them
+STILL_DETECTION = {**DETECTION, "width": DETECTION["still_width"], "min_face_size": 0, "max_face_size": 0}
 
 def save_face_snapshot(student: dict, frame, face_coords, timestamp):
-    (x, y, w, h) = face_coords
-    margin = 200
-    x1, y1 = max(0, x - margin), max(0, y - margin)
-    x2, y2 = min(frame.shape[1], x + w + margin), min(frame.shape[0], y + h + margin)
-    face_img = frame[y1:y2, x1:x2]
+    """Queue a check-in snapshot; encoding and writing happen in the background."""
+    return snapshots.submit(student, frame, face_coords, timestamp)
 
-    filename = f"{student['id']}-{timestamp.strftime('%Y%m%d%H%M%S')}.png"
-    filepath = os.path.join(LOGS_DIR, filename)
-    cv2.imwrite(filepath, face_img)
+FACE_SIZE = (200, 200)
 
-    log_message(f"📸 Snapshot saved for {student['nama']}: {filepath}")
+def detect_faces(gray, settings=DETECTION):
+    height, width = gray.shape[:2]
+    target = settings["width"]
+    scale = target / width if target and width > target else 1.0
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
 
-def predict_student(gray_face, students, threshold=60):
-    recognizer.read(MODEL_PATH)
-    face_resized = preprocess_face(gray_face)
+    min_side = int(settings["min_face_size"] * scale)
+    max_side = int(settings["max_face_size"] * scale)
+    faces = get_face_cascade().detectMultiScale(
+        small,
+        scaleFactor=settings["scale_factor"],
+        minNeighbors=settings["min_neighbors"],
+        minSize=(min_side, min_side),
+        maxSize=(max_side, max_side),
+    )
+    if len(faces) == 0 or scale == 1.0:
+        return faces
 
-    if face_resized is None:
-        return None, None
+    # Map boxes back so recognition crops come from the full-resolution frame
+    boxes = np.round(faces / scale).astype(int)
+    boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+    boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+    return boxes
+
+def normalize_face(face):
+    return cv2.equalizeHist(cv2.resize(face, FACE_SIZE))
 
-    id_pred, conf = recognizer.predict(face_resized)
+def match_faces(faces, k=1, session=None, threshold=60, cache=recognition_cache):
+    """Top-k (label, distance) per face. With a session class, its roster
+    shard is searched first; faces with no match under the threshold are
+    retried against the full gallery when the session allows fallback.
+    Faces whose perceptual hash was searched moments ago reuse that result."""
+    if cache is None or not cache.enabled:
+        return _search_faces(faces, k, session, threshold)
+
+    kelas = session.get("kelas") if session else None
+    context = (k, kelas, session.get("fallback", True), threshold) if kelas else (k,)
+    keys, results, generation = cache.lookup(faces, context, kelas)
+    misses = [i for i, matches in enumerate(results) if matches is None]
+    if misses:
+        for i, matches in zip(misses, _search_faces(faces[misses], k, session, threshold)):
+            results[i] = matches
+            cache.store(context, keys[i], matches, generation)
+    return results
+
+def _search_faces(faces, k=1, session=None, threshold=60):
+    kelas = session.get("kelas") if session else None
+    if not kelas:
+        return engine.search(faces, k)
+
+    results = engine.search(faces, k, kelas=kelas)
+    if session.get("fallback", True):
+        misses = [i for i, matches in enumerate(results) if not matches or matches[0][1] >= threshold]
+        if misses:
+            for i, matches in zip(misses, engine.search(faces[misses], k)):
+                results[i] = matches
+    return results
+
+def recognize_face(gray, box, students, threshold=60, session=None):
+    x, y, w, h = box
+    face = normalize_face(gray[y:y+h, x:x+w])
+    matches = match_faces(face[None], 1, session, threshold)[0]
+    id_pred, conf = matches[0] if matches else (-1, float("inf"))
 
     if conf < threshold:
+        return students.get(str(id_pred)), conf
+    return None, conf
+
+def recognize_faces(gray, boxes, students, threshold=60, session=None):
+    """Recognize every box in one batched search instead of one predict per face."""
+    if len(boxes) == 0:
+        return []
+    faces = np.stack([normalize_face(gray[y:y+h, x:x+w]) for x, y, w, h in boxes])
+    results = []
+    for box, matches in zip(boxes, match_faces(faces, 1, session, threshold)):
+        id_pred, conf = matches[0] if matches else (-1, float("inf"))
+        student = students.get(str(id_pred)) if conf < threshold else None
+        results.append((tuple(box), student, conf))
+    return results
+
+def predict_student(gray_img, students, threshold=60, session=None):
+    faces = detect_faces(gray_img, STILL_DETECTION)
+    if len(faces) == 0:
+        return None, None
+    return recognize_face(gray_img, faces[0], students, threshold, session)
+
+def predict_candidates(gray_img, students, k=None, threshold=60, session=None):
+    """Like predict_student, plus the top-k closest students for the first
+    face as [{"id", "nama", "distance"}]."""
+    faces = detect_faces(gray_img, STILL_DETECTION)
+    if len(faces) == 0:
+        return None, None, []
+    x, y, w, h = faces[0]
+    matches = match_faces(normalize_face(gray_img[y:y+h, x:x+w])[None], k, session, threshold)[0]
+    candidates = []
+    for id_pred, distance in matches:
         student = students.get(str(id_pred))
-        return student, conf
-    else:
-        return None, conf
+        candidates.append({"id": str(id_pred), "nama": student["nama"] if student else None, "distance": distance})
+    if not matches:
+        return None, None, candidates
+
+    id_pred, conf = matches[0]
+    return (students.get(str(id_pred)) if conf < threshold else None), conf, candidates
 
 def preprocess_face(img):
-    faces = face_cascade.detectMultiScale(img, scaleFactor=1.2, minNeighbors=5)
+    faces = detect_faces(img, STILL_DETECTION)
     if len(faces) == 0:
         return None
     x, y, w, h = faces[0]
-    return cv2.resize(img[y:y+h, x:x+w], (200, 200))
+    return cv2.resize(img[y:y+h, x:x+w], FACE_SIZE)
 
-def train_model(log_box=None):
-    faces, labels = [], []
-    log_message("🔄 Collecting faces for training...", log_box)
+# Cached faces are only valid for the settings that produced them
+PREPROCESS_SALT = json.dumps([STILL_DETECTION, FACE_SIZE], sort_keys=True)
+
+def preprocess_image_file(path):
+    """Read, detect and normalize one training photo (runs in a worker process)."""
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    face = preprocess_face(img)
+    return cv2.equalizeHist(face) if face is not None else None
 
-    for student_id in os.listdir(IMAGES_DIR):
+def collect_training_images():
+    samples = []
+    for student_id in sorted(os.listdir(IMAGES_DIR)):
         folder = os.path.join(IMAGES_DIR, student_id)
-        if not os.path.isdir(folder):
+        if not os.path.isdir(folder) or not student_id.isdigit():
             continue
+        for img_name in sorted(os.listdir(folder)):
+            if img_name.lower().endswith((".jpg", ".png", ".jpeg")):
+                samples.append((os.path.join(folder, img_name), int(student_id)))
+    return samples
 
-        for img_name in os.listdir(folder):
-            img_path = os.path.join(folder, img_name)
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            if img is None:
-                log_message(f"⚠️ Could not read {img_path}", log_box)
-                continue
-
-            face = preprocess_face(img)
-            if face is None:
-                log_message(f"⚠️ No face detected in {img_name}", log_box)
-                continue
-
-            face = cv2.equalizeHist(face)
-            faces.append(face)
-            labels.append(int(student_id))
-
-    if faces:
-        recognizer.train(faces, np.array(labels))
-        recognizer.save(MODEL_PATH)
-        log_message(f"✅ Model trained with {len(faces)} samples and {len(set(labels))} students", log_box)
+def _model_signature():
+    try:
+        st = os.stat(MODEL_PATH)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _load_manifest():
+    try:
+        with open(TRAIN_MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_manifest(samples):
+    tmp_path = TRAIN_MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"model_signature": _model_signature(), "samples": samples}, f)
+    os.replace(tmp_path, TRAIN_MANIFEST_PATH)
+
+def train_model(log_box=None, progress=None, full=False, classes=None):
+    """Train the LBPH model from Data/Images.
+
+    Preprocessed faces are cached by image hash, uncached photos are
+    processed in a process pool, and when the only change since the last
+    training is new photos the existing model is extended with update()
+    instead of retrained. `progress` receives every status message, which
+    lets a UI show them without touching widgets from this thread.
+    `classes` ({student id: kelas}) also builds one model shard per class.
+    """
+    def report(msg):
+        entry = log_message(msg, log_box)
+        if progress:
+            progress(entry)
+
+    settings = get_setting("training", TRAINING_DEFAULTS)
+    store = FaceStore()
+    started = time.perf_counter()
+    report("🔄 Collecting faces for training...")
+
+    images = collect_training_images()
+    keyed = [(path, label, store.key_for(path, PREPROCESS_SALT)) for path, label in images]
+    pending = [(path, key) for path, _, key in keyed if not store.has(key)]
+    report(f"📂 {len(images)} images found, {len(images) - len(pending)} cached, {len(pending)} to preprocess")
+
+    prep_started = time.perf_counter()
+    workers = settings["workers"] or os.cpu_count() or 1
+    if len(pending) >= settings["parallel_min_images"] and workers > 1:
+        # spawn: forking a process that runs Tk and other threads is unsafe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(preprocess_image_file, path): (path, key) for path, key in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                path, key = futures[future]
+                store.save(key, future.result())
+                if done % 25 == 0 or done == len(pending):
+                    report(f"⏳ Preprocessed {done}/{len(pending)} images")
     else:
-        log_message("❌ No valid images found, training aborted", log_box)
+        for done, (path, key) in enumerate(pending, start=1):
+            store.save(key, preprocess_image_file(path))
+            if done % 25 == 0 or done == len(pending):
+                report(f"⏳ Preprocessed {done}/{len(pending)} images")
+    if pending:
+        report(f"⏱️ Preprocessing took {time.perf_counter() - prep_started:.1f}s with {workers} worker(s)")
+
+    samples = {}
+    for path, label, key in keyed:
+        if store.load(key) is None:
+            report(f"⚠️ No face detected in {os.path.basename(path)}")
+            continue
+        samples[key] = label
+
+    if not samples:
+        report("❌ No valid images found, training aborted")
+        return
+
+    manifest = _load_manifest()
+    trained = manifest.get("samples", {})
+    incremental = bool(
+        not full
+        and trained
+        and manifest.get("model_signature") == _model_signature()
+        and all(samples.get(key) == label for key, label in trained.items())
+    )
+    new_keys = [key for key in samples if key not in trained] if incremental else list(samples)
+
+    train_started = time.perf_counter()
+    dtype = get_setting("model", MODEL_DEFAULTS)["binary_dtype"]
+    if incremental and not new_keys:
+        if classes is not None:
+            # Students may have changed class without any new photos
+            recognizer = create_lbph()
+            recognizer.read(MODEL_PATH)
+            _build_class_shards(recognizer, classes, dtype, report)
+        report("✅ Model already up to date")
+        return
+
+    faces = [store.load(key) for key in new_keys]
+    labels = np.array([samples[key] for key in new_keys])
+    recognizer = create_lbph()
+    if incremental:
+        recognizer.read(MODEL_PATH)
+        recognizer.update(faces, labels)
+        mode = f"updated with {len(new_keys)} new"
+    else:
+        recognizer.train(faces, labels)
+        mode = f"trained with {len(new_keys)}"
+
+    # The index goes first: writing the model is what makes the engine
+    # reload, and it only uses an index built for the same labels.
+    index_started = time.perf_counter()
+    index = build_index(recognizer.getHistograms(), recognizer.getLabels(), get_setting("ann", ANN_DEFAULTS))
+    if index is not None:
+        report(f"🗂️ ANN index built with {index.n_lists} lists in {time.perf_counter() - index_started:.1f}s")
+    if classes is not None:
+        _build_class_shards(recognizer, classes, dtype, report)
+    save_model(recognizer)
+    # The binary copy is written last so it is never older than the YAML
+    # and the engine picks it up; the YAML stays the source for update().
+    save_recognizer_binary(recognizer, BINARY_MODEL_PATH, dtype)
+    _save_manifest(samples)
+
+    report(
+        f"✅ Model {mode} samples and {len(set(samples.values()))} students "
+        f"(train {time.perf_counter() - train_started:.1f}s, total {time.perf_counter() - started:.1f}s)"
+    )
+
+def _build_class_shards(recognizer, classes, dtype, report):
+    shards = build_shards(recognizer.getHistograms(), recognizer.getLabels(), classes, LBPH_PARAMS, dtype)
+    report(f"🏫 Class shards: {', '.join(f'{k} ({n})' for k, n in shards.items()) or 'none'}")
+
+def save_model(recognizer, path=MODEL_PATH):
+    # Write next to the live model and rename over it, so a running
+    # engine never reloads a partially written file.
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{ext}"
+    recognizer.save(tmp_path)
+    os.replace(tmp_path, path)
 
 def save_faces(student_id, photo_paths, folder, log_box=None):
     os.makedirs(folder, exist_ok=True)
@@ -0,0 +1,216 @@
+import csv, hashlib, io, json, os, threading, time
+
+try:
+    from config import ATTENDANCE_PATH, CACHE_DIR
+    from logger import log_message
+    from registry import registry
+except ImportError:
+    from utils.config import ATTENDANCE_PATH, CACHE_DIR
+    from utils.logger import log_message
+    from utils.registry import registry
+
+HISTORY_COLUMNS = ["id", "name", "timestamp", "status"]
+CHECKPOINT_PATH = os.path.join(CACHE_DIR, "students.checkpoint.json")
+
+
+class AttendanceJournal:
+    """Append-only attendance log.
+
+    attendance_history.csv is the source of truth: each check-in is one
+    appended line, flushed right away and fsync'd in batches. students.csv
+    is a checkpoint of the derived totals that is rewritten in the
+    background. A sidecar file records the SHA-1 of the last two
+    checkpoints and the history offset each one covers, so check-ins made
+    after the last checkpoint can be replayed after a crash.
+    """
+
+    def __init__(self, path=ATTENDANCE_PATH, students=registry, checkpoint_path=CHECKPOINT_PATH,
+                 fsync_every=20, fsync_interval=1.0, checkpoint_every=100, checkpoint_interval=30.0):
+        self.path = path
+        self.students = students
+        self.checkpoint_path = checkpoint_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+
+        self._file = None
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._unsynced = 0
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def _open(self):
+        if self._file is not None:
+            return self._file
+
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        torn = size > 0 and not _ends_with_newline(self.path)
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        if size == 0:
+            self._file.write(_csv_line(HISTORY_COLUMNS))
+        elif torn:
+            self._file.write("\n")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._background, daemon=True)
+        self._thread.start()
+        return self._file
+
+    def record(self, student: dict, status="Present"):
+        """Store the student's updated totals and append the check-in line."""
+        self.record_many([student], status)
+
+    def record_many(self, students, status="Present"):
+        """Append several check-ins with one write and one flush."""
+        lines = "".join(_csv_line([s["id"], s["nama"], s["waktu_kehadiran"], status]) for s in students)
+        with self._lock:
+            # Registry update and append happen together so a checkpoint
+            # never includes one without the other.
+            for student in students:
+                self.students.update(student)
+            f = self._open()
+            f.write(lines)
+            f.flush()
+            self._unsynced += len(students)
+            self._since_checkpoint += len(students)
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+        if self._since_checkpoint >= self.checkpoint_every:
+            self._wake.set()
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def _background(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.fsync_interval)
+            self._wake.clear()
+            with self._lock:
+                self._sync()
+            elapsed = time.monotonic() - self._last_checkpoint
+            if self._since_checkpoint >= self.checkpoint_every or (
+                self._since_checkpoint and elapsed >= self.checkpoint_interval
+            ):
+                try:
+                    self.checkpoint()
+                except OSError as e:
+                    log_message(f"⚠️ Attendance checkpoint failed: {e}")
+
+    def checkpoint(self):
+        """Rewrite students.csv with the current totals."""
+        with self._checkpoint_lock:
+            with self._lock:
+                self._sync()
+                offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+                content = self.students.to_csv()
+                self._since_checkpoint = 0
+                self._last_checkpoint = time.monotonic()
+
+            # Record the new checkpoint before replacing students.csv: on
+            # recovery, whichever of the two hashes matches the file tells
+            # us where to resume replaying.
+            state = self._read_checkpoint()
+            current = {"sha1": _sha1(content.encode("utf-8")), "offset": offset}
+            _write_json_atomic(self.checkpoint_path, {"previous": state.get("current"), "current": current})
+            self.students.save(content)
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def recover(self):
+        """Replay check-ins appended after the last checkpoint. Returns the count."""
+        state = self._read_checkpoint()
+        if not state or not os.path.exists(self.students.path) or not os.path.exists(self.path):
+            return 0
+
+        with open(self.students.path, "rb") as f:
+            digest = _sha1(f.read())
+
+        offset = None
+        for key in ("current", "previous"):
+            entry = state.get(key)
+            if entry and entry["sha1"] == digest:
+                offset = entry["offset"]
+                break
+        if offset is None:
+            log_message("⚠️ students.csv was changed outside the journal, skipping replay")
+            return 0
+
+        self.students.refresh(force=True)
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            tail = f.read().decode("utf-8")
+
+        replayed = 0
+        for row in csv.reader(io.StringIO(tail)):
+            if len(row) != len(HISTORY_COLUMNS) or row == HISTORY_COLUMNS:
+                continue
+            student_id, _, timestamp, _ = row
+            student = self.students.get(student_id)
+            if not student:
+                continue
+            try:
+                total = int(student.get("total_kehadiran") or 0)
+            except ValueError:
+                total = 0
+            student["total_kehadiran"] = str(total + 1)
+            student["waktu_kehadiran"] = max(str(student.get("waktu_kehadiran") or ""), timestamp)
+            self.students.update(student)
+            replayed += 1
+
+        if replayed:
+            log_message(f"♻️ Replayed {replayed} check-in(s) from the attendance journal")
+            self.checkpoint()
+        return replayed
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        if self._since_checkpoint:
+            self.checkpoint()
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+
+def _csv_line(values):
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(values)
+    return buf.getvalue()
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _sha1(data: bytes):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+journal = AttendanceJournal()
@@ -0,0 +1,200 @@
+import numpy as np
+
+# Upper bound on elements in one (gallery rows x query bins) block of the
+# distance computation, ~32 MB of float32 scratch regardless of gallery size.
+BLOCK_ELEMENTS = 8 << 20
+
+
+def lbp_codes(faces, radius=2, neighbors=8):
+    """Extended (circular) LBP codes for a batch of equal-sized gray faces,
+    computed exactly like OpenCV's LBPH: bilinear-interpolated neighbours
+    compared in float32 with an epsilon tie."""
+    src = np.asarray(faces, dtype=np.float32)
+    if src.ndim == 2:
+        src = src[None]
+    n, rows, cols = src.shape
+    inner = (slice(None), slice(radius, rows - radius), slice(radius, cols - radius))
+    center = src[inner]
+    codes = np.zeros(center.shape, dtype=np.int32)
+    eps = np.finfo(np.float32).eps
+
+    def shifted(dy, dx):
+        return src[:, radius + dy:rows - radius + dy, radius + dx:cols - radius + dx]
+
+    for k in range(neighbors):
+        x = np.float32(radius * np.cos(2.0 * np.pi * k / neighbors))
+        y = np.float32(-radius * np.sin(2.0 * np.pi * k / neighbors))
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        tx, ty = x - np.float32(fx), y - np.float32(fy)
+        w1 = (np.float32(1) - tx) * (np.float32(1) - ty)
+        w2 = tx * (np.float32(1) - ty)
+        w3 = (np.float32(1) - tx) * ty
+        w4 = tx * ty
+        t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+        codes |= (((t > center) | (np.abs(t - center) < eps)).astype(np.int32) << k)
+    return codes
+
+
+def lbp_histograms(faces, radius=2, neighbors=8, grid_x=8, grid_y=8):
+    """Spatial LBP histograms (n, grid_x * grid_y * 2**neighbors), each cell
+    normalised by its pixel count, matching LBPHFaceRecognizer."""
+    codes = lbp_codes(faces, radius, neighbors)
+    n, rows, cols = codes.shape
+    bins = 1 << neighbors
+    cell_h, cell_w = rows // grid_y, cols // grid_x
+    cells = grid_x * grid_y
+
+    # (n, gy, ch, gx, cw) -> (n, gy, gx, ch * cw), then offset every code
+    # by its cell so a single bincount builds all histograms at once.
+    grid = codes[:, :grid_y * cell_h, :grid_x * cell_w].reshape(n, grid_y, cell_h, grid_x, cell_w)
+    grid = grid.transpose(0, 1, 3, 2, 4).reshape(n, cells, cell_h * cell_w)
+    offsets = (np.arange(n * cells, dtype=np.int64) * bins).reshape(n, cells, 1)
+    counts = np.bincount((grid + offsets).ravel(), minlength=n * cells * bins)
+    return counts.reshape(n, cells * bins).astype(np.float32) * np.float32(1.0 / (cell_h * cell_w))
+
+
+def chi_square_matrix(queries, gallery, row_sums=None):
+    """OpenCV HISTCMP_CHISQR_ALT distances, shape (len(queries), len(gallery)).
+
+    Per bin, (q - g)^2 / (q + g) = q + g - 4qg / (q + g), and the last term
+    vanishes wherever the query bin is zero. LBP histograms are sparse, so
+    each distance is the two histogram sums minus a correction computed
+    over the query's non-zero bins only. The gallery may be a memmap; it
+    is read in row blocks.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    if queries.ndim == 1:
+        queries = queries[None]
+    if row_sums is None:
+        row_sums = gallery_row_sums(gallery)
+    out = np.empty((len(queries), len(gallery)), dtype=np.float64)
+    nonzero = [np.flatnonzero(q) for q in queries]
+    step = max(1, BLOCK_ELEMENTS // max(1, max((len(nz) for nz in nonzero), default=1)))
+
+    for start in range(0, len(gallery), step):
+        block = np.asarray(gallery[start:start + step], dtype=np.float32)
+        for i, (query, nz) in enumerate(zip(queries, nonzero)):
+            g = block[:, nz]
+            q = query[nz]
+            den = g + q
+            g *= q
+            g /= den
+            out[i, start:start + len(block)] = g.sum(axis=1, dtype=np.float64)
+
+    out *= -4.0
+    out += row_sums
+    out += queries.sum(axis=1, dtype=np.float64)[:, None]
+    np.maximum(out, 0.0, out=out)
+    out *= 2.0
+    return out
+
+
+def gallery_row_sums(gallery, step=4096):
+    sums = np.empty(len(gallery), dtype=np.float64)
+    for start in range(0, len(gallery), step):
+        sums[start:start + step] = np.asarray(gallery[start:start + step], dtype=np.float32).sum(axis=1, dtype=np.float64)
+    return sums
+
+
+class LBPMatcher:
+    """Batched nearest-neighbour search over LBPH histograms.
+
+    Scores a batch of faces against the whole gallery in one vectorised
+    pass and returns the best distance per student, so top-k results are
+    k distinct students. With prototypes="mean" each student is reduced to
+    one averaged histogram, trading a little accuracy for a gallery whose
+    size is the number of students rather than the number of photos.
+    An IVF `index` (see ann_index) limits each query to the rows of its
+    `n_probe` nearest partitions; it only applies to the full gallery.
+    """
+
+    def __init__(self, histograms, labels, params, prototypes="none", index=None, n_probe=8):
+        self.params = {k: int(params[k]) for k in ("radius", "neighbors", "grid_x", "grid_y")}
+        labels = np.asarray(labels, dtype=np.int32).ravel()
+        if prototypes == "mean" and len(labels):
+            histograms, labels = mean_prototypes(histograms, labels)
+        elif prototypes not in ("none", "mean"):
+            raise ValueError(f"Unknown prototype mode: {prototypes}")
+
+        self.gallery = histograms
+        self.labels = labels
+        self.row_sums = gallery_row_sums(histograms)
+        self.index = index if prototypes == "none" else None
+        self.n_probe = n_probe
+        # Gallery rows grouped by student, for a per-student minimum
+        self._order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[self._order]
+        self._starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]]) if len(labels) else np.zeros(0, int)
+        self.students = sorted_labels[self._starts]
+
+    @classmethod
+    def from_recognizer(cls, recognizer, prototypes="none", **kwargs):
+        histograms = recognizer.getHistograms()
+        gallery = np.vstack([h.reshape(1, -1) for h in histograms]) if histograms else np.zeros((0, 0), np.float32)
+        params = {
+            "radius": recognizer.getRadius(),
+            "neighbors": recognizer.getNeighbors(),
+            "grid_x": recognizer.getGridX(),
+            "grid_y": recognizer.getGridY(),
+        }
+        return cls(gallery, recognizer.getLabels(), params, prototypes, **kwargs)
+
+    @classmethod
+    def from_binary(cls, model, prototypes="none", **kwargs):
+        return cls(model.float_histograms(), model.labels, model.params, prototypes, **kwargs)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def histograms(self, faces):
+        return lbp_histograms(faces, **self.params)
+
+    def student_distances(self, queries):
+        """(len(queries), len(self.students)) best distance per student."""
+        distances = chi_square_matrix(queries, self.gallery, self.row_sums)
+        return np.minimum.reduceat(distances[:, self._order], self._starts, axis=1)
+
+    def search(self, faces, k=5):
+        """Top-k (label, distance) pairs per face, nearest first."""
+        faces = np.asarray(faces)
+        if faces.ndim == 2:
+            faces = faces[None]
+        if not len(self.labels):
+            return [[] for _ in range(len(faces))]
+
+        queries = self.histograms(faces)
+        if self.index is not None:
+            return [self._search_index(query, k) for query in queries]
+
+        distances = self.student_distances(queries)
+        return [_top_k(row, self.students, k) for row in distances]
+
+    def _search_index(self, query, k):
+        rows = self.index.candidates(query, self.n_probe)
+        distances = chi_square_matrix(query, self.gallery[rows], self.row_sums[rows])[0]
+        labels = self.labels[rows]
+        order = np.argsort(labels, kind="stable")
+        labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+        return _top_k(np.minimum.reduceat(distances[order], starts), labels[starts], k)
+
+    def predict(self, face):
+        """Same contract as LBPHFaceRecognizer.predict: (label, distance)."""
+        matches = self.search(face, k=1)[0]
+        return matches[0] if matches else (-1, float(np.finfo(np.float64).max))
+
+
+def _top_k(distances, students, k):
+    k = min(k, len(distances))
+    idx = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(k)
+    idx = idx[np.argsort(distances[idx], kind="stable")]
+    return [(int(students[i]), float(distances[i])) for i in idx]
+
+
+def mean_prototypes(histograms, labels):
+    """One averaged histogram per student (still L1-normalised per cell)."""
+    order = np.argsort(labels, kind="stable")
+    students, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+    sums = np.add.reduceat(np.asarray(histograms, dtype=np.float64)[order], starts, axis=0)
+    return (sums / counts[:, None]).astype(np.float32), students.astype(np.int32)
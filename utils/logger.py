@@ -1,20 +1,265 @@
-import datetime
+import atexit, collections, datetime, json, os, queue, threading
 
 try:
-    from config import LOG_PATH
+    from config import LOG_PATH, get_setting
 except ImportError:
-    from utils.config import LOG_PATH
+    from utils.config import LOG_PATH, get_setting
 
-def log_message(msg: str, log_box=None):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {msg}"
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+LEVEL_ALIASES = {"WARN": "WARNING", "ERR": "ERROR", "CRITICAL": "ERROR", "FATAL": "ERROR"}
+# max_bytes/backups: size rotation (system.txt.1 ... .N); daily: also rotate
+# at midnight. json: mirror every entry as one JSON object per line.
+LOGGING_DEFAULTS = {
+    "level": "INFO",
+    "max_bytes": 5 * 1024 * 1024,
+    "backups": 5,
+    "daily": True,
+    "json": True,
+    "queue_size": 10000,
+}
+JSON_LOG_PATH = os.path.splitext(LOG_PATH)[0] + ".jsonl"
 
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(log_entry + "\n")
 
-    if log_box:
+def _infer_level(msg):
+    # Messages across the app already carry their severity as an emoji
+    if msg.startswith("❌"):
+        return "ERROR"
+    if msg.startswith("⚠️"):
+        return "WARNING"
+    return "INFO"
+
+
+def normalize_level(level):
+    """Canonical level name; aliases are mapped and anything unknown is INFO,
+    so a logging call never fails on its level."""
+    level = str(level).upper()
+    level = LEVEL_ALIASES.get(level, level)
+    return level if level in LEVELS else "INFO"
+
+
+class RotatingFile:
+    """Append-only file rotated by size and, optionally, by calendar day."""
+
+    def __init__(self, path, max_bytes, backups, daily):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.daily = daily
+        self._file = None
+        self._day = None
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        mtime = os.path.getmtime(self.path)
+        self._day = datetime.date.fromtimestamp(mtime) if self._file.tell() else datetime.date.today()
+
+    def write(self, text):
+        if self._file is None:
+            self._open()
+        if self._should_rotate(len(text)):
+            self.rotate()
+        self._file.write(text)
+
+    def _should_rotate(self, incoming):
+        if self._file.tell() == 0:
+            return False
+        if self.daily and datetime.date.today() != self._day:
+            return True
+        return bool(self.max_bytes) and self._file.tell() + incoming > self.max_bytes
+
+    def rotate(self):
+        self.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def truncate(self):
+        self.close()
+        open(self.path, "w", encoding="utf-8").close()
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogWriter:
+    """Queue-backed log writer. Callers only format and enqueue; a
+    background thread writes whole batches and flushes once per batch.
+    If the queue is ever full, entries are dropped and counted rather
+    than blocking the caller."""
+
+    def __init__(self, path=LOG_PATH, json_path=JSON_LOG_PATH, settings=None):
+        self.settings = settings or get_setting("logging", LOGGING_DEFAULTS)
+        self.level = LEVELS[normalize_level(self.settings["level"])]
+        rotation = (self.settings["max_bytes"], self.settings["backups"], self.settings["daily"])
+        self._text = RotatingFile(path, *rotation)
+        self._json = RotatingFile(json_path, *rotation) if self.settings["json"] else None
+        self._queue = queue.Queue(maxsize=self.settings["queue_size"])
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dropped = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="logger", daemon=True)
+                self._thread.start()
+
+    def submit(self, record):
+        if LEVELS.get(record["level"], LEVELS["INFO"]) < self.level:
+            return False
+        self._start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is already waiting into the same write
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        with self._lock:
+            for record in batch:
+                if record.get("_control") == "clear":
+                    self._text.truncate()
+                    if self._json:
+                        self._json.truncate()
+                    continue
+                self._text.write(record["text"] + "\n")
+                if self._json:
+                    entry = {k: v for k, v in record.items() if k != "text"}
+                    self._json.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._text.flush()
+            if self._json:
+                self._json.flush()
+
+    def clear(self):
+        self._start()
+        self._queue.put({"_control": "clear", "level": "ERROR"})
+        self.flush()
+
+    def flush(self):
+        """Block until everything queued so far is on disk."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stats(self):
+        return {"depth": self._queue.qsize(), "dropped": self.dropped}
+
+
+class LogBoxSink:
+    """Coalesces entries for one Tk Text widget. Any thread may call
+    write(); the widget is only touched by an after() loop on the Tk
+    thread, which inserts everything pending in a single call."""
+
+    def __init__(self, widget, interval_ms=100, max_lines=1000):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.max_lines = max_lines
+        self._pending = collections.deque()
+        self._scheduled = False
+
+    def write(self, entry):
+        self._pending.append(entry)
+
+    def start(self):
+        # Must be called from the Tk thread
+        if not self._scheduled:
+            self._scheduled = True
+            self.widget.after(self.interval_ms, self._drain)
+
+    def _drain(self):
+        lines = []
+        while self._pending:
+            lines.append(self._pending.popleft())
         try:
-            log_box.insert("end", log_entry + "\n")
-            log_box.see("end")
+            if lines:
+                self.widget.insert("end", "\n".join(lines) + "\n")
+                excess = int(self.widget.index("end-1c").split(".")[0]) - self.max_lines
+                if excess > 0:
+                    self.widget.delete("1.0", f"{excess + 1}.0")
+                self.widget.see("end")
+            self.widget.after(self.interval_ms, self._drain)
         except Exception:
-            pass
\ No newline at end of file
+            # Widget destroyed: stop polling
+            self._scheduled = False
+
+
+writer = LogWriter()
+_sinks = {}
+_sinks_lock = threading.Lock()
+atexit.register(writer.flush)
+
+
+def attach_log_box(widget, interval_ms=100):
+    """Start batched updates for a log widget (call from the Tk thread)."""
+    sink = _sink_for(widget)
+    sink.start()
+    return sink
+
+
+def _sink_for(widget):
+    with _sinks_lock:
+        sink = _sinks.get(id(widget))
+        if sink is None or sink.widget is not widget:
+            sink = _sinks[id(widget)] = LogBoxSink(widget)
+        return sink
+
+
+def log_message(msg: str, log_box=None, level=None, **fields):
+    """Log one message and return the formatted entry.
+
+    The file write happens on the logger thread. A log_box receives the
+    entry through its batching sink, so this is safe to call from worker
+    threads; the box must have been attached with attach_log_box() on the
+    Tk thread for entries to show up.
+    """
+    now = datetime.datetime.now()
+    log_entry = f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] {msg}"
+    level = normalize_level(level or _infer_level(msg))
+    writer.submit({
+        "ts": now.isoformat(timespec="milliseconds"),
+        "level": level,
+        "thread": threading.current_thread().name,
+        "msg": msg,
+        **fields,
+        "text": log_entry,
+    })
+
+    if log_box is not None:
+        sink = _sink_for(log_box)
+        sink.write(log_entry)
+        if threading.current_thread() is threading.main_thread():
+            sink.start()
+
+    return log_entry
+
+
+def clear_log():
+    writer.clear()
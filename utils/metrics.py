@@ -0,0 +1,92 @@
+import threading, time
+from contextlib import contextmanager
+
+
+class LatencyStats:
+    """Thread-safe running latency counter (milliseconds)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        ms = seconds * 1000.0
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            self.last_ms = ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def time(self):
+        return _Timer(self)
+
+    @property
+    def avg_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "avg_ms": round(self.avg_ms, 3),
+                "last_ms": round(self.last_ms, 3),
+                "max_ms": round(self.max_ms, 3),
+            }
+
+
+class _Timer:
+    def __init__(self, stats):
+        self.stats = stats
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(time.perf_counter() - self.start)
+        return False
+
+
+class FpsMeter:
+    """Exponentially smoothed frames-per-second counter."""
+
+    def __init__(self, smoothing=0.9):
+        self.smoothing = smoothing
+        self.fps = 0.0
+        self._last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            dt = now - self._last
+            if dt > 0:
+                instant = 1.0 / dt
+                self.fps = instant if not self.fps else self.smoothing * self.fps + (1 - self.smoothing) * instant
+        self._last = now
+        return self.fps
+
+
+class StageTimer:
+    """Collects named stage durations for a Server-Timing header."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000.0
+
+    def merge(self, other):
+        for name, ms in other.stages.items():
+            self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def header(self):
+        return ", ".join(f"{name};dur={ms:.2f}" for name, ms in self.stages.items())
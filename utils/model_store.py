@@ -0,0 +1,169 @@
+import json, os, struct
+import cv2, numpy as np
+
+try:
+    from config import MODEL_PATH, BINARY_MODEL_PATH
+except ImportError:
+    from utils.config import MODEL_PATH, BINARY_MODEL_PATH
+
+# File layout: MAGIC | uint32 header length | JSON header | padding |
+# int32 labels | padding | histograms (count x dim, row-major).
+# Array offsets are 64-byte aligned so both can be memory-mapped.
+MAGIC = b"LBPHBIN1"
+ALIGN = 64
+
+
+class BinaryModel:
+    def __init__(self, histograms, labels, params, path=None):
+        self.histograms = histograms
+        self.labels = labels
+        self.params = params
+        self.path = path
+
+    def __len__(self):
+        return len(self.labels)
+
+    def float_histograms(self):
+        """Histograms as float32, decoding the uint16 quantised form if needed."""
+        if self.histograms.dtype == np.float32:
+            return self.histograms
+        return self.histograms.astype(np.float32) * np.float32(self.params["scale"])
+
+
+def _cell_pixels(params, face_size=200):
+    inner = face_size - 2 * params["radius"]
+    return (inner // params["grid_x"]) * (inner // params["grid_y"])
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_binary_model(path, histograms, labels, params, dtype="float32"):
+    """Write histograms + labels. dtype="uint16" stores per-cell counts,
+    which is lossless for LBPH (each bin is count / pixels-per-cell)."""
+    histograms = np.ascontiguousarray(histograms, dtype=np.float32)
+    labels = np.ascontiguousarray(labels, dtype=np.int32).ravel()
+    count, dim = histograms.shape if histograms.size else (0, 0)
+
+    header = dict(params, count=int(count), dim=int(dim), dtype=dtype, scale=1.0)
+    if dtype == "uint16":
+        cell = _cell_pixels(params)
+        header["scale"] = 1.0 / cell
+        data = np.rint(histograms * cell).astype(np.uint16)
+    elif dtype == "float32":
+        data = histograms
+    else:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+
+    # Offsets depend on the header length, which depends on the offsets;
+    # reserve room for them first, then fill them in.
+    header["labels_offset"] = header["hist_offset"] = 0
+    header_len = len(json.dumps(header).encode()) + 32
+    labels_offset = _aligned(len(MAGIC) + 4 + header_len)
+    header["labels_offset"] = labels_offset
+    header["hist_offset"] = _aligned(labels_offset + labels.nbytes)
+    header_bytes = json.dumps(header).encode().ljust(header_len)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", header_len))
+        f.write(header_bytes)
+        f.seek(labels_offset)
+        f.write(labels.tobytes())
+        f.seek(header["hist_offset"])
+        f.write(data.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a binary LBPH model")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(header_len).decode())
+
+
+def load_binary_model(path=BINARY_MODEL_PATH, mmap=True):
+    header = read_header(path)
+    count, dim = header["count"], header["dim"]
+    dtype = np.float32 if header["dtype"] == "float32" else np.uint16
+
+    if mmap and count:
+        labels = np.memmap(path, dtype=np.int32, mode="r", offset=header["labels_offset"], shape=(count,))
+        histograms = np.memmap(path, dtype=dtype, mode="r", offset=header["hist_offset"], shape=(count, dim))
+    else:
+        with open(path, "rb") as f:
+            f.seek(header["labels_offset"])
+            labels = np.frombuffer(f.read(count * 4), dtype=np.int32)
+            f.seek(header["hist_offset"])
+            histograms = np.frombuffer(f.read(count * dim * np.dtype(dtype).itemsize), dtype=dtype).reshape(count, dim)
+
+    params = {k: header[k] for k in ("radius", "neighbors", "grid_x", "grid_y", "scale")}
+    return BinaryModel(histograms, labels, params, path)
+
+
+def save_recognizer_binary(recognizer, path=BINARY_MODEL_PATH, dtype="float32"):
+    histograms = recognizer.getHistograms()
+    labels = recognizer.getLabels()
+    params = {
+        "radius": recognizer.getRadius(),
+        "neighbors": recognizer.getNeighbors(),
+        "grid_x": recognizer.getGridX(),
+        "grid_y": recognizer.getGridY(),
+    }
+    stacked = np.vstack([h.reshape(1, -1) for h in histograms]) if histograms else np.zeros((0, 0), np.float32)
+    save_binary_model(path, stacked, labels, params, dtype)
+
+
+def yaml_to_binary(yaml_path=MODEL_PATH, binary_path=BINARY_MODEL_PATH, dtype="float32"):
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(yaml_path)
+    save_recognizer_binary(recognizer, binary_path, dtype)
+
+
+def binary_to_yaml(binary_path=BINARY_MODEL_PATH, yaml_path=MODEL_PATH):
+    """Write an OpenCV-readable LBPH YAML file from a binary model."""
+    model = load_binary_model(binary_path, mmap=False)
+    histograms = model.float_histograms()
+
+    tmp_path = os.path.splitext(yaml_path)[0] + ".tmp.yml"
+    fs = cv2.FileStorage(tmp_path, cv2.FILE_STORAGE_WRITE)
+    fs.startWriteStruct("opencv_lbphfaces", cv2.FILE_NODE_MAP)
+    fs.write("threshold", float(np.finfo(np.float64).max))
+    for key in ("radius", "neighbors", "grid_x", "grid_y"):
+        fs.write(key, int(model.params[key]))
+    fs.startWriteStruct("histograms", cv2.FILE_NODE_SEQ)
+    for row in histograms:
+        fs.write("", np.ascontiguousarray(row.reshape(1, -1)))
+    fs.endWriteStruct()
+    fs.write("labels", np.ascontiguousarray(model.labels, dtype=np.int32).reshape(-1, 1))
+    fs.startWriteStruct("labelsInfo", cv2.FILE_NODE_SEQ)
+    fs.endWriteStruct()
+    fs.endWriteStruct()
+    fs.release()
+    os.replace(tmp_path, yaml_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert between LBPH YAML and binary model formats")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("to-binary")
+    p.add_argument("--yaml", default=MODEL_PATH)
+    p.add_argument("--out", default=BINARY_MODEL_PATH)
+    p.add_argument("--dtype", choices=["float32", "uint16"], default="float32")
+    p = sub.add_parser("to-yaml")
+    p.add_argument("--binary", default=BINARY_MODEL_PATH)
+    p.add_argument("--out", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "to-binary":
+        yaml_to_binary(args.yaml, args.out, args.dtype)
+    else:
+        binary_to_yaml(args.binary, args.out)
+    print(f"Wrote {args.out}")
@@ -0,0 +1,213 @@
+import cv2, os, threading, time
+
+try:
+    from config import MODEL_PATH, BINARY_MODEL_PATH, get_setting
+    from logger import log_message
+    from metrics import LatencyStats
+    from model_store import load_binary_model
+    from lbp_matcher import LBPMatcher
+    from ann_index import ANN_DEFAULTS, load_index
+    from shards import shard_path
+except ImportError:
+    from utils.config import MODEL_PATH, BINARY_MODEL_PATH, get_setting
+    from utils.logger import log_message
+    from utils.metrics import LatencyStats
+    from utils.model_store import load_binary_model
+    from utils.lbp_matcher import LBPMatcher
+    from utils.ann_index import ANN_DEFAULTS, load_index
+    from utils.shards import shard_path
+
+LBPH_PARAMS = dict(radius=2, neighbors=8, grid_x=8, grid_y=8)
+# format: "auto" uses the binary model when it is at least as new as the YAML one
+# prototypes: "mean" matches against one averaged histogram per student
+MODEL_DEFAULTS = {"format": "auto", "binary_dtype": "float32", "prototypes": "none", "top_k": 5}
+
+
+def create_lbph():
+    return cv2.face.LBPHFaceRecognizer_create(**LBPH_PARAMS)
+
+
+class OpenCVModel:
+    format = "yaml"
+
+    def __init__(self, path, prototypes="none", ann=None):
+        self.recognizer = create_lbph()
+        self.recognizer.read(path)
+        self.prototypes = prototypes
+        self.n_probe = ann["n_probe"] if ann else 0
+        self.index = load_index(self.recognizer.getLabels().ravel(), ann) if ann else None
+        self._has_gallery = len(self.recognizer.getLabels()) > 0
+        self._matcher = None
+
+    @property
+    def matcher(self):
+        # Built on first use only; without an ANN index predict() stays in OpenCV
+        if self._matcher is None:
+            self._matcher = LBPMatcher.from_recognizer(
+                self.recognizer, self.prototypes, index=self.index, n_probe=self.n_probe
+            )
+        return self._matcher
+
+    def predict(self, face):
+        if self.index is not None:
+            return self.matcher.predict(face)
+        return self.recognizer.predict(face)
+
+    def search(self, faces, k):
+        # For the single best match over the whole gallery OpenCV's own
+        # predict is at least as fast as the NumPy matcher, which only wins
+        # for top-k, prototypes and the ANN index
+        if k == 1 and self.index is None and self.prototypes == "none" and self._has_gallery:
+            matches = [self.recognizer.predict(face) for face in faces]
+            return [[(int(label), float(distance))] if label >= 0 else [] for label, distance in matches]
+        return self.matcher.search(faces, k)
+
+
+class HistogramModel:
+    """Matches against a memory-mapped binary model with the NumPy
+    matcher. The gallery pages are shared through the OS page cache by
+    every process that maps the same file."""
+
+    format = "binary"
+
+    def __init__(self, path, prototypes="none", ann=None):
+        model = load_binary_model(path)
+        index = load_index(model.labels, ann) if ann else None
+        self.matcher = LBPMatcher.from_binary(
+            model, prototypes, index=index, n_probe=ann["n_probe"] if ann else 0
+        )
+
+    @property
+    def index(self):
+        return self.matcher.index
+
+    def predict(self, face):
+        return self.matcher.predict(face)
+
+    def search(self, faces, k):
+        return self.matcher.search(faces, k)
+
+
+class RecognizerEngine:
+    """Keeps one trained model in memory and reloads it only when the
+    model file on disk changes (mtime or size)."""
+
+    def __init__(self, model_path=MODEL_PATH, binary_path=BINARY_MODEL_PATH, settings=None, ann=None):
+        self.model_path = model_path
+        self.binary_path = binary_path
+        self.settings = settings or get_setting("model", MODEL_DEFAULTS)
+        self.ann = ann or get_setting("ann", ANN_DEFAULTS)
+        self._lock = threading.Lock()
+        self._model = None
+        self._signature = None
+        self.version = 0
+        self.shard_loads = 0
+        self.load_ms = None
+        self.predict_stats = LatencyStats()
+        self._shards = {}  # kelas -> (file signature, model)
+
+    def _select(self):
+        """(format, path, signature) of the model file to serve, or None."""
+        candidates = {}
+        for fmt, path in (("yaml", self.model_path), ("binary", self.binary_path)):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            candidates[fmt] = (fmt, path, (fmt, st.st_mtime_ns, st.st_size))
+
+        wanted = self.settings["format"]
+        if wanted != "auto":
+            return candidates.get(wanted)
+        if "binary" in candidates and (
+            "yaml" not in candidates or candidates["binary"][2][1] >= candidates["yaml"][2][1]
+        ):
+            return candidates["binary"]
+        return candidates.get("yaml")
+
+    def current(self):
+        """Return the loaded model, reloading first if the file changed."""
+        selected = self._select()
+        if selected is None:
+            if self._model is None:
+                raise FileNotFoundError(f"Model not found: {self.model_path} (train the model first)")
+            return self._model
+
+        fmt, path, signature = selected
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._load(fmt, path, signature)
+        return self._model
+
+    def _load(self, fmt, path, signature):
+        start = time.perf_counter()
+        model_cls = HistogramModel if fmt == "binary" else OpenCVModel
+        model = model_cls(path, self.settings["prototypes"], self.ann)
+        self.load_ms = (time.perf_counter() - start) * 1000.0
+
+        # Swap only after the new model is fully read so concurrent
+        # predictions keep using the previous one until then.
+        self._model = model
+        self._signature = signature
+        self.version += 1
+        log_message(f"🧠 Model loaded from {path} in {self.load_ms:.1f} ms (v{self.version})")
+
+    def shard(self, kelas):
+        """The model for one class roster, or None if it has no shard yet
+        (callers then search the full gallery)."""
+        path = shard_path(kelas)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+
+        cached = self._shards.get(kelas)
+        if cached is None or cached[0] != signature:
+            with self._lock:
+                cached = self._shards.get(kelas)
+                if cached is None or cached[0] != signature:
+                    cached = self._shards[kelas] = (signature, HistogramModel(path, self.settings["prototypes"]))
+                    self.shard_loads += 1
+                    log_message(f"🧠 Shard for class {kelas} loaded from {path}")
+        return cached[1]
+
+    def generation(self, kelas=None):
+        """Reload the model (and `kelas`'s shard) if their files changed and
+        return a token that changes whenever either is replaced, so cached
+        search results can be tied to the models that produced them."""
+        self.current()
+        if kelas:
+            self.shard(kelas)
+        return self.version, self.shard_loads
+
+    def _model_for(self, kelas):
+        return (self.shard(kelas) if kelas else None) or self.current()
+
+    def predict(self, face, kelas=None):
+        """Best (label, distance); with `kelas`, only that class's roster."""
+        model = self._model_for(kelas)
+        with self.predict_stats.time():
+            return model.predict(face)
+
+    def search(self, faces, k=None, kelas=None):
+        """Top-k (label, distance) candidates for each face in a batch."""
+        model = self._model_for(kelas)
+        with self.predict_stats.time():
+            return model.search(faces, k or self.settings["top_k"])
+
+    def stats(self):
+        return {
+            "model_path": self.model_path,
+            "format": self._model.format if self._model else None,
+            "ann": bool(self._model and self._model.index is not None),
+            "shards": sorted(self._shards),
+            "version": self.version,
+            "shard_loads": self.shard_loads,
+            "load_ms": round(self.load_ms, 3) if self.load_ms is not None else None,
+            "predict": self.predict_stats.snapshot(),
+        }
+
+
+engine = RecognizerEngine()
@@ -0,0 +1,188 @@
+import csv, io, os, sys, threading, time
+from collections import defaultdict
+
+try:
+    from config import CSV_PATH
+    from logger import log_message
+except ImportError:
+    from utils.config import CSV_PATH
+    from utils.logger import log_message
+
+STUDENT_COLUMNS = ["id", "nama", "kelas", "total_kehadiran", "email", "nomor_telepon", "waktu_kehadiran"]
+INT_COLUMNS = ("id", "total_kehadiran")
+
+
+class StudentRegistry:
+    """Process-wide view of students.csv indexed by ID and class.
+
+    Rows are kept as tuples of (interned) strings and only turned into
+    dicts on lookup. The file is re-checked at most every `check_interval`
+    seconds and only rows that actually changed are re-indexed.
+    """
+
+    def __init__(self, path=CSV_PATH, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.columns = list(STUDENT_COLUMNS)
+        self._rows = {}
+        self._by_class = defaultdict(set)
+        self._lock = threading.RLock()
+        self._signature = None
+        self._checked_at = 0.0
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+
+        with self._lock:
+            if signature is None:
+                self._rows.clear()
+                self._by_class.clear()
+            else:
+                self._reload()
+            self._signature = signature
+
+    def _reload(self):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header:
+                self.columns = header
+            id_pos = self.columns.index("id")
+
+            seen, changed = set(), 0
+            for values in reader:
+                if not values:
+                    continue
+                row = tuple(sys.intern(v) for v in values)
+                student_id = _normalize_id(row[id_pos])
+                seen.add(student_id)
+                if self._rows.get(student_id) != row:
+                    self._store(student_id, row)
+                    changed += 1
+
+        removed = [sid for sid in self._rows if sid not in seen]
+        for student_id in removed:
+            self._drop(student_id)
+
+        if changed or removed:
+            log_message(f"📚 Student registry refreshed: {changed} changed, {len(removed)} removed, {len(self._rows)} total")
+
+    def _store(self, student_id, row):
+        # Assigning an existing key keeps its position, so to_csv() writes
+        # rows in a stable order
+        old = self._rows.get(student_id)
+        self._rows[student_id] = row
+        kelas = self._value(row, "kelas")
+        if old is not None:
+            old_kelas = self._value(old, "kelas")
+            if old_kelas == kelas:
+                return
+            self._by_class[old_kelas].discard(student_id)
+        self._by_class[kelas].add(student_id)
+
+    def _drop(self, student_id):
+        old = self._rows.pop(student_id, None)
+        if old is not None:
+            self._by_class[self._value(old, "kelas")].discard(student_id)
+
+    def _value(self, row, column):
+        try:
+            return row[self.columns.index(column)]
+        except (ValueError, IndexError):
+            return ""
+
+    def _to_dict(self, row):
+        student = dict(zip(self.columns, row))
+        for col in INT_COLUMNS:
+            value = student.get(col)
+            if value:
+                try:
+                    student[col] = int(float(value))
+                except ValueError:
+                    pass
+        return student
+
+    def get(self, student_id, default=None):
+        self.refresh()
+        row = self._rows.get(_normalize_id(student_id))
+        return self._to_dict(row) if row is not None else default
+
+    def __contains__(self, student_id):
+        self.refresh()
+        return _normalize_id(student_id) in self._rows
+
+    def __len__(self):
+        self.refresh()
+        return len(self._rows)
+
+    def ids(self):
+        self.refresh()
+        return list(self._rows)
+
+    def by_class(self, kelas):
+        self.refresh()
+        with self._lock:
+            return [self._to_dict(self._rows[sid]) for sid in sorted(self._by_class.get(kelas, ()))]
+
+    def classes(self):
+        self.refresh()
+        return sorted(k for k, ids in self._by_class.items() if ids)
+
+    def all(self):
+        self.refresh()
+        with self._lock:
+            return {sid: self._to_dict(row) for sid, row in self._rows.items()}
+
+    def update(self, student: dict):
+        """Write a (possibly modified) student dict back into the index."""
+        with self._lock:
+            row = tuple(sys.intern("" if student.get(col) is None else str(student.get(col))) for col in self.columns)
+            self._store(_normalize_id(student["id"]), row)
+
+    def to_csv(self):
+        with self._lock:
+            buf = io.StringIO(newline="")
+            writer = csv.writer(buf, lineterminator="\n")
+            writer.writerow(self.columns)
+            writer.writerows(self._rows.values())
+            return buf.getvalue()
+
+    def save(self, content=None):
+        """Atomically rewrite the CSV (optionally with a pre-rendered to_csv())."""
+        with self._lock:
+            if not self._rows:
+                return
+            if content is None:
+                content = self.to_csv()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            # Our own write should not trigger a reload
+            self._signature = self._file_signature()
+
+
+def _normalize_id(student_id):
+    student_id = str(student_id).strip()
+    if student_id.endswith(".0"):
+        student_id = student_id[:-2]
+    return student_id
+
+
+registry = StudentRegistry()
@@ -0,0 +1,212 @@
+import fnmatch, re, shlex
+import numpy as np
+import pandas as pd
+
+STUDENT_FIELDS = {
+    "id": "id", "nama": "nama", "name": "nama", "kelas": "kelas", "class": "kelas",
+    "total": "total_kehadiran", "email": "email", "telepon": "nomor_telepon", "phone": "nomor_telepon",
+    "waktu": "waktu_kehadiran", "date": "waktu_kehadiran",
+}
+HISTORY_FIELDS = {
+    "id": "id", "name": "name", "nama": "name", "status": "status",
+    "date": "timestamp", "timestamp": "timestamp", "waktu": "timestamp",
+}
+
+# field>=value, field<value, ... and field:value / field:low..high
+_COMPARISON = re.compile(r"^(\w+)(>=|<=|>|<)(.+)$")
+_QUALIFIED = re.compile(r"^(\w+):(.*)$")
+# Sorts after any character in the data, so "2025-09" as an upper bound
+# includes every timestamp that starts with it
+_HIGH = "\uffff"
+DATE_COLUMNS = ("timestamp", "waktu_kehadiran")
+
+
+class SearchIndex:
+    """Search over a DataFrame through cached, normalized columns.
+
+    Query terms are ANDed:
+      text            substring of any column
+      field:value     exact match (case-insensitive); prefix on date fields
+      field:val*      prefix (other * / ? patterns also work)
+      field:a..b      inclusive range, either side optional; on dates a
+                      bound like 2025-09 covers the whole month
+      field>=value    also >, <, <=
+    Exact, range and comparison terms on numeric columns (id, total)
+    compare numbers, so total>=5 includes 10.
+
+    Each column is kept as sorted lowercase unique values plus one code
+    per row, so exact, prefix and range terms are a binary search and a
+    vectorized compare, and substring terms only test each distinct value
+    once (history has few distinct ids, names and statuses).
+    """
+
+    def __init__(self, df, fields, prefix_columns=DATE_COLUMNS):
+        self.fields = fields
+        self.prefix_columns = prefix_columns
+        self.df = df.reset_index(drop=True)
+        self._columns = {}
+        self._numbers = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def extend(self, rows):
+        """Append rows (e.g. newly journaled check-ins) to the index."""
+        if len(rows) == 0:
+            return
+        self.df = pd.concat([self.df, rows], ignore_index=True)
+        self._columns.clear()
+        self._numbers.clear()
+
+    def _column(self, name):
+        entry = self._columns.get(name)
+        if entry is None:
+            lowered = self.df[name].astype(str).str.lower()
+            codes, uniques = pd.factorize(lowered, sort=True)
+            entry = self._columns[name] = (codes, np.asarray(uniques, dtype=str))
+        return entry
+
+    def _numeric(self, name):
+        """(codes, sorted unique values) of a column whose values are all
+        numbers (blanks allowed, they never match), else None."""
+        if name not in self._numbers:
+            column = self.df[name]
+            if pd.api.types.is_numeric_dtype(column):
+                numbers = column.astype(float)
+            else:
+                numbers = pd.to_numeric(column, errors="coerce")
+                text = column.astype(str).str.strip()
+                if (numbers.isna() & (text != "") & column.notna()).any():
+                    numbers = None
+            entry = None
+            if numbers is not None:
+                codes, uniques = pd.factorize(numbers, sort=True)
+                entry = (codes, np.asarray(uniques, dtype=float))
+            self._numbers[name] = entry
+        return self._numbers[name]
+
+    def _number_range(self, name, low, high, low_inclusive=True, high_inclusive=True):
+        """Rows with low <(=) value <(=) high; None = open."""
+        codes, uniques = self._numeric(name)
+        start = np.searchsorted(uniques, low, side="left" if low_inclusive else "right") if low is not None else 0
+        stop = np.searchsorted(uniques, high, side="right" if high_inclusive else "left") if high is not None else len(uniques)
+        return (codes >= start) & (codes < stop)
+
+    def _range(self, name, low, high, inclusive=False):
+        """Rows with low <= value < high (<= high if inclusive); None = open."""
+        codes, uniques = self._column(name)
+        start = np.searchsorted(uniques, low, side="left") if low is not None else 0
+        stop = np.searchsorted(uniques, high, side="right" if inclusive else "left") if high is not None else len(uniques)
+        return (codes >= start) & (codes < stop)
+
+    def _matching(self, name, term):
+        """Rows whose value contains `term` (str) or matches it (compiled pattern)."""
+        codes, uniques = self._column(name)
+        if isinstance(term, str):
+            hits = np.char.find(uniques, term) >= 0
+        else:
+            hits = np.fromiter((term.match(u) is not None for u in uniques.tolist()), dtype=bool, count=len(uniques))
+        return hits[codes]
+
+    def _resolve(self, field):
+        name = self.fields.get(field.lower())
+        if name is None or name not in self.df.columns:
+            raise ValueError(f"Unknown search field: {field} (use one of {', '.join(sorted(self.fields))})")
+        return name
+
+    def _is_numeric(self, name):
+        return name not in self.prefix_columns and self._numeric(name) is not None
+
+    def _parse(self, query):
+        """(indexed terms, numeric terms, text/pattern terms) from a query string."""
+        try:
+            tokens = shlex.split(query)
+        except ValueError:
+            tokens = query.split()
+
+        indexed, numeric, scanned = [], [], []
+        for token in tokens:
+            token = token.lower()
+            m = _COMPARISON.match(token)
+            if m:
+                name, op, value = self._resolve(m.group(1)), m.group(2), m.group(3)
+                if self._is_numeric(name):
+                    number = _number(m.group(1), value)
+                    if op in (">=", ">"):
+                        numeric.append((name, number, None, op == ">=", True))
+                    else:
+                        numeric.append((name, None, number, True, op == "<="))
+                elif op == ">=":
+                    indexed.append((name, value, None, False))
+                elif op == ">":
+                    indexed.append((name, value + _HIGH, None, False))
+                elif op == "<=":
+                    indexed.append((name, None, value + _HIGH, False))
+                else:
+                    indexed.append((name, None, value, False))
+                continue
+
+            m = _QUALIFIED.match(token)
+            if not m:
+                scanned.append((None, token))
+                continue
+            name, value = self._resolve(m.group(1)), m.group(2)
+            if self._is_numeric(name) and ".." in value:
+                low, high = value.split("..", 1)
+                numeric.append((name, _number(m.group(1), low) if low else None,
+                                _number(m.group(1), high) if high else None, True, True))
+            elif self._is_numeric(name) and _is_number(value):
+                numeric.append((name, float(value), float(value), True, True))
+            elif ".." in value:
+                low, high = value.split("..", 1)
+                indexed.append((name, low or None, (high + _HIGH) if high else None, False))
+            elif value.endswith("*") and not any(c in value[:-1] for c in "*?["):
+                indexed.append((name, value[:-1], value[:-1] + _HIGH, False))
+            elif any(c in value for c in "*?["):
+                scanned.append((name, re.compile(fnmatch.translate(value))))
+            elif name in self.prefix_columns:
+                indexed.append((name, value, value + _HIGH, False))
+            else:
+                indexed.append((name, value, value, True))
+        return indexed, numeric, scanned
+
+    def search_mask(self, query):
+        """Boolean mask of the rows matching a query."""
+        indexed, numeric, scanned = self._parse(query)
+        mask = np.ones(len(self.df), dtype=bool)
+        for name, low, high, inclusive in indexed:
+            mask &= self._range(name, low, high, inclusive)
+        for term in numeric:
+            mask &= self._number_range(*term)
+
+        for name, term in scanned:
+            if not mask.any():
+                break
+            if name is not None:
+                mask &= self._matching(name, term)
+                continue
+            found = np.zeros(len(self.df), dtype=bool)
+            for column in self.df.columns:
+                found |= self._matching(column, term)
+            mask &= found
+        return mask
+
+    def search(self, query):
+        """Matching rows of the indexed DataFrame, in their original order."""
+        if not query.strip():
+            return self.df
+        return self.df[self.search_mask(query)]
+
+
+def _is_number(value):
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _number(field, value):
+    if not _is_number(value):
+        raise ValueError(f"{field} expects a number, got {value!r}")
+    return float(value)
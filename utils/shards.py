@@ -0,0 +1,60 @@
+import hashlib, json, os, re
+import numpy as np
+
+try:
+    from config import SHARDS_DIR
+    from model_store import save_binary_model
+except ImportError:
+    from utils.config import SHARDS_DIR
+    from utils.model_store import save_binary_model
+
+SHARD_MANIFEST_PATH = os.path.join(SHARDS_DIR, "shards.json")
+# kelas: roster to match ("" = everyone); fallback: search the full gallery
+# when nobody in the roster is close enough
+SESSION_DEFAULTS = {"kelas": "", "fallback": True}
+
+
+def shard_path(kelas):
+    """File for one class shard. Class names are free text, so the name is
+    slugged and suffixed with a short hash to stay unique and path-safe."""
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", kelas).strip("_") or "class"
+    digest = hashlib.sha1(kelas.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(SHARDS_DIR, f"{slug}-{digest}.lbph")
+
+
+def build_shards(histograms, labels, classes, params, dtype="float32"):
+    """Split a trained gallery into one binary model per class.
+
+    `classes` maps student id (str) to kelas; students without a class are
+    only in the full model. Shards of classes that no longer exist are
+    removed. Returns {kelas: number of gallery rows}.
+    """
+    labels = np.asarray(labels, dtype=np.int32).ravel()
+    row_classes = np.array([classes.get(str(label)) or "" for label in labels])
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+
+    built = {}
+    for kelas in sorted(set(row_classes.tolist()) - {""}):
+        rows = np.flatnonzero(row_classes == kelas)
+        gallery = np.vstack([np.reshape(histograms[i], (1, -1)) for i in rows])
+        save_binary_model(shard_path(kelas), gallery, labels[rows], params, dtype)
+        built[kelas] = len(rows)
+
+    keep = {os.path.basename(shard_path(kelas)) for kelas in built}
+    for name in os.listdir(SHARDS_DIR):
+        if name.endswith(".lbph") and name not in keep:
+            os.remove(os.path.join(SHARDS_DIR, name))
+
+    tmp_path = SHARD_MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({kelas: {"file": os.path.basename(shard_path(kelas)), "rows": n} for kelas, n in built.items()}, f, indent=2)
+    os.replace(tmp_path, SHARD_MANIFEST_PATH)
+    return built
+
+
+def load_shard_manifest():
+    try:
+        with open(SHARD_MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
@@ -0,0 +1,219 @@
+import os, queue, shutil, threading, time
+from datetime import datetime, timedelta
+import cv2
+
+try:
+    from config import LOGS_DIR, get_setting
+    from logger import log_message
+    from metrics import LatencyStats
+except ImportError:
+    from utils.config import LOGS_DIR, get_setting
+    from utils.logger import log_message
+    from utils.metrics import LatencyStats
+
+# format: jpg | webp | png. max_side: downscale longer side (0 = keep).
+# Retention: date folders older than retention_days are deleted, then the
+# oldest files until the total is under max_total_mb (0 = no limit).
+SNAPSHOT_DEFAULTS = {
+    "format": "jpg",
+    "quality": 85,
+    "max_side": 480,
+    "margin": 200,
+    "queue_size": 32,
+    "retention_days": 90,
+    "max_total_mb": 1024,
+    "prune_interval": 3600,
+}
+SNAPSHOT_EXTS = (".jpg", ".webp", ".png")
+
+
+def snapshot_dir(timestamp, root=LOGS_DIR):
+    return os.path.join(root, timestamp.strftime("%Y"), timestamp.strftime("%m"), timestamp.strftime("%d"))
+
+
+def snapshot_name(student_id, timestamp):
+    return f"{student_id}-{timestamp.strftime('%Y%m%d%H%M%S')}"
+
+
+def find_snapshot(student_id, timestamp, root=LOGS_DIR):
+    """Path of the snapshot for one check-in, or None. Also finds PNGs
+    written flat into Data/Logs before snapshots were date-sharded."""
+    name = snapshot_name(student_id, timestamp)
+    for folder in (snapshot_dir(timestamp, root), root):
+        for ext in SNAPSHOT_EXTS:
+            path = os.path.join(folder, name + ext)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+class SnapshotWriter:
+    """Encodes and writes check-in snapshots on a background thread.
+
+    submit() only copies the crop and enqueues it, so the video loop never
+    waits on encoding or disk. When the bounded queue is full the snapshot
+    is dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, root=LOGS_DIR, settings=None):
+        self.root = root
+        self.settings = settings or get_setting("snapshots", SNAPSHOT_DEFAULTS)
+        self._queue = queue.Queue(maxsize=self.settings["queue_size"])
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_prune = 0.0
+        self.write_stats = LatencyStats()
+        self.written = 0
+        self.dropped = 0
+        self.pruned = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="snapshots", daemon=True)
+                self._thread.start()
+
+    def submit(self, student, frame, face_coords, timestamp):
+        x, y, w, h = face_coords
+        margin = self.settings["margin"]
+        x1, y1 = max(0, x - margin), max(0, y - margin)
+        x2, y2 = min(frame.shape[1], x + w + margin), min(frame.shape[0], y + h + margin)
+        # Copy now: the frame keeps being drawn on after this returns
+        crop = frame[y1:y2, x1:x2].copy()
+
+        self._start()
+        try:
+            self._queue.put_nowait((dict(student), crop, timestamp))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            log_message(f"⚠️ Snapshot queue full, dropped snapshot for {student['nama']}")
+            return False
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                item = None
+            if item is False:
+                self._queue.task_done()
+                return
+            if item is not None:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    log_message(f"❌ Snapshot write failed: {e}")
+                finally:
+                    self._queue.task_done()
+            if time.monotonic() - self._last_prune >= self.settings["prune_interval"]:
+                self._last_prune = time.monotonic()
+                self.prune()
+
+    def _encode(self, crop):
+        fmt = self.settings["format"].lower().lstrip(".")
+        max_side = self.settings["max_side"]
+        if max_side and max(crop.shape[:2]) > max_side:
+            scale = max_side / max(crop.shape[:2])
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        quality = int(self.settings["quality"])
+        if fmt in ("jpg", "jpeg"):
+            ext, params = ".jpg", [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif fmt == "webp":
+            ext, params = ".webp", [cv2.IMWRITE_WEBP_QUALITY, quality]
+        elif fmt == "png":
+            ext, params = ".png", [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        else:
+            raise ValueError(f"Unsupported snapshot format: {fmt}")
+        ok, data = cv2.imencode(ext, crop, params)
+        if not ok:
+            raise ValueError(f"Could not encode snapshot as {ext}")
+        return ext, data
+
+    def _write(self, student, crop, timestamp):
+        with self.write_stats.time():
+            ext, data = self._encode(crop)
+            folder = snapshot_dir(timestamp, self.root)
+            os.makedirs(folder, exist_ok=True)
+            filepath = os.path.join(folder, snapshot_name(student["id"], timestamp) + ext)
+            tmp_path = filepath + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data.tobytes())
+            os.replace(tmp_path, filepath)
+        with self._lock:
+            self.written += 1
+        log_message(f"📸 Snapshot saved for {student['nama']}: {filepath}")
+
+    def prune(self, now=None):
+        """Apply the retention policy; returns the number of files removed."""
+        now = now or datetime.now()
+        removed = 0
+        cutoff = (now - timedelta(days=self.settings["retention_days"])).strftime("%Y%m%d")
+
+        # Date folders: whole days past retention go at once
+        for year in _subdirs(self.root):
+            for month in _subdirs(os.path.join(self.root, year)):
+                for day in _subdirs(os.path.join(self.root, year, month)):
+                    if self.settings["retention_days"] and f"{year}{month}{day}" < cutoff:
+                        path = os.path.join(self.root, year, month, day)
+                        removed += len(os.listdir(path))
+                        shutil.rmtree(path, ignore_errors=True)
+                if not os.listdir(os.path.join(self.root, year, month)):
+                    os.rmdir(os.path.join(self.root, year, month))
+            if not os.listdir(os.path.join(self.root, year)):
+                os.rmdir(os.path.join(self.root, year))
+
+        limit = self.settings["max_total_mb"] * 1024 * 1024
+        if limit:
+            files = []
+            for folder, _, names in os.walk(self.root):
+                for name in names:
+                    if name.endswith(SNAPSHOT_EXTS):
+                        path = os.path.join(folder, name)
+                        st = os.stat(path)
+                        files.append((st.st_mtime, st.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= limit:
+                    break
+                os.remove(path)
+                total -= size
+                removed += 1
+
+        if removed:
+            with self._lock:
+                self.pruned += removed
+            log_message(f"🧹 Removed {removed} old snapshots")
+        return removed
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        """Write everything still queued, then stop the thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(False)
+            self._thread.join(timeout=10)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+                "written": self.written,
+                "dropped": self.dropped,
+                "pruned": self.pruned,
+                "write": self.write_stats.snapshot(),
+            }
+
+
+def _subdirs(path):
+    try:
+        return sorted(d for d in os.listdir(path) if d.isdigit() and os.path.isdir(os.path.join(path, d)))
+    except FileNotFoundError:
+        return []
+
+
+snapshots = SnapshotWriter()
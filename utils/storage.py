@@ -0,0 +1,504 @@
+import csv, io, os, sqlite3, threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pandas as pd
+
+try:
+    from config import CSV_PATH, ATTENDANCE_PATH, DATA_DIR, get_setting
+    from logger import log_message
+    from registry import registry, STUDENT_COLUMNS
+    from journal import journal, HISTORY_COLUMNS
+except ImportError:
+    from utils.config import CSV_PATH, ATTENDANCE_PATH, DATA_DIR, get_setting
+    from utils.logger import log_message
+    from utils.registry import registry, STUDENT_COLUMNS
+    from utils.journal import journal, HISTORY_COLUMNS
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+STORAGE_DEFAULTS = {"backend": "csv", "sqlite_path": os.path.join(DATA_DIR, "attendance.db")}
+
+
+class HistoryIndex:
+    """Byte offsets of every complete line in attendance_history.csv, so a
+    page of rows can be read with one seek. The journal only appends, so
+    the index is extended from where the last scan stopped; a file that
+    shrank (rewritten) is rescanned from the start."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets = []  # start of each data row
+        self._scanned = 0   # bytes covered by complete lines
+
+    def _update(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < self._scanned:
+            self._offsets, self._scanned = [], 0
+        if size == self._scanned:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._scanned)
+            pos = self._scanned
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn or still being written
+                if pos > 0:  # skip the header
+                    self._offsets.append(pos)
+                pos += len(line)
+            self._scanned = pos
+
+    def __len__(self):
+        with self._lock:
+            self._update()
+            return len(self._offsets)
+
+    def rows(self, offset, limit):
+        with self._lock:
+            self._update()
+            starts = self._offsets[offset:offset + limit]
+            if not starts:
+                return []
+            end = self._offsets[offset + limit] if offset + limit < len(self._offsets) else self._scanned
+        with open(self.path, "rb") as f:
+            f.seek(starts[0])
+            chunk = f.read(end - starts[0]).decode("utf-8")
+        return [tuple(row) for row in csv.reader(io.StringIO(chunk)) if row]
+
+
+class CsvStorage:
+    """students.csv through the in-memory registry, history through the journal."""
+
+    name = "csv"
+
+    def __init__(self, students=registry, attendance=journal):
+        self.registry = students
+        self.journal = attendance
+        self.history = HistoryIndex(attendance.path)
+
+    def get(self, student_id, default=None):
+        return self.registry.get(student_id, default)
+
+    def list_students(self):
+        return self.registry.all()
+
+    def students_by_class(self, kelas):
+        return self.registry.by_class(kelas)
+
+    def classes(self):
+        return self.registry.classes()
+
+    def record_checkin(self, student: dict, status="Present", cooldown=0):
+        """Persist a check-in; student already carries the new totals."""
+        return bool(self.record_checkins([student], status, cooldown))
+
+    def record_checkins(self, students, status="Present", cooldown=0):
+        # The CSV files have no cross-process lock: within a process the
+        # shared cooldown index already decided, so every check-in is kept
+        self.journal.record_many(students, status)
+        return list(students)
+
+    def students_df(self):
+        if os.path.exists(self.registry.path):
+            return pd.read_csv(self.registry.path)
+        return pd.DataFrame(columns=STUDENT_COLUMNS)
+
+    def save_students_df(self, df):
+        df.to_csv(self.registry.path, index=False)
+
+    def attendance_df(self, start=None, end=None, student_id=None):
+        if not os.path.exists(self.journal.path):
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        df = pd.read_csv(self.journal.path)
+        if start:
+            df = df[df["timestamp"] >= start]
+        if end:
+            df = df[df["timestamp"] <= end]
+        if student_id is not None:
+            df = df[df["id"].astype(str) == str(student_id)]
+        return df
+
+    def attendance_chunks(self, start=None, end=None, student_ids=None, chunk_rows=50000):
+        """History as DataFrames of at most chunk_rows rows (all columns str),
+        filtered like attendance_df; memory stays bounded by the chunk size."""
+        if not os.path.exists(self.journal.path):
+            return
+        ids = {str(i) for i in student_ids} if student_ids is not None else None
+        reader = pd.read_csv(self.journal.path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+        for chunk in reader:
+            yield _filter_chunk(chunk, start, end, ids)
+
+    def attendance_count(self):
+        return len(self.history)
+
+    def attendance_page(self, offset, limit):
+        """Rows offset..offset+limit of the history as (id, name, timestamp, status)."""
+        return self.history.rows(offset, limit)
+
+    def recover(self):
+        self.registry.refresh(force=True)
+        return self.journal.recover()
+
+    def close(self):
+        self.journal.close()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    nama TEXT,
+    kelas TEXT,
+    total_kehadiran INTEGER NOT NULL DEFAULT 0,
+    email TEXT,
+    nomor_telepon TEXT,
+    waktu_kehadiran TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_students_kelas ON students(kelas);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    name TEXT,
+    timestamp TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'Present'
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance(student_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance(timestamp);
+"""
+
+# Written only by check-ins (record_checkins), never by a manager save
+ATTENDANCE_COLUMNS = ("total_kehadiran", "waktu_kehadiran")
+EDITABLE_COLUMNS = [col for col in STUDENT_COLUMNS[1:] if col not in ATTENDANCE_COLUMNS]
+
+STUDENT_SELECT = f"SELECT {', '.join(STUDENT_COLUMNS)} FROM students"
+ATTENDANCE_SELECT = "SELECT student_id AS id, name, timestamp, status FROM attendance"
+
+
+class SqliteStorage:
+    """SQLite (WAL) backend. Each thread reuses its own connection, so API
+    requests, the kiosk worker and the manager can share one database."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._count = (0, None, None)  # (rows, first seq, last seq) last counted
+        self._loaded = None  # students as last handed out by students_df()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, student_id, default=None):
+        try:
+            student_id = int(float(student_id))
+        except (TypeError, ValueError):
+            return default
+        row = self._connect().execute(f"{STUDENT_SELECT} WHERE id = ?", (student_id,)).fetchone()
+        return dict(row) if row else default
+
+    def list_students(self):
+        rows = self._connect().execute(f"{STUDENT_SELECT} ORDER BY id").fetchall()
+        return {str(row["id"]): dict(row) for row in rows}
+
+    def students_by_class(self, kelas):
+        rows = self._connect().execute(f"{STUDENT_SELECT} WHERE kelas = ? ORDER BY id", (kelas,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def classes(self):
+        rows = self._connect().execute("SELECT DISTINCT kelas FROM students WHERE kelas IS NOT NULL ORDER BY kelas")
+        return [row[0] for row in rows]
+
+    def record_checkin(self, student: dict, status="Present", cooldown=0):
+        """Persist a check-in. The total is incremented in SQL so concurrent
+        writers never lose an update; the dict is synced to the stored row."""
+        return bool(self.record_checkins([student], status, cooldown))
+
+    def record_checkins(self, students, status="Present", cooldown=0):
+        """Persist check-ins and return the students recorded. With a
+        cooldown (seconds), a student whose stored check-in is newer than
+        that is skipped: the conditional UPDATE runs inside the write
+        transaction, so two processes can't both count the same window."""
+        recorded = []
+        with self._transaction() as conn:
+            for student in students:
+                student_id = int(student["id"])
+                if cooldown:
+                    cutoff = datetime.strptime(student["waktu_kehadiran"], TIME_FORMAT) - timedelta(seconds=cooldown)
+                    cur = conn.execute(
+                        "UPDATE students SET total_kehadiran = total_kehadiran + 1, waktu_kehadiran = ? "
+                        "WHERE id = ? AND (waktu_kehadiran IS NULL OR waktu_kehadiran = '' OR waktu_kehadiran <= ?)",
+                        (student["waktu_kehadiran"], student_id, cutoff.strftime(TIME_FORMAT)),
+                    )
+                else:
+                    cur = conn.execute(
+                        "UPDATE students SET total_kehadiran = total_kehadiran + 1, waktu_kehadiran = ? WHERE id = ?",
+                        (student["waktu_kehadiran"], student_id),
+                    )
+                if cur.rowcount == 0 and cooldown:
+                    row = conn.execute(
+                        "SELECT total_kehadiran, waktu_kehadiran FROM students WHERE id = ?", (student_id,)
+                    ).fetchone()
+                    if row:
+                        # Counted by another writer inside the window
+                        student["total_kehadiran"], student["waktu_kehadiran"] = row[0], row[1]
+                        continue
+                conn.execute(
+                    "INSERT INTO attendance (student_id, name, timestamp, status) VALUES (?, ?, ?, ?)",
+                    (student_id, student["nama"], student["waktu_kehadiran"], status),
+                )
+                row = conn.execute("SELECT total_kehadiran FROM students WHERE id = ?", (student_id,)).fetchone()
+                if row:
+                    student["total_kehadiran"] = row[0]
+                recorded.append(student)
+        return recorded
+
+    def students_df(self):
+        df = pd.read_sql_query(f"{STUDENT_SELECT} ORDER BY id", self._connect())
+        with self._lock:
+            self._loaded = _student_rows(df)
+        return df
+
+    def save_students_df(self, df):
+        """Apply the manager's edits to df since it was loaded with
+        students_df(): new students are inserted, removed ones deleted, and
+        for the rest only the edited columns are written, and only where
+        the stored value is still the one loaded (otherwise another client
+        changed it meanwhile and the edit is skipped). Attendance columns
+        belong to check-ins, so kiosk/API check-ins made in between survive.
+        Returns the ids whose edits were skipped."""
+        rows = _student_rows(df)
+        with self._lock:
+            loaded = self._loaded
+        if loaded is None:
+            loaded = _student_rows(pd.read_sql_query(STUDENT_SELECT, self._connect()))
+
+        placeholders = ", ".join("?" for _ in STUDENT_COLUMNS)
+        conflicts, ignored = [], []
+        with self._transaction() as conn:
+            for student_id, row in rows.items():
+                base = loaded.get(student_id)
+                if base is None:
+                    cur = conn.execute(
+                        f"INSERT OR IGNORE INTO students ({', '.join(STUDENT_COLUMNS)}) VALUES ({placeholders})",
+                        tuple(row[col] for col in STUDENT_COLUMNS),
+                    )
+                    if cur.rowcount == 0:
+                        conflicts.append(student_id)  # id taken by a student added elsewhere
+                    continue
+
+                if any(row[col] != base[col] for col in ATTENDANCE_COLUMNS):
+                    ignored.append(student_id)
+                edited = [col for col in EDITABLE_COLUMNS if row[col] != base[col]]
+                if not edited:
+                    continue
+                cur = conn.execute(
+                    f"UPDATE students SET {', '.join(f'{col} = ?' for col in edited)} "
+                    f"WHERE id = ? AND {' AND '.join(f'{col} IS ?' for col in edited)}",
+                    [row[col] for col in edited] + [student_id] + [base[col] for col in edited],
+                )
+                if cur.rowcount == 0:
+                    conflicts.append(student_id)
+            conn.executemany("DELETE FROM students WHERE id = ?", [(sid,) for sid in loaded if sid not in rows])
+
+        with self._lock:
+            self._loaded = rows
+        if ignored:
+            log_message(f"⚠️ Attendance totals only change through check-ins; edits ignored for {', '.join(map(str, ignored))}")
+        if conflicts:
+            log_message(f"⚠️ Changed by another client meanwhile, not saved: {', '.join(map(str, conflicts))}")
+        return conflicts
+
+    def attendance_df(self, start=None, end=None, student_id=None):
+        clauses, params = [], []
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        if student_id is not None:
+            clauses.append("student_id = ?")
+            params.append(int(student_id))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return pd.read_sql_query(f"{ATTENDANCE_SELECT}{where} ORDER BY seq", self._connect(), params=params)
+
+    def attendance_chunks(self, start=None, end=None, student_ids=None, chunk_rows=50000):
+        """History as DataFrames of at most chunk_rows rows (all columns str),
+        filtered like attendance_df; memory stays bounded by the chunk size."""
+        clauses, params = [], []
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        ids = {str(i) for i in student_ids} if student_ids is not None else None
+        # Separate connection: the cursor stays open between chunks
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            reader = pd.read_sql_query(
+                f"{ATTENDANCE_SELECT}{where} ORDER BY seq", conn, params=params, chunksize=chunk_rows
+            )
+            for chunk in reader:
+                yield _filter_chunk(chunk.fillna("").astype(str), None, None, ids)
+        finally:
+            conn.close()
+
+    def attendance_count(self):
+        """Row count of the history, kept incrementally: the table is only
+        appended to, so only rows past the last seen seq are counted (an
+        index range, not a full COUNT(*) on every check-in). A changed first
+        or lower last seq means it was rewritten and is counted again."""
+        conn = self._connect()
+        with self._lock:
+            count, first, last = self._count
+            new_first, new_last = conn.execute(
+                "SELECT (SELECT MIN(seq) FROM attendance), (SELECT MAX(seq) FROM attendance)"
+            ).fetchone()
+            if new_last is None:
+                count = 0
+            elif new_first != first or last is None or new_last < last:
+                count = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+            elif new_last > last:
+                count += conn.execute("SELECT COUNT(*) FROM attendance WHERE seq > ?", (last,)).fetchone()[0]
+            self._count = (count, new_first, new_last)
+            return count
+
+    def attendance_page(self, offset, limit):
+        """Rows offset..offset+limit of the history as (id, name, timestamp, status)."""
+        rows = self._connect().execute(f"{ATTENDANCE_SELECT} ORDER BY seq LIMIT ? OFFSET ?", (limit, offset))
+        return [tuple(row) for row in rows]
+
+    def recover(self):
+        return 0
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def _filter_chunk(chunk, start, end, ids):
+    if start:
+        chunk = chunk[chunk["timestamp"] >= start]
+    if end:
+        chunk = chunk[chunk["timestamp"] <= end]
+    if ids is not None:
+        chunk = chunk[chunk["id"].isin(ids)]
+    return chunk
+
+
+def _student_rows(df):
+    """{id: {column: SQL value}} for the rows of a students DataFrame."""
+    rows = {}
+    for record in df.to_dict("records"):
+        row = {col: _sql_value(record.get(col)) for col in STUDENT_COLUMNS}
+        if row["id"] is None:
+            continue
+        row["id"] = int(float(row["id"]))
+        rows[row["id"]] = row
+    return rows
+
+
+def _sql_value(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return value
+
+
+def migrate_csv_to_sqlite(db_path, csv_path=CSV_PATH, attendance_path=ATTENDANCE_PATH, force=False):
+    """One-shot copy of the CSV data into a SQLite database."""
+    target = SqliteStorage(db_path)
+    conn = target._connect()
+    existing = conn.execute("SELECT (SELECT COUNT(*) FROM students) + (SELECT COUNT(*) FROM attendance)").fetchone()[0]
+    if existing and not force:
+        raise RuntimeError(f"{db_path} already has data; pass force=True to overwrite")
+
+    students = pd.read_csv(csv_path, dtype=str, keep_default_na=False) if os.path.exists(csv_path) else pd.DataFrame()
+    history = pd.read_csv(attendance_path, dtype=str, keep_default_na=False) if os.path.exists(attendance_path) else pd.DataFrame()
+
+    student_rows = []
+    for record in students.to_dict("records"):
+        row = [record.get(col) or None for col in STUDENT_COLUMNS]
+        row[0] = int(float(row[0]))
+        row[3] = int(float(row[3])) if row[3] else 0
+        student_rows.append(row)
+    history_rows = [
+        (int(float(r["id"])), r["name"], r["timestamp"], r.get("status") or "Present")
+        for r in history.to_dict("records")
+    ]
+
+    with target._transaction() as conn:
+        conn.execute("DELETE FROM students")
+        conn.execute("DELETE FROM attendance")
+        conn.executemany(
+            f"INSERT INTO students ({', '.join(STUDENT_COLUMNS)}) VALUES ({', '.join('?' for _ in STUDENT_COLUMNS)})",
+            student_rows,
+        )
+        conn.executemany(
+            "INSERT INTO attendance (student_id, name, timestamp, status) VALUES (?, ?, ?, ?)", history_rows
+        )
+    target.close()
+    log_message(f"✅ Migrated {len(student_rows)} students and {len(history_rows)} attendance rows into {db_path}")
+    return len(student_rows), len(history_rows)
+
+
+def create_storage(settings=None):
+    settings = settings or get_setting("storage", STORAGE_DEFAULTS)
+    if settings["backend"] == "sqlite":
+        return SqliteStorage(settings["sqlite_path"])
+    if settings["backend"] == "csv":
+        return CsvStorage()
+    raise ValueError(f"Unknown storage backend: {settings['backend']}")
+
+
+storage = create_storage()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Storage utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("migrate", help="Copy Data/*.csv into a SQLite database")
+    p.add_argument("--db", default=STORAGE_DEFAULTS["sqlite_path"])
+    p.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        students, rows = migrate_csv_to_sqlite(args.db, force=args.force)
+        print(f"Migrated {students} students and {rows} attendance rows into {args.db}")
+        print('Set "storage": {"backend": "sqlite"} in Data/config.json to use it')
@@ -30,7 +30,7 @@ def add_student(app):
         messagebox.showerror("Error", "No valid faces found")
         return
 
-    app.refresh_treeview(app.tree, app.student_df)
+    app.upsert_student_row(student_id)
     save_data(app.student_df)
     log_message(f"🎉 Added {count} images to student ID={student_id}", app.log_box)
 
@@ -58,7 +58,7 @@ def edit_student(app):
         except ValueError:
             app.student_df.at[idx, col.lower().replace(" ", "_")] = val
 
-    app.refresh_treeview(app.tree, app.student_df)
+    app.upsert_student_row(student_id)
     save_data(app.student_df)
     log_message(f"✏️ Edited student {student_id}", app.log_box)
 
@@ -87,6 +87,6 @@ def delete_student(app):
         except Exception:
             pass
 
-    app.refresh_treeview(app.tree, app.student_df)
+    app.remove_student_row(student_id)
     save_data(app.student_df)
     log_message(f"🗑️ Deleted student {student_id}", app.log_box)
\ No newline at end of file
@@ -0,0 +1,225 @@
+from collections import OrderedDict
+from tkinter import ttk
+
+
+class ListSource:
+    """Rows held in memory, addressable by a key column for single-row
+    inserts, updates and deletes."""
+
+    def __init__(self, rows=(), key_index=0):
+        self.key_index = key_index
+        self._rows = [tuple(row) for row in rows]
+        self._positions = None
+
+    @classmethod
+    def from_dataframe(cls, df, key_index=0):
+        return cls(df.itertuples(index=False, name=None), key_index)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def rows(self, start, stop):
+        return self._rows[start:stop]
+
+    def key(self, row):
+        return row if self.key_index is None else row[self.key_index]
+
+    def position(self, key):
+        if self._positions is None:
+            self._positions = {self.key(row): i for i, row in enumerate(self._rows)}
+        return self._positions.get(key)
+
+    def upsert(self, row):
+        row = tuple(row)
+        pos = self.position(self.key(row))
+        if pos is None:
+            pos = len(self._rows)
+            self._rows.append(row)
+            self._positions[self.key(row)] = pos
+        else:
+            self._rows[pos] = row
+        return pos
+
+    def delete(self, key):
+        pos = self.position(key)
+        if pos is not None:
+            del self._rows[pos]
+            self._positions = None
+        return pos
+
+    def refresh(self):
+        pass
+
+
+class PagedSource:
+    """Rows loaded lazily a page at a time, e.g. from storage.attendance_page.
+    Only the most recently used `max_pages` pages stay in memory."""
+
+    def __init__(self, count, fetch, page_size=200, max_pages=20):
+        self.count = count
+        self.fetch = fetch
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.key_index = None
+        self._total = None
+        self._pages = OrderedDict()
+
+    def __len__(self):
+        if self._total is None:
+            self._total = self.count()
+        return self._total
+
+    def _page(self, number):
+        page = self._pages.get(number)
+        if page is None:
+            page = self._pages[number] = self.fetch(number * self.page_size, self.page_size)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+        return page
+
+    def rows(self, start, stop):
+        stop = min(stop, len(self))
+        if start >= stop:
+            return []
+        rows = []
+        for number in range(start // self.page_size, (stop - 1) // self.page_size + 1):
+            rows.extend(self._page(number))
+        first = start - (start // self.page_size) * self.page_size
+        return rows[first:first + stop - start]
+
+    def key(self, row):
+        return row
+
+    def refresh(self):
+        """Forget the count and cached pages (new rows may have been appended)."""
+        self._total = None
+        self._pages.clear()
+
+
+class VirtualTable(ttk.Frame):
+    """Treeview that only ever holds `height` items.
+
+    Scrolling re-fills the values of those items from the source instead
+    of inserting one item per row, so showing a source of any size costs
+    the same. The selection follows its row's key across scrolls.
+    """
+
+    def __init__(self, parent, columns, height=12):
+        super().__init__(parent)
+        self.height = height
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="browse")
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, anchor="center", stretch=True)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self._items = [self.tree.insert("", "end", iid=f"row{i}") for i in range(height)]
+        self.tree.detach(*self._items)
+        self._shown = 0
+        self._rows = []
+        self.source = ListSource()
+        self.offset = 0
+        self.selected_key = None
+
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.height) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll(self.height) or "break")
+
+    def set_source(self, source, keep_position=False):
+        self.source = source
+        if not keep_position:
+            self.offset = 0
+        self.render()
+
+    def render(self):
+        total = len(self.source)
+        self.offset = max(0, min(self.offset, total - self.height))
+        rows = self.source.rows(self.offset, self.offset + self.height)
+
+        for i, iid in enumerate(self._items):
+            if i < len(rows):
+                self.tree.item(iid, values=rows[i])
+                if i >= self._shown:
+                    self.tree.move(iid, "", i)
+            elif i < self._shown:
+                self.tree.detach(iid)
+        self._shown = len(rows)
+        self._rows = rows
+
+        wanted = next((iid for iid, row in zip(self._items, rows) if self.source.key(row) == self.selected_key), None)
+        current = self.tree.selection()
+        if wanted is not None and current != (wanted,):
+            self.tree.selection_set(wanted)
+        elif wanted is None and current:
+            self.tree.selection_remove(*current)
+
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(rows)) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.render()
+
+    def scroll_to(self, position):
+        """Bring a row position into view."""
+        if position < self.offset or position >= self.offset + self.height:
+            self.offset = max(0, position - self.height // 2)
+        self.render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.source))
+            self.render()
+        elif action == "scroll":
+            self.scroll(int(amount) * (self.height if unit == "pages" else 1))
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_arrow(self, step):
+        current = self.tree.selection()
+        index = self._items.index(current[0]) if current else -1
+        at_edge = (step < 0 and index == 0) or (step > 0 and index == self._shown - 1)
+        if not at_edge:
+            return None
+        self.scroll(step)
+        edge_row = self._rows[index] if 0 <= index < len(self._rows) else None
+        if edge_row is not None:
+            self.tree.selection_set(self._items[index])
+        return "break"
+
+    def bind_select(self, callback):
+        """Call `callback(event)` when the user selects a different row;
+        re-selections made by render() after scrolling are ignored."""
+        def handler(event):
+            selected = self.tree.selection()
+            if not selected or selected[0] not in self._items:
+                return
+            index = self._items.index(selected[0])
+            if index >= len(self._rows):
+                return
+            key = self.source.key(self._rows[index])
+            if key == self.selected_key:
+                return
+            self.selected_key = key
+            callback(event)
+        self.tree.bind("<<TreeviewSelect>>", handler)
+
+    def upsert(self, row):
+        """Insert or update one row (ListSource only) and show it."""
+        position = self.source.upsert(row)
+        self.scroll_to(position)
+
+    def delete(self, key):
+        self.source.delete(key)
+        self.render()
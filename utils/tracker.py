@@ -0,0 +1,101 @@
+from collections import Counter, deque
+from itertools import count
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class Track:
+    def __init__(self, track_id, box, vote_window):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.votes = deque(maxlen=vote_window)
+        self.frames_since_recognition = 0
+        self.missed = 0
+        self.checked_in = False
+
+    def add_vote(self, student, conf):
+        self.votes.append((student, conf))
+        self.frames_since_recognition = 0
+
+    def identity(self):
+        """Majority vote over the last predictions: (student, mean conf, share)."""
+        if not self.votes:
+            return None, None, 0.0
+        keys = [_student_key(s) for s, _ in self.votes]
+        winner, hits = Counter(keys).most_common(1)[0]
+        confs = [c for (s, c), k in zip(self.votes, keys) if k == winner and c is not None]
+        student = next(s for (s, _), k in zip(self.votes, keys) if k == winner)
+        conf = sum(confs) / len(confs) if confs else None
+        return student, conf, hits / len(self.votes)
+
+
+def _student_key(student):
+    return None if student is None else str(student["id"])
+
+
+class FaceTracker:
+    """Greedy IoU tracker that keeps one track per face across frames so
+    recognition can be skipped for faces that are already identified."""
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, vote_window=5,
+                 min_votes=3, min_agreement=0.6, recognize_every=15):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.vote_window = vote_window
+        self.min_votes = min_votes
+        self.min_agreement = min_agreement
+        self.recognize_every = recognize_every
+        self.tracks = []
+        self._ids = count(1)
+
+    def update(self, boxes):
+        """Match fresh detections to tracks; returns tracks seen this frame."""
+        pairs = sorted(
+            ((iou(t.box, b), ti, bi) for ti, t in enumerate(self.tracks) for bi, b in enumerate(boxes)),
+            reverse=True,
+        )
+        matched_tracks, matched_boxes = set(), set()
+        for score, ti, bi in pairs:
+            if score < self.iou_threshold:
+                break
+            if ti in matched_tracks or bi in matched_boxes:
+                continue
+            self.tracks[ti].box = tuple(int(v) for v in boxes[bi])
+            self.tracks[ti].missed = 0
+            matched_tracks.add(ti)
+            matched_boxes.add(bi)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.missed += 1
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+
+        for bi, box in enumerate(boxes):
+            if bi not in matched_boxes:
+                self.tracks.append(Track(next(self._ids), box, self.vote_window))
+
+        return self.advance()
+
+    def advance(self):
+        """Age tracks on a frame without detection; returns visible tracks."""
+        for track in self.tracks:
+            track.frames_since_recognition += 1
+        return [t for t in self.tracks if t.missed == 0]
+
+    def is_stable(self, track):
+        if len(track.votes) < self.min_votes:
+            return False
+        return track.identity()[2] >= self.min_agreement
+
+    def needs_recognition(self, track):
+        if not track.votes or not self.is_stable(track):
+            return True
+        return track.frames_since_recognition >= self.recognize_every
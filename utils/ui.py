@@ -1,32 +1,47 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
-import sys, os
+import sys, os, queue, threading, time
+from datetime import datetime
 import pandas as pd
 from PIL import Image, ImageTk
 
 try:
-    from config import LOG_PATH, IMAGES_DIR, LOGS_DIR
-    from data_manager import load_data, load_attendance, save_data
+    from config import LOG_PATH, IMAGES_DIR
+    from data_manager import load_data, load_attendance, save_data, load_class_map, count_attendance, load_attendance_page
     from student_ops import add_student, edit_student, delete_student
     from face_utils import train_model
-    from logger import log_message
+    from logger import log_message, attach_log_box, clear_log
     from exceptions import set_log_box
+    from snapshots import find_snapshot
+    from table_view import VirtualTable, ListSource, PagedSource
+    from search_index import SearchIndex, STUDENT_FIELDS, HISTORY_FIELDS
+    from export import export_attendance, EXPORT_DEFAULTS
+    from analytics import analytics
+    from config import get_setting
 except ImportError:
-    from utils.config import LOG_PATH, IMAGES_DIR, LOGS_DIR
-    from utils.data_manager import load_data, load_attendance, save_data
+    from utils.config import LOG_PATH, IMAGES_DIR
+    from utils.data_manager import load_data, load_attendance, save_data, load_class_map, count_attendance, load_attendance_page
     from utils.student_ops import add_student, edit_student, delete_student
     from utils.face_utils import train_model
-    from utils.logger import log_message
+    from utils.logger import log_message, attach_log_box, clear_log
     from utils.exceptions import set_log_box
+    from utils.snapshots import find_snapshot
+    from utils.table_view import VirtualTable, ListSource, PagedSource
+    from utils.search_index import SearchIndex, STUDENT_FIELDS, HISTORY_FIELDS
+    from utils.export import export_attendance, EXPORT_DEFAULTS
+    from utils.analytics import analytics
+    from utils.config import get_setting
 
 
-def search_dataframe(df, query: str):
+SEARCH_DELAY_MS = 250
+ANALYTICS_TAB = "📊 Analytics"
+
+
+def search_dataframe(df, query: str, fields=STUDENT_FIELDS):
     if not query:
         return df
-    query = query.lower()
-    mask = df.astype(str).agg(lambda row: row.str.lower().str.contains(query).any(), axis=1)
-    return df[mask]
+    return SearchIndex(df, fields).search(query)
 
 
 class StudentManagerApp:
@@ -38,7 +53,9 @@ class StudentManagerApp:
         self.root.configure(bg="#f5f6fa")
 
         self.student_df = load_data()
-        self.attendance_df = load_attendance()
+        # History rows are paged in from storage as the table scrolls
+        self.students_source = ListSource.from_dataframe(self.student_df)
+        self.history_source = PagedSource(count_attendance, load_attendance_page)
 
         self.entries = {}
         self.label_widgets = {}
@@ -46,8 +63,17 @@ class StudentManagerApp:
         self.image_label = None
         self.tree = None
         self.history_tree = None
+        self.students_table = None
+        self.history_table = None
+        self.analytics_table = None
+        self.analytics_thread = None
         self.log_box = None
         self.search_entry = None
+        self.search_job = None
+        # Built on first search; the history index is extended in place
+        # with rows appended since, the student index rebuilt after edits
+        self.student_index = None
+        self.history_index = None
         self.notebook = None
 
         self.build_menus()
@@ -56,9 +82,10 @@ class StudentManagerApp:
         self.build_search()
         self.build_notebook()
         self.build_log()
+        self.log_sink = attach_log_box(self.log_box)
 
-        self.refresh_treeview(self.tree, self.student_df)
-        self.refresh_treeview(self.history_tree, self.attendance_df)
+        self.students_table.set_source(self.students_source)
+        self.history_table.set_source(self.history_source)
         log_message("🚀 Program started", self.log_box)
         set_log_box(self.log_box)
 
@@ -75,7 +102,7 @@ class StudentManagerApp:
 
         log_menu = tk.Menu(menubar, tearoff=0)
         log_menu.add_command(label="Open Log File", command=lambda: Path(LOG_PATH).open())
-        log_menu.add_command(label="Clear Log", command=lambda: Path(LOG_PATH).write_text(""))
+        log_menu.add_command(label="Clear Log", command=clear_log)
         menubar.add_cascade(label="Logs", menu=log_menu)
 
         self.root.config(menu=menubar)
@@ -152,7 +179,7 @@ class StudentManagerApp:
             "add": ("➕ Add (Select Photos)", lambda: add_student(self), "#3498db"),
             "edit": ("✏️ Edit", lambda: edit_student(self), "#f39c12"),
             "delete": ("🗑 Delete", lambda: delete_student(self), "#e74c3c"),
-            "train": ("🧠 Train Model", lambda: train_model(self.log_box), "#27ae60"),
+            "train": ("🧠 Train Model", self.start_training, "#27ae60"),
         }
 
         for i, (key, (text, cmd, bg)) in enumerate(specs.items()):
@@ -165,6 +192,33 @@ class StudentManagerApp:
             btn.grid(row=row, column=col, padx=10, pady=8, sticky="ew")
             self.buttons[key] = btn
 
+    def start_training(self):
+        self.buttons["train"].config(state="disabled")
+        self.train_messages = queue.Queue()
+        threading.Thread(target=self.run_training, daemon=True).start()
+        self.root.after(100, self.poll_training)
+
+    def run_training(self):
+        # Background thread: progress goes through the queue, never to Tk directly
+        try:
+            train_model(progress=self.train_messages.put, classes=load_class_map())
+        except Exception as e:
+            self.train_messages.put(log_message(f"❌ Training failed: {e}"))
+        finally:
+            self.train_messages.put(None)
+
+    def poll_training(self):
+        while True:
+            try:
+                entry = self.train_messages.get_nowait()
+            except queue.Empty:
+                self.root.after(100, self.poll_training)
+                return
+            if entry is None:
+                self.buttons["train"].config(state="normal")
+                return
+            self.log_sink.write(entry)
+
     def build_search(self):
         search_frame = tk.LabelFrame(
             self.root, text="Search Student", padx=10, pady=10,
@@ -175,6 +229,8 @@ class StudentManagerApp:
         tk.Label(search_frame, text="Search:", font=("Arial", 10), bg="#f5f6fa").pack(side="left", padx=5)
         self.search_entry = tk.Entry(search_frame, width=40, font=("Arial", 10))
         self.search_entry.pack(side="left", padx=5)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.search_entry.bind("<Return>", lambda e: self.global_search())
 
         tk.Button(search_frame, text="🔍 Search", command=self.global_search,
                   bg="#2980b9", fg="white", font=("Arial", 9, "bold"),
@@ -196,23 +252,39 @@ class StudentManagerApp:
         self.notebook.add(student_tab, text="📋 Students")
 
         cols = ["ID", "Nama", "Kelas", "Total Kehadiran", "Email", "Nomor Telepon", "Waktu Kehadiran"]
-        self.tree = ttk.Treeview(student_tab, columns=cols, show="headings", height=12)
-        for col in cols:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, anchor="center", stretch=True)
-        self.tree.pack(fill="both", expand=True)
-        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.students_table = VirtualTable(student_tab, cols, height=12)
+        self.students_table.pack(fill="both", expand=True)
+        self.students_table.bind_select(self.on_select)
+        self.tree = self.students_table.tree
 
         history_tab = tk.Frame(self.notebook, bg="#f5f6fa")
         self.notebook.add(history_tab, text="🕒 Attendance History")
 
         hist_cols = ["id", "name", "date", "status"]
-        self.history_tree = ttk.Treeview(history_tab, columns=hist_cols, show="headings", height=12)
-        for col in hist_cols:
-            self.history_tree.heading(col, text=col)
-            self.history_tree.column(col, anchor="center", stretch=True)
-        self.history_tree.pack(fill="both", expand=True)
-        self.history_tree.bind("<<TreeviewSelect>>", self.on_history_select)
+        self.history_table = VirtualTable(history_tab, hist_cols, height=12)
+        self.history_table.pack(fill="both", expand=True)
+        self.history_table.bind_select(self.on_history_select)
+        self.history_tree = self.history_table.tree
+
+        analytics_tab = tk.Frame(self.notebook, bg="#f5f6fa")
+        self.notebook.add(analytics_tab, text=ANALYTICS_TAB)
+
+        controls = tk.Frame(analytics_tab, bg="#f5f6fa")
+        controls.pack(fill="x", pady=5)
+        ttk.Label(controls, text="Class").pack(side="left", padx=5)
+        self.analytics_class = ttk.Combobox(controls, state="readonly", width=15,
+                                            postcommand=self.refresh_analytics_classes)
+        self.analytics_class.pack(side="left", padx=5)
+        ttk.Label(controls, text="Month (YYYY-MM)").pack(side="left", padx=5)
+        self.analytics_month = ttk.Entry(controls, width=10)
+        self.analytics_month.insert(0, datetime.now().strftime("%Y-%m"))
+        self.analytics_month.pack(side="left", padx=5)
+        ttk.Button(controls, text="Show", command=self.show_analytics).pack(side="left", padx=5)
+
+        self.analytics_label = tk.Label(analytics_tab, anchor="w", justify="left", bg="#f5f6fa", font=("Arial", 10))
+        self.analytics_label.pack(fill="x", padx=5)
+        self.analytics_table = VirtualTable(analytics_tab, ["day", "present", "late", "checkins", "rate"], height=10)
+        self.analytics_table.pack(fill="both", expand=True)
 
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_change)
 
@@ -227,9 +299,30 @@ class StudentManagerApp:
         self.log_box.pack(fill="both", expand=True)
 
     def refresh_treeview(self, tree, df):
-        tree.delete(*tree.get_children())
-        for _, row in df.iterrows():
-            tree.insert("", "end", values=row.tolist())
+        """Show a DataFrame in a table; only the visible rows become items."""
+        table = self.students_table if tree is self.tree else self.history_table
+        if tree is self.tree and df is self.student_df:
+            self.students_source = ListSource.from_dataframe(df)
+            table.set_source(self.students_source, keep_position=True)
+        else:
+            table.set_source(ListSource.from_dataframe(df, key_index=0 if tree is self.tree else None))
+
+    def upsert_student_row(self, student_id):
+        """Show a student added or edited in self.student_df without a full refresh."""
+        self.student_index = None
+        row = tuple(self.student_df[self.student_df["id"] == student_id].iloc[0].tolist())
+        self.students_source.upsert(row)
+        if self.students_table.source is self.students_source:
+            self.students_table.scroll_to(self.students_source.position(student_id))
+        else:
+            self.students_table.upsert(row)
+
+    def remove_student_row(self, student_id):
+        self.student_index = None
+        self.students_source.delete(student_id)
+        if self.students_table.source is not self.students_source:
+            self.students_table.source.delete(student_id)
+        self.students_table.render()
 
     def clear_entries(self):
         for e in self.entries.values():
@@ -252,11 +345,13 @@ class StudentManagerApp:
 
         values = self.history_tree.item(selected)["values"]
         student_id, date = values[0], values[2]
-        filename = f"{student_id}-{date.replace('-','').replace(':','').replace(' ','')}.png"
-        img_path = Path(LOGS_DIR) / filename
+        try:
+            img_path = find_snapshot(student_id, datetime.strptime(str(date), "%Y-%m-%d %H:%M:%S"))
+        except ValueError:
+            img_path = None
 
-        if not img_path.exists():
-            log_message(f"❌ Image not found: {img_path}", self.log_box)
+        if img_path is None:
+            log_message(f"❌ Image not found for {student_id} at {date}", self.log_box)
             return
 
         try:
@@ -275,7 +370,7 @@ class StudentManagerApp:
                 btn.grid_remove()
 
         except Exception as e:
-            log_message(f"❌ Failed to load image {filename}: {e}", self.log_box)
+            log_message(f"❌ Failed to load image {img_path}: {e}", self.log_box)
 
     def on_tab_change(self, event):
         tab = self.notebook.tab(self.notebook.select(), "text")
@@ -289,59 +384,172 @@ class StudentManagerApp:
                 entry.grid()
             for btn in self.form_buttons.values():
                 btn.grid()
-            self.refresh_treeview(self.tree, self.student_df)
+            self.students_table.set_source(self.students_source, keep_position=True)
             for btn in ["add", "edit", "delete"]:
                 self.buttons[btn].config(state="normal")
         else:
-            self.refresh_treeview(self.history_tree, self.attendance_df)
+            if tab == ANALYTICS_TAB:
+                self.show_analytics()
+            else:
+                self.show_history()
             for btn in ["add", "edit", "delete"]:
                 self.buttons[btn].config(state="disabled")
 
+    def schedule_search(self, event=None):
+        """Search as you type, once typing pauses for SEARCH_DELAY_MS."""
+        if event is not None and event.keysym == "Return":
+            return
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DELAY_MS, self.global_search)
+
+    def search_index(self, tab):
+        if tab == "📋 Students":
+            if self.student_index is None:
+                self.student_index = SearchIndex(self.student_df, STUDENT_FIELDS)
+            return self.student_index
+
+        total = count_attendance()
+        if self.history_index is None or total < len(self.history_index):
+            self.history_index = SearchIndex(load_attendance(), HISTORY_FIELDS)
+        elif total > len(self.history_index):
+            new_rows = load_attendance_page(len(self.history_index), total - len(self.history_index))
+            self.history_index.extend(pd.DataFrame(new_rows, columns=self.history_index.df.columns))
+        return self.history_index
+
     def global_search(self):
-        query = self.search_entry.get().strip().lower()
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+        query = self.search_entry.get().strip()
         tab = self.notebook.tab(self.notebook.select(), "text")
+        if tab == ANALYTICS_TAB:
+            return
+        if not query:
+            self.global_clear()
+            return
+
+        start = time.perf_counter()
+        try:
+            filtered = self.search_index(tab).search(query)
+        except ValueError as e:
+            log_message(f"⚠️ {e}", self.log_box)
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+
         if tab == "📋 Students":
-            filtered = search_dataframe(self.student_df, query)
             self.refresh_treeview(self.tree, filtered)
         else:
-            filtered = search_dataframe(self.attendance_df, query)
             self.refresh_treeview(self.history_tree, filtered)
-        log_message(f"🔍 Found {len(filtered)} result(s) for '{query}'", self.log_box)
+        log_message(f"🔍 Found {len(filtered)} result(s) for '{query}' in {elapsed:.1f} ms", self.log_box)
 
     def global_clear(self):
         tab = self.notebook.tab(self.notebook.select(), "text")
         if tab == "📋 Students":
-            self.refresh_treeview(self.tree, self.student_df)
-        else:
-            self.refresh_treeview(self.history_tree, self.attendance_df)
+            self.students_table.set_source(self.students_source)
+        elif tab != ANALYTICS_TAB:
+            self.show_history()
+
+    def show_history(self):
+        # Re-count and drop cached pages: check-ins may have been appended
+        self.history_source.refresh()
+        self.history_table.set_source(self.history_source, keep_position=True)
+
+    def refresh_analytics_classes(self):
+        self.analytics_class["values"] = ["All classes"] + sorted({k for k in load_class_map().values() if k})
+
+    def show_analytics(self):
+        if not analytics.ready:
+            # First use reads the whole history: do it off the Tk thread
+            if self.analytics_thread is None:
+                log_message("📊 Building attendance analytics...", self.log_box)
+                self.analytics_thread = threading.Thread(target=analytics.rebuild, daemon=True)
+                self.analytics_thread.start()
+            if self.analytics_thread.is_alive():
+                self.root.after(200, self.show_analytics)
+                return
+            self.analytics_thread = None
+            if not analytics.ready:
+                log_message("❌ Failed to build attendance analytics", self.log_box)
+                return
+
+        kelas = self.analytics_class.get()
+        kelas = None if kelas in ("", "All classes") else kelas
+        month = self.analytics_month.get().strip() or None
+        try:
+            summary = analytics.class_summary(kelas, month)
+            days = analytics.daily(kelas, month) if month else []
+        except ValueError:
+            log_message(f"⚠️ Invalid month: {month} (use YYYY-MM)", self.log_box)
+            return
+
+        self.analytics_label.config(text=(
+            f"{kelas or 'All classes'}, {month or 'all time'}: "
+            f"rate {summary['rate']:.1%} over {summary['sessions']} day(s), {summary['students']} student(s) | "
+            f"present {summary['present']}, late {summary['late']}, check-ins {summary['checkins']}"
+        ))
+        rows = [(d["day"], d["present"], d["late"], d["checkins"], f"{d['rate']:.1%}") for d in days]
+        self.analytics_table.set_source(ListSource(rows, key_index=0))
 
     def global_export(self):
-        filepath = r"Data\attendance_history.csv"
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Export Attendance")
+        dialog.geometry("320x230")
+        dialog.resizable(False, False)
+
+        fields = {}
+        for row, label in enumerate(["Start (YYYY-MM-DD)", "End (YYYY-MM-DD)", "Student ID"]):
+            ttk.Label(dialog, text=label).grid(row=row, column=0, padx=5, pady=5, sticky="w")
+            fields[label] = ttk.Entry(dialog, width=20)
+            fields[label].grid(row=row, column=1, padx=5, pady=5)
+
+        all_classes = "All classes"
+        ttk.Label(dialog, text="Class").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        classes = sorted({k for k in load_class_map().values() if k})
+        combo = ttk.Combobox(dialog, values=[all_classes] + classes, state="readonly", width=17)
+        combo.set(all_classes)
+        combo.grid(row=3, column=1, padx=5, pady=5)
+
+        summary = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dialog, text="Per-student summary", variable=summary).grid(
+            row=4, column=0, columnspan=2, padx=5, pady=5
+        )
 
-        required_columns = {
-            'id', 'name', 'timestamp', 'status'
-        }
+        def start_export():
+            report = "summary" if summary.get() else "rows"
+            path = filedialog.asksaveasfilename(
+                parent=dialog,
+                initialdir=get_setting("export", EXPORT_DEFAULTS)["dir"],
+                initialfile=f"attendance_{report}.csv",
+                defaultextension=".csv",
+                filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet"), ("Excel", "*.xlsx")],
+            )
+            if not path:
+                return
+            student_id = fields["Student ID"].get().strip()
+            options = {
+                "report": report,
+                "start": fields["Start (YYYY-MM-DD)"].get().strip() or None,
+                "end": fields["End (YYYY-MM-DD)"].get().strip() or None,
+                "kelas": None if combo.get() == all_classes else combo.get(),
+                "student_ids": [student_id] if student_id else None,
+            }
+            dialog.destroy()
+            log_message(f"📤 Exporting attendance to {path}...", self.log_box)
+            threading.Thread(target=self.run_export, args=(path, options), daemon=True).start()
+
+        ttk.Button(dialog, text="Export", command=start_export).grid(row=5, column=0, columnspan=2, pady=10)
+
+    def run_export(self, path, options):
+        # Worker thread: log_message hands entries to the log box sink
+        def progress(rows):
+            log_message(f"📤 {rows} row(s) written...", self.log_box)
 
         try:
-            df = pd.read_csv(filepath)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"File tidak ditemukan: {filepath}")
+            total = export_attendance(path, progress=progress, **options)
+            log_message(f"✅ Exported {total} row(s) to {path}", self.log_box)
         except Exception as e:
-            raise Exception(f"Gagal membaca CSV: {e}")
-
-        if not required_columns.issubset(df.columns):
-            missing = required_columns - set(df.columns)
-            raise ValueError(f"Kolom berikut hilang: {', '.join(missing)}")
-
-        df['id'] = df['id'].astype(str)
-        df['name'] = df['name'].astype(str)
-        df['timestamp'] = df['timestamp'].astype(str)
-        df['status'] = df['status'].astype(str)
-
-        downloads_path = str(Path.home() / "Downloads")
-
-        save_path = os.path.join(downloads_path, "attendance_export.csv")
-        df.to_csv(save_path, index=False)
+            log_message(f"❌ Export failed: {e}", self.log_box)
 
     def select_photos(self):
         filedialog.askopenfilenames(filetypes=[("Images", "*.jpg *.png *.jpeg")])
@@ -0,0 +1,125 @@
+import cv2, threading, time
+from collections import deque
+
+try:
+    from metrics import LatencyStats
+except ImportError:
+    from utils.metrics import LatencyStats
+
+
+class FrameQueue:
+    """Bounded frame queue; when full, the oldest frame is dropped.
+    on_put() is called after every put (e.g. to wake a scheduler)."""
+
+    def __init__(self, maxsize=2, on_put=None):
+        self._frames = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.on_put = on_put
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(frame)
+            self.received += 1
+            self._cond.notify()
+        if self.on_put:
+            self.on_put()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames, timeout):
+                return None
+            return self._frames.popleft()
+
+    def depth(self):
+        with self._cond:
+            return len(self._frames)
+
+    def stats(self):
+        with self._cond:
+            return {"depth": len(self._frames), "received": self.received, "dropped": self.dropped}
+
+
+class CameraGrabber(threading.Thread):
+    """Reads frames from a video source into a FrameQueue as fast as it delivers them.
+
+    For video files (testing), realtime=True paces reads at the file's FPS
+    instead of decoding as fast as possible, and loop=True rewinds at the end.
+    """
+
+    def __init__(self, source, frames: FrameQueue, realtime=False, loop=False):
+        super().__init__(daemon=True)
+        self.source = source
+        self.frames = frames
+        self.realtime = realtime
+        self.loop = loop
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            self.error = f"Failed to open video source {self.source}"
+            return
+
+        fps = cap.get(cv2.CAP_PROP_FPS) if self.realtime else 0
+        interval = 1.0 / fps if fps and fps > 0 else 0
+        next_at = time.perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret and self.loop and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                    ret, frame = cap.read()
+                if not ret:
+                    self.error = "Failed to access camera"
+                    break
+                if interval:
+                    next_at += interval
+                    delay = next_at - time.perf_counter()
+                    if delay > 0:
+                        self._stop_event.wait(delay)
+                    else:
+                        next_at = time.perf_counter()
+                self.frames.put(frame)
+        finally:
+            cap.release()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class FrameWorker(threading.Thread):
+    """Runs handler(frame) on queued frames and keeps only the newest result."""
+
+    def __init__(self, frames: FrameQueue, handler):
+        super().__init__(daemon=True)
+        self.frames = frames
+        self.handler = handler
+        self.processed = 0
+        self.latency = LatencyStats()
+        self._latest = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                continue
+            with self.latency.time():
+                result = self.handler(frame)
+            with self._lock:
+                self._latest = result
+                self.processed += 1
+
+    def take_latest(self):
+        """Return the newest result once; None if nothing new since the last call."""
+        with self._lock:
+            result, self._latest = self._latest, None
+        return result
+
+    def stop(self):
+        self._stop_event.set()